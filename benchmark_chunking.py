@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Benchmark Chunking
+Micro-benchmarks lib/chunking.py over a generated corpus (small, typical,
+pathological and very large documents) and gates regressions against a
+stored baseline
+
+The committed baseline (chunking_baseline.json) stores per-case
+throughput, normalized by a tokenizer/regex workload timed on the same
+document, and --check gates on those numbers. The git revision it also
+records is only an optimization: when that revision exists in this
+clone, --check instead times it and the working tree back to back,
+repeat by repeat, and gates on the median ratio, so CPU speed and
+frequency drift cancel out. A clone without that revision (or without
+git) uses the stored numbers.
+
+    python benchmark_chunking.py                    # report
+    python benchmark_chunking.py --update-baseline  # baseline = HEAD (+ this machine's numbers)
+    python benchmark_chunking.py --check            # exit 1 on regression
+"""
+
+import os
+import re
+import gc
+import sys
+import json
+import time
+import types
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import tiktoken
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+import chunking
+from chunking import count_tokens
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(REPO_DIR, 'chunking_baseline.json')
+
+WORDS = (
+    "vault note search index chunk embedding vector query context heading section "
+    "markdown product launch metric team roadmap review design api latency cache "
+    "the a of and to in is for on with as by that this from it be are was at or"
+).split()
+
+def sentence(rng: random.Random, min_words: int = 6, max_words: int = 20) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return ' '.join(words).capitalize() + '.'
+
+def paragraph(rng: random.Random, sentences: int) -> str:
+    return ' '.join(sentence(rng) for _ in range(sentences))
+
+def structured_document(rng: random.Random, sections: int, paragraphs_per_section: int) -> str:
+    """Headings at varying depth with paragraphs, lists and the odd code block"""
+    parts = ['---', 'title: Benchmark note', 'tags: [bench, chunking]', '---', '']
+    for index in range(sections):
+        level = 1 if index == 0 else rng.choice((2, 2, 3, 3, 4))
+        parts.append('#' * level + ' ' + sentence(rng, 2, 5).rstrip('.'))
+        parts.append('')
+        for _ in range(paragraphs_per_section):
+            kind = rng.random()
+            if kind < 0.15:
+                parts.extend(f"- {sentence(rng, 3, 10)}" for _ in range(rng.randint(2, 6)))
+            elif kind < 0.2:
+                parts.extend(['```python', 'def example():', '    return 42', '```'])
+            else:
+                parts.append(paragraph(rng, rng.randint(2, 6)))
+            parts.append('')
+    return '\n'.join(parts)
+
+def build_corpus(seed: int = 7) -> dict:
+    """Deterministic documents keyed by case name"""
+    rng = random.Random(seed)
+    return {
+        # A quick capture: one heading, a couple of lines
+        'small': structured_document(rng, 1, 2),
+        # The common case: a few KB with nested headings
+        'typical': structured_document(rng, 8, 3),
+        # No headings at all: one section, token chunking does all the work
+        'no_headings': '\n\n'.join(paragraph(rng, 5) for _ in range(300)),
+        # One heading over a huge body (exported transcripts, logs)
+        'one_huge_section': '# Transcript\n\n' + '\n\n'.join(paragraph(rng, 5) for _ in range(600)),
+        # Thousands of tiny sections
+        'many_headings': '\n\n'.join(f"## Item {i}\n\n{sentence(rng)}" for i in range(3000)),
+        # A very large but well-structured document (~1 MB)
+        'large': structured_document(rng, 1000, 4),
+    }
+
+def bind_functions(module) -> dict:
+    """The timed entry points of a chunking module (current or a baseline revision)"""
+    return {
+        'split_by_headings': lambda doc: module.split_by_headings(doc),
+        'chunk_by_tokens': lambda doc: module.chunk_by_tokens(doc, 500, 100),
+        'chunk_markdown_file': lambda doc: module.chunk_markdown_file('bench.md', doc, max_tokens=500, overlap_tokens=100),
+    }
+
+FUNCTIONS = bind_functions(chunking)
+
+def time_repeat(func, doc: str, min_seconds: float) -> float:
+    """Seconds per call over one repeat running for at least min_seconds"""
+    gc.collect()
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func(doc)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+calibration_encoding = tiktoken.get_encoding("cl100k_base")
+
+def calibration_workload(doc: str):
+    """
+    The work chunking spends its time on (line regexes, split/join,
+    tiktoken encoding) without any chunking.py code, so a chunker
+    regression cannot hide in the normalization
+    """
+    for line in doc.split('\n'):
+        re.match(r'^(#{1,6})\s+(.+)$', line)
+    ' '.join(doc.split())
+    calibration_encoding.encode(doc)
+
+def run(functions: list, cases: list, min_seconds: float, repeats: int) -> dict:
+    corpus = build_corpus()
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'min_seconds': min_seconds,
+            'repeats': repeats,
+        },
+        'cases': {}
+    }
+
+    for case in cases:
+        doc = corpus[case]
+        size_mb = len(doc.encode('utf-8')) / 1e6
+        tokens = count_tokens(doc)
+        for name in functions:
+            # Calibration and function alternate repeat by repeat, so
+            # frequency drift and noisy neighbours hit both alike
+            timings, ratios = [], []
+            for _ in range(repeats):
+                calibration = time_repeat(calibration_workload, doc, min_seconds)
+                timings.append(time_repeat(FUNCTIONS[name], doc, min_seconds))
+                ratios.append(calibration / timings[-1])
+            seconds = statistics.median(timings)
+            key = f"{name}/{case}"
+            results['cases'][key] = {
+                'bytes': len(doc.encode('utf-8')),
+                'tokens': tokens,
+                'seconds_per_call': round(seconds, 6),
+                'mb_per_sec': round(size_mb / seconds, 3),
+                'tokens_per_sec': round(tokens / seconds, 1),
+                # Calls per calibration workload on the same document, comparable across machines
+                'normalized': round(statistics.median(ratios), 6),
+            }
+            print(f"   {key:<40} {size_mb / seconds:>9.2f} MB/s  {tokens / seconds:>12,.0f} tokens/s")
+
+    return results
+
+def git(*args) -> str:
+    return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+
+def load_revision(ref: str):
+    """lib/chunking.py as of a git revision, imported as a separate module"""
+    name = f"{ref}:lib/chunking.py"
+    module = types.ModuleType('chunking_baseline')
+    module.__file__ = name
+    exec(compile(git('show', name), name, 'exec'), module.__dict__)
+    return module
+
+def compare(functions: list, cases: list, min_seconds: float, repeats: int, baseline_module) -> dict:
+    """
+    Throughput of the working tree relative to the baseline revision
+    (>1 is faster), as the median of back-to-back repeat pairs
+    """
+    corpus = build_corpus()
+    previous_functions = bind_functions(baseline_module)
+    ratios = {}
+    for case in cases:
+        doc = corpus[case]
+        for name in functions:
+            pairs = []
+            for _ in range(repeats):
+                before = time_repeat(previous_functions[name], doc, min_seconds)
+                after = time_repeat(FUNCTIONS[name], doc, min_seconds)
+                pairs.append(before / after)
+            key = f"{name}/{case}"
+            ratios[key] = statistics.median(pairs)
+            print(f"   {key:<40} {ratios[key]:>6.2f}x baseline throughput")
+    return ratios
+
+def check_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """Cases whose normalized throughput fell more than `tolerance` below the baseline"""
+    regressions = []
+    for key, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(key)
+        if not previous:
+            continue
+        ratio = current['normalized'] / previous['normalized'] if previous['normalized'] else 1.0
+        if ratio < 1 - tolerance:
+            regressions.append((key, ratio))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark lib/chunking.py throughput')
+    parser.add_argument('--functions', default=','.join(FUNCTIONS), help='Comma-separated functions to time')
+    parser.add_argument('--cases', default='small,typical,no_headings,one_huge_section,many_headings,large', help='Comma-separated corpus cases')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='Minimum time per repeat')
+    parser.add_argument('--repeats', type=int, default=7, help='Repeats per case (median is kept)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline results file')
+    parser.add_argument('--update-baseline', action='store_true', help='Write HEAD and these results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='Exit 1 if any case regresses beyond --tolerance')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed throughput drop (fraction)')
+    parser.add_argument('--out', help='Also write results JSON here')
+
+    args = parser.parse_args()
+
+    functions = [name.strip() for name in args.functions.split(',') if name.strip()]
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = [name for name in functions if name not in FUNCTIONS] + [case for case in cases if case not in build_corpus()]
+    if unknown:
+        print(f"❌ Unknown functions/cases: {', '.join(unknown)}")
+        sys.exit(1)
+
+    print("✂️  Chunking benchmark")
+    print("=" * 60)
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"\n❌ No baseline at {args.baseline} (run with --update-baseline first)")
+            sys.exit(1)
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        baseline_module = None
+        if baseline.get('ref'):
+            try:
+                baseline_module = load_revision(baseline['ref'])
+            except (OSError, subprocess.CalledProcessError) as e:
+                print(f"⚠️  Revision {baseline['ref'][:12]} not in this clone ({e}); using stored numbers")
+
+        if baseline_module is not None:
+            print(f"\n⚖️  Working tree vs. {baseline['ref'][:12]}, back to back:")
+            ratios = compare(functions, cases, args.min_seconds, args.repeats, baseline_module)
+            regressions = [(key, ratio) for key, ratio in ratios.items() if ratio < 1 - args.tolerance]
+        elif baseline.get('cases'):
+            results = run(functions, cases, args.min_seconds, args.repeats)
+            regressions = check_regressions(results, baseline, args.tolerance)
+        else:
+            print("\n❌ Baseline has neither a loadable git revision nor stored results")
+            sys.exit(1)
+
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for key, ratio in regressions:
+                print(f"   {key}: {ratio:.0%} of baseline throughput")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.tolerance:.0%} of baseline")
+        sys.exit(0)
+
+    results = run(functions, cases, args.min_seconds, args.repeats)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.out}")
+
+    if args.update_baseline:
+        results['ref'] = git('rev-parse', 'HEAD')
+        if git('status', '--porcelain', '--', 'lib/chunking.py'):
+            print("⚠️  lib/chunking.py has uncommitted changes; the baseline revision is HEAD without them")
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline updated: {args.baseline} ({results['ref'][:12]})")
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Benchmark Embedding Layout
+Compares the wide layout (embedding stored in the markdown_chunks row next
+to chunk text and metadata) with the narrow one (chunk_embeddings holds
+only vectors; text is joined for the final top-k), on identical data in
+the rag_bench scratch schema
+
+For each layout and query shape (HNSW top-k, exact scan) it reports
+latency percentiles, shared buffer hits/reads from EXPLAIN (ANALYZE,
+BUFFERS), recall@k and the table/index sizes:
+
+    python benchmark_embedding_layout.py --rows 100000 --dimensions 1536
+    python benchmark_embedding_layout.py --rows 20000 --text-chars 4000 --out bench-results/layout.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+import numpy as np
+import psycopg2
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from search_metrics import summarize_explain
+from benchmark_search import (
+    BENCH_SCHEMA,
+    BLOCK_ROWS,
+    DATABASE_URL,
+    SyntheticSource,
+    exact_top_k,
+    git_commit,
+    latency_summary,
+    recall_at_k,
+    server_info,
+)
+
+SECTION_TYPES = ['complete_section', 'partial_section']
+
+def table_names(rows: int) -> dict:
+    return {
+        'wide': f"{BENCH_SCHEMA}.layout_wide_{rows}",
+        'narrow': f"{BENCH_SCHEMA}.layout_narrow_{rows}",
+        'text': f"{BENCH_SCHEMA}.layout_text_{rows}",
+    }
+
+class TextSource:
+    """Seeded filler text, so chunk rows are as wide as real ones (~4 chars per token)"""
+
+    def __init__(self, seed: int, text_chars: int, vocabulary: int = 4000):
+        rng = np.random.default_rng([seed, 3])
+        letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+        self.words = [''.join(rng.choice(letters, size=rng.integers(2, 10))) for _ in range(vocabulary)]
+        self.seed = seed
+        self.text_chars = text_chars
+
+    def block(self, block_index: int, count: int) -> list:
+        rng = np.random.default_rng([self.seed, 4, block_index])
+        picks = rng.integers(0, len(self.words), size=(count, self.text_chars // 5 + 1))
+        return [' '.join(self.words[i] for i in row)[:self.text_chars] for row in picks]
+
+def vector_literals(rows: np.ndarray) -> list:
+    buffer = io.StringIO()
+    np.savetxt(buffer, rows, fmt='%.6g', delimiter=',')
+    return ['[' + line + ']' for line in buffer.getvalue().splitlines()]
+
+def ensure_layouts(conn, vectors, texts, rows: int, source_key: dict, reload: bool) -> float:
+    """
+    Create and fill both layouts with the same rows unless identical ones exist
+
+    Returns load seconds (0.0 when the existing tables were reused).
+    """
+    tables = table_names(rows)
+    dimensions = vectors.dimensions
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA};")
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {BENCH_SCHEMA}.datasets (
+                table_name TEXT PRIMARY KEY,
+                rows BIGINT NOT NULL,
+                source JSONB NOT NULL,
+                loaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            );
+        """)
+        cur.execute(f"SELECT rows, source FROM {BENCH_SCHEMA}.datasets WHERE table_name = %s;", (tables['wide'],))
+        existing = cur.fetchone()
+        conn.commit()
+
+        if existing and not reload and existing[0] == rows and existing[1] == source_key:
+            print(f"   ♻️  Reusing {tables['wide']} / {tables['narrow']} ({rows:,} rows)")
+            return 0.0
+
+        print(f"   📥 Loading {rows:,} chunks into both layouts...")
+        start = time.perf_counter()
+        for table in tables.values():
+            cur.execute(f"DROP TABLE IF EXISTS {table};")
+        # Same columns as markdown_chunks (minus the ones the query never touches)
+        cur.execute(f"""
+            CREATE TABLE {tables['wide']} (
+                id BIGINT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                chunk_text TEXT NOT NULL,
+                metadata JSONB DEFAULT '{{}}',
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                embedding vector({dimensions}) NOT NULL
+            );
+        """)
+        cur.execute(f"""
+            CREATE TABLE {tables['text']} (
+                id BIGINT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                chunk_text TEXT NOT NULL,
+                metadata JSONB DEFAULT '{{}}',
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            );
+        """)
+        # chunk_embeddings_table_sql() minus the vault partitioning and foreign
+        # key, keyed by the synthetic bigint id (same storage setting)
+        cur.execute(f"""
+            CREATE TABLE {tables['narrow']} (
+                chunk_id BIGINT PRIMARY KEY,
+                embedding vector({dimensions}) NOT NULL
+            );
+        """)
+        if dimensions * 4 + 8 <= 8000:
+            cur.execute(f"ALTER TABLE {tables['narrow']} ALTER COLUMN embedding SET STORAGE PLAIN;")
+
+        for block_index, block_start in enumerate(range(0, rows, BLOCK_ROWS)):
+            count = min(BLOCK_ROWS, rows - block_start)
+            literals = vector_literals(vectors.block(block_index, count))
+            chunk_texts = texts.block(block_index, count)
+            text_lines = []
+            for offset, chunk_text in enumerate(chunk_texts):
+                row_id = block_start + offset
+                metadata = json.dumps({'section_type': SECTION_TYPES[row_id % 2], 'heading': chunk_text[:40]})
+                text_lines.append(f"{row_id}\tnotes/file-{row_id // 8}.md\t{row_id % 8}\t{chunk_text}\t{metadata}")
+            cur.copy_expert(
+                f"COPY {tables['wide']} (id, file_path, chunk_index, chunk_text, metadata, embedding) FROM STDIN",
+                io.StringIO(''.join(f"{line}\t{literal}\n" for line, literal in zip(text_lines, literals)))
+            )
+            cur.copy_expert(
+                f"COPY {tables['text']} (id, file_path, chunk_index, chunk_text, metadata) FROM STDIN",
+                io.StringIO(''.join(line + '\n' for line in text_lines))
+            )
+            cur.copy_expert(
+                f"COPY {tables['narrow']} (chunk_id, embedding) FROM STDIN",
+                io.StringIO(''.join(f"{block_start + offset}\t{literal}\n" for offset, literal in enumerate(literals)))
+            )
+            if (block_index + 1) % 10 == 0:
+                print(f"      {block_start + count:,}/{rows:,}", flush=True)
+
+        cur.execute("SET maintenance_work_mem = %s;", (os.getenv('RAG_MAINTENANCE_WORK_MEM', '1GB'),))
+        for layout in ('wide', 'narrow'):
+            cur.execute(f"""
+                CREATE INDEX {tables[layout].split('.')[-1]}_embedding_idx
+                ON {tables[layout]}
+                USING hnsw (embedding vector_cosine_ops)
+                WITH (m = 16, ef_construction = 64);
+            """)
+
+        cur.execute(f"""
+            INSERT INTO {BENCH_SCHEMA}.datasets (table_name, rows, source)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (table_name) DO UPDATE
+            SET rows = EXCLUDED.rows, source = EXCLUDED.source, loaded_at = NOW();
+        """, (tables['wide'], rows, json.dumps(source_key)))
+        conn.commit()
+
+    # VACUUM cannot run inside a transaction block
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for table in tables.values():
+            cur.execute(f"VACUUM ANALYZE {table};")
+    conn.autocommit = False
+
+    seconds = time.perf_counter() - start
+    print(f"   ✅ Loaded and indexed in {seconds:.1f}s")
+    return seconds
+
+def search_sql(layout: str, tables: dict) -> str:
+    """Top-k with text, shaped like match_markdown_chunks() / narrow_match_markdown_chunks()"""
+    if layout == 'wide':
+        return f"""
+            SELECT id, file_path, chunk_index, chunk_text, metadata,
+                   1 - (embedding <=> %(q)s::vector) AS similarity
+            FROM {tables['wide']}
+            ORDER BY embedding <=> %(q)s::vector
+            LIMIT %(k)s
+        """
+    return f"""
+        WITH top_chunks AS MATERIALIZED (
+            SELECT chunk_id, embedding <=> %(q)s::vector AS distance
+            FROM {tables['narrow']}
+            ORDER BY embedding <=> %(q)s::vector
+            LIMIT %(k)s
+        )
+        SELECT chunks.id, chunks.file_path, chunks.chunk_index, chunks.chunk_text, chunks.metadata,
+               1 - top_chunks.distance AS similarity
+        FROM top_chunks
+        JOIN {tables['text']} AS chunks ON chunks.id = top_chunks.chunk_id
+        ORDER BY top_chunks.distance
+    """
+
+def relation_sizes(cur, tables: dict) -> dict:
+    """Heap (with TOAST) and index bytes the vector search has to reach"""
+    sizes = {}
+    for layout in ('wide', 'narrow', 'text'):
+        cur.execute("SELECT pg_table_size(%s::regclass), pg_indexes_size(%s::regclass);", (tables[layout], tables[layout]))
+        table_bytes, index_bytes = cur.fetchone()
+        sizes[layout] = {'table_bytes': table_bytes, 'index_bytes': index_bytes}
+    return sizes
+
+def run_shape(conn, sql: str, query_literals: list, k: int, exact: bool, ef_search: int, explain_queries: int) -> tuple:
+    """
+    Latencies for every query, then buffers from EXPLAIN for the first few
+
+    Returns (ids per query, latencies ms, summed explain stats).
+    """
+    found = []
+    latencies = []
+    totals = {'shared_hit_blocks': 0, 'shared_read_blocks': 0, 'execution_ms': 0.0}
+    with conn.cursor() as cur:
+        cur.execute("SET enable_indexscan = %s;", ('off' if exact else 'on',))
+        cur.execute("SET hnsw.ef_search = %s;", (ef_search,))
+        # Warm-up: both layouts are compared with a hot cache
+        for literal in query_literals[:5]:
+            cur.execute(sql, {'q': literal, 'k': k})
+            cur.fetchall()
+
+        for literal in query_literals:
+            start = time.perf_counter()
+            cur.execute(sql, {'q': literal, 'k': k})
+            rows = cur.fetchall()
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append([row[0] for row in rows])
+
+        for literal in query_literals[:explain_queries]:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, {'q': literal, 'k': k})
+            summary = summarize_explain(cur.fetchone()[0])
+            for key in totals:
+                totals[key] += summary[key] or 0
+    conn.rollback()
+
+    explained = max(1, min(explain_queries, len(query_literals)))
+    buffers = {
+        'shared_hit_blocks_per_query': round(totals['shared_hit_blocks'] / explained, 1),
+        'shared_read_blocks_per_query': round(totals['shared_read_blocks'] / explained, 1),
+        'execution_ms_per_query': round(totals['execution_ms'] / explained, 3),
+    }
+    return found, latencies, buffers
+
+def benchmark(args) -> dict:
+    conn = psycopg2.connect(DATABASE_URL)
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+    conn.commit()
+
+    vectors = SyntheticSource(args.dimensions, args.seed)
+    texts = TextSource(args.seed, args.text_chars)
+    source_key = {
+        'kind': 'layout', 'seed': args.seed, 'dimensions': args.dimensions, 'text_chars': args.text_chars
+    }
+    tables = table_names(args.rows)
+
+    print(f"\n📏 {args.rows:,} chunks × {args.dimensions} dims, {args.text_chars} chars of text each")
+    load_seconds = ensure_layouts(conn, vectors, texts, args.rows, source_key, args.reload)
+
+    queries = vectors.queries(args.queries)
+    query_literals = vector_literals(queries)
+    print("   🎯 Computing exact ground truth...")
+    truth = exact_top_k(vectors, args.rows, queries, args.k)
+
+    with conn.cursor() as cur:
+        sizes = relation_sizes(cur, tables)
+    conn.commit()
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'server': server_info(conn),
+            'source': source_key,
+            'rows': args.rows,
+            'k': args.k,
+            'queries': len(queries),
+            'exact_queries': args.exact_queries,
+            'ef_search': args.ef_search,
+        },
+        'load_seconds': round(load_seconds, 2),
+        'sizes': sizes,
+        'shapes': {}
+    }
+
+    shapes = [('hnsw', False, query_literals, truth)]
+    if args.exact_queries:
+        shapes.append(('exact', True, query_literals[:args.exact_queries], truth[:args.exact_queries]))
+
+    for shape, exact, literals, expected in shapes:
+        results['shapes'][shape] = {}
+        for layout in ('wide', 'narrow'):
+            found, latencies, buffers = run_shape(
+                conn, search_sql(layout, tables), literals, args.k, exact, args.ef_search, args.explain_queries
+            )
+            results['shapes'][shape][layout] = dict(
+                buffers,
+                latency_ms=latency_summary(latencies),
+                **{f'recall@{args.k}': recall_at_k(found, expected)}
+            )
+
+    conn.close()
+    return results
+
+def report(results: dict):
+    """Side-by-side summary of a result file"""
+    k = results['meta']['k']
+    mb = 1024 * 1024
+    sizes = results['sizes']
+    print("\n📦 Sizes")
+    print(f"   wide   heap {sizes['wide']['table_bytes'] / mb:>9.1f} MB   indexes {sizes['wide']['index_bytes'] / mb:>9.1f} MB")
+    print(f"   narrow heap {sizes['narrow']['table_bytes'] / mb:>9.1f} MB   indexes {sizes['narrow']['index_bytes'] / mb:>9.1f} MB"
+          f"   (+ text {sizes['text']['table_bytes'] / mb:.1f} MB)")
+
+    for shape, layouts in results['shapes'].items():
+        print(f"\n🔍 {shape}")
+        for layout in ('wide', 'narrow'):
+            run = layouts[layout]
+            print(
+                f"   {layout:<7} p50 {run['latency_ms']['p50']:>8.2f}ms  p95 {run['latency_ms']['p95']:>8.2f}ms  "
+                f"buffers/query {run['shared_hit_blocks_per_query']:>9.1f} hit {run['shared_read_blocks_per_query']:>8.1f} read  "
+                f"recall@{k} {run[f'recall@{k}']:.3f}"
+            )
+        wide, narrow = layouts['wide'], layouts['narrow']
+        wide_blocks = wide['shared_hit_blocks_per_query'] + wide['shared_read_blocks_per_query']
+        narrow_blocks = narrow['shared_hit_blocks_per_query'] + narrow['shared_read_blocks_per_query']
+        if wide_blocks and wide['latency_ms']['p50']:
+            print(
+                f"   narrow/wide: buffers {narrow_blocks / wide_blocks:.2f}x, "
+                f"p50 {narrow['latency_ms']['p50'] / wide['latency_ms']['p50']:.2f}x"
+            )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the wide and narrow embedding layouts')
+    parser.add_argument('--rows', type=int, default=100000, help='Chunks loaded into each layout')
+    parser.add_argument('--dimensions', type=int, default=1536, help='Vector dimensions (384 local, 1536 OpenAI)')
+    parser.add_argument('--text-chars', type=int, default=2000, help='Characters of chunk text per row (~500 tokens)')
+    parser.add_argument('--queries', type=int, default=200, help='Queries for the HNSW shape')
+    parser.add_argument('--exact-queries', type=int, default=20, help='Queries for the exact-scan shape (0 skips it)')
+    parser.add_argument('--explain-queries', type=int, default=20, help='Queries re-run with EXPLAIN (ANALYZE, BUFFERS)')
+    parser.add_argument('--k', type=int, default=10, help='Results per query')
+    parser.add_argument('--ef-search', type=int, default=100, help='hnsw.ef_search for both layouts')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for vectors, text and queries')
+    parser.add_argument('--reload', action='store_true', help='Reload the tables even if identical ones exist')
+    parser.add_argument('--out', help='Write JSON results here (default: bench-results/layout-<commit>.json)')
+    parser.add_argument('--report', metavar='RESULTS', help='Print the summary of a result file and exit')
+
+    args = parser.parse_args()
+
+    if args.report:
+        with open(args.report) as f:
+            report(json.load(f))
+        sys.exit(0)
+
+    if not DATABASE_URL:
+        print("❌ BENCH_DATABASE_URL or DATABASE_URL not found in .env.local")
+        exit(1)
+
+    print("🏁 Embedding layout benchmark")
+    print("=" * 60)
+    print(f"   Writes only to the {BENCH_SCHEMA} schema of {DATABASE_URL.split('@')[-1]}")
+
+    results = benchmark(args)
+    report(results)
+
+    out_path = args.out or os.path.join('bench-results', f"layout-{results['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {out_path}")
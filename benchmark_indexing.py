@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Benchmark Indexing
+Runs index_vault_rag.py's indexing loop against a vault and a local
+Postgres and reports throughput plus time per stage
+(scan, read, chunk, embed, write, commit)
+
+Uses the deterministic mock embedder by default, so numbers reflect the
+pipeline rather than model speed:
+
+    python benchmark_indexing.py --vault ./demo-vault --copies 20 --mock-latency-ms 5
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import psycopg2
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from search_metrics import StageTimer
+
+# Load environment variables
+load_dotenv('.env.local')
+
+# Use a throwaway local database: the benchmark rewrites markdown_chunks rows
+DATABASE_URL = os.getenv('BENCH_DATABASE_URL') or os.getenv('DATABASE_URL')
+
+STAGES = ('scan', 'read', 'chunk', 'embed', 'write', 'commit')
+
+def git_commit() -> str:
+    """Short commit hash of the working tree (None outside a git checkout)"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def embedding_dimensions(conn) -> int:
+    """Declared dimension of markdown_chunks.embedding (vector typmod)"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT atttypmod
+            FROM pg_attribute
+            WHERE attrelid = 'markdown_chunks'::regclass
+              AND attname = 'embedding';
+        """)
+        row = cur.fetchone()
+    conn.rollback()
+    return row[0] if row else None
+
+def replicate_vault(source: str, copies: int) -> str:
+    """Copy the vault `copies` times into a temp dir (copy-N/ subfolders)"""
+    target = tempfile.mkdtemp(prefix='bench-vault-')
+    for copy in range(copies):
+        shutil.copytree(source, os.path.join(target, f'copy-{copy}'), ignore=shutil.ignore_patterns('.*'))
+    return target
+
+def truncate_index(conn):
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE markdown_chunks, markdown_files CASCADE;")
+    conn.commit()
+
+def run_benchmark(vault_path: str, batch_size: int, verbose: bool) -> dict:
+    # Imported here so RAG_EMBEDDER / DATABASE_URL overrides apply
+    import index_vault_rag
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with output:
+        stats = index_vault_rag.index_vault(vault_path, batch_size, timer=timer)
+    wall = time.perf_counter() - start
+
+    stages = {stage: round(timer.timings.get(stage, 0.0), 1) for stage in STAGES}
+    stages['other'] = round(max(0.0, wall * 1000 - sum(timer.timings.get(stage, 0.0) for stage in STAGES)), 1)
+
+    return {
+        'files': stats['files'],
+        'chunks': stats['chunks'],
+        'tokens': stats['tokens'],
+        'bytes': stats['bytes'],
+        'errors': stats['errors'],
+        'wall_seconds': round(wall, 3),
+        'files_per_sec': round(stats['files'] / wall, 2) if wall else None,
+        'chunks_per_sec': round(stats['chunks'] / wall, 2) if wall else None,
+        'tokens_per_sec': round(stats['tokens'] / wall, 1) if wall else None,
+        'mb_per_sec': round(stats['bytes'] / 1e6 / wall, 3) if wall else None,
+        'stages_ms': stages,
+        'stages_pct': {stage: round(ms / (wall * 1000) * 100, 1) for stage, ms in stages.items()} if wall else {},
+    }
+
+def print_report(result: dict):
+    print("\n📊 Indexing throughput")
+    print("=" * 60)
+    print(f"   Files:  {result['files']:,} ({result['files_per_sec']} files/s)")
+    print(f"   Chunks: {result['chunks']:,} ({result['chunks_per_sec']} chunks/s)")
+    print(f"   Tokens: {result['tokens']:,} ({result['tokens_per_sec']:,} tokens/s)")
+    print(f"   Input:  {result['bytes'] / 1e6:.2f} MB ({result['mb_per_sec']} MB/s)")
+    print(f"   Wall:   {result['wall_seconds']}s")
+    if result['errors']:
+        print(f"   ⚠️  Errors: {result['errors']}")
+    print("\n   Stage breakdown:")
+    for stage, ms in result['stages_ms'].items():
+        print(f"   {stage:<8} {ms:>10.1f} ms  {result['stages_pct'].get(stage, 0):>5.1f}%")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark vault indexing throughput')
+    parser.add_argument('--vault', default='./demo-vault', help='Vault to index')
+    parser.add_argument('--copies', type=int, default=1, help='Replicate the vault N times into a temp dir')
+    parser.add_argument('--batch-size', type=int, default=10, help='Chunks per embedding/insert batch')
+    parser.add_argument('--embedder', choices=['mock', 'local'], default='mock', help='Mock hash embedder or the real local model')
+    parser.add_argument('--mock-latency-ms', type=float, default=0.0, help='Mock embedder latency per call')
+    parser.add_argument('--mock-ms-per-1k-chars', type=float, default=0.0, help='Mock embedder latency per 1k input chars')
+    parser.add_argument('--truncate', action='store_true', help='TRUNCATE markdown_chunks/markdown_files first')
+    parser.add_argument('--verbose', action='store_true', help="Show the indexer's own output")
+    parser.add_argument('--out', help='Write JSON results here (default: bench-results/indexing-<commit>.json)')
+    parser.add_argument('--baseline', help='Fail if files/sec drops more than --tolerance below this result file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed files/sec regression (fraction)')
+
+    args = parser.parse_args()
+
+    if not DATABASE_URL:
+        print("❌ BENCH_DATABASE_URL or DATABASE_URL not found in .env.local")
+        exit(1)
+
+    if not os.path.exists(args.vault):
+        print(f"❌ Vault not found: {args.vault}")
+        exit(1)
+
+    print("🏁 Indexing benchmark")
+    print("=" * 60)
+    print(f"   Database: {DATABASE_URL.split('@')[-1]}")
+
+    conn = psycopg2.connect(DATABASE_URL)
+    dimensions = embedding_dimensions(conn)
+    if args.truncate:
+        truncate_index(conn)
+        print("   🧹 Truncated markdown_chunks and markdown_files")
+    conn.close()
+
+    # The indexer reads these at import time
+    os.environ['DATABASE_URL'] = DATABASE_URL
+    os.environ['RAG_EMBEDDER'] = args.embedder
+    if args.embedder == 'mock':
+        os.environ['RAG_MOCK_DIMENSIONS'] = str(dimensions or 384)
+        os.environ['RAG_MOCK_LATENCY_MS'] = str(args.mock_latency_ms)
+        os.environ['RAG_MOCK_MS_PER_1K_CHARS'] = str(args.mock_ms_per_1k_chars)
+
+    vault_path = os.path.abspath(args.vault)
+    temp_vault = None
+    if args.copies > 1:
+        temp_vault = vault_path = replicate_vault(vault_path, args.copies)
+        print(f"   📁 Replicated vault {args.copies}x into {vault_path}")
+
+    try:
+        result = run_benchmark(vault_path, args.batch_size, args.verbose)
+    finally:
+        if temp_vault:
+            shutil.rmtree(temp_vault, ignore_errors=True)
+
+    result = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'host': platform.node(),
+            'vault': os.path.abspath(args.vault),
+            'copies': args.copies,
+            'batch_size': args.batch_size,
+            'embedder': args.embedder,
+            'dimensions': dimensions,
+            'mock_latency_ms': args.mock_latency_ms,
+            'mock_ms_per_1k_chars': args.mock_ms_per_1k_chars,
+        },
+        **result
+    }
+    print_report(result)
+
+    out_path = args.out or os.path.join('bench-results', f"indexing-{result['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\n💾 Results written to {out_path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        floor = baseline['files_per_sec'] * (1 - args.tolerance)
+        if result['files_per_sec'] < floor:
+            print(f"❌ Regression: {result['files_per_sec']} files/s < {floor:.2f} (baseline {baseline['files_per_sec']})")
+            sys.exit(1)
+        print(f"✅ Within {args.tolerance:.0%} of baseline ({baseline['files_per_sec']} files/s)")
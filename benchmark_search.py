@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+"""
+Benchmark Search
+Loads synthetic (or replicated) chunk embeddings at several scales into a
+scratch schema and measures recall@k, latency percentiles and QPS under
+concurrency for each vector index configuration
+
+Results are written as JSON so runs can be diffed between commits:
+
+    python benchmark_search.py --scales 10000,100000 --out bench-results/search.json
+    python benchmark_search.py --compare bench-results/old.json bench-results/new.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import numpy as np
+import psycopg2
+
+# Load environment variables
+load_dotenv('.env.local')
+
+# Use a throwaway local database when possible; only the rag_bench schema is touched
+DATABASE_URL = os.getenv('BENCH_DATABASE_URL') or os.getenv('DATABASE_URL')
+
+BENCH_SCHEMA = 'rag_bench'
+
+# Rows generated (and COPY'd) per block; data is regenerated block by block
+# from the seed, so 1M x 1536 never has to fit in memory
+BLOCK_ROWS = 10000
+
+# name -> index definition and the search-time knob swept for it
+INDEX_CONFIGS = {
+    'flat': {
+        'kind': 'flat',
+        'sweep': None,
+    },
+    'hnsw_m16': {
+        'kind': 'hnsw',
+        'with': {'m': 16, 'ef_construction': 64},
+        'sweep': ('hnsw.ef_search', [40, 100, 200]),
+    },
+    'hnsw_m32': {
+        'kind': 'hnsw',
+        'with': {'m': 32, 'ef_construction': 128},
+        'sweep': ('hnsw.ef_search', [40, 100, 200]),
+    },
+    'ivfflat': {
+        'kind': 'ivfflat',
+        'with': {'lists': 'auto'},
+        'sweep': ('ivfflat.probes', [1, 10, 32]),
+    },
+    'halfvec_hnsw': {
+        'kind': 'halfvec_hnsw',
+        'with': {'m': 16, 'ef_construction': 64},
+        'sweep': ('hnsw.ef_search', [40, 100, 200]),
+    },
+}
+
+DEFAULT_CONFIGS = 'hnsw_m16,ivfflat,halfvec_hnsw'
+
+def git_commit() -> str:
+    """Short commit hash of the working tree (None outside a git checkout)"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def normalize(rows: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (rows / norms).astype(np.float32)
+
+class SyntheticSource:
+    """
+    Clustered unit vectors: real chunk embeddings cluster by topic, which
+    is what makes ANN recall interesting (uniform noise is unrealistically easy)
+    """
+
+    def __init__(self, dimensions: int, seed: int, clusters: int = 256, spread: float = 0.35):
+        self.dimensions = dimensions
+        self.seed = seed
+        self.spread = spread
+        self.centers = normalize(np.random.default_rng(seed).standard_normal((clusters, dimensions)))
+
+    def _sample(self, rng, count: int) -> np.ndarray:
+        picks = rng.integers(0, len(self.centers), size=count)
+        noise = rng.standard_normal((count, self.dimensions)).astype(np.float32)
+        return normalize(self.centers[picks] + self.spread * noise / np.sqrt(self.dimensions) * 4)
+
+    def block(self, block_index: int, count: int) -> np.ndarray:
+        return self._sample(np.random.default_rng([self.seed, 1, block_index]), count)
+
+    def queries(self, count: int) -> np.ndarray:
+        return self._sample(np.random.default_rng([self.seed, 2]), count)
+
+class ReplicatedSource:
+    """
+    Existing vault embeddings replicated with small perturbations, so the
+    benchmark keeps the real embedding distribution at larger scales
+    """
+
+    def __init__(self, base: np.ndarray, seed: int, jitter: float = 0.05):
+        self.base = normalize(base)
+        self.dimensions = base.shape[1]
+        self.seed = seed
+        self.jitter = jitter
+
+    def _perturb(self, rng, rows: np.ndarray) -> np.ndarray:
+        noise = rng.standard_normal(rows.shape).astype(np.float32) / np.sqrt(self.dimensions)
+        return normalize(rows + self.jitter * noise)
+
+    def block(self, block_index: int, count: int) -> np.ndarray:
+        start = block_index * BLOCK_ROWS
+        rows = self.base[np.arange(start, start + count) % len(self.base)]
+        return self._perturb(np.random.default_rng([self.seed, 1, block_index]), rows)
+
+    def queries(self, count: int) -> np.ndarray:
+        rng = np.random.default_rng([self.seed, 2])
+        rows = self.base[rng.integers(0, len(self.base), size=count)]
+        return self._perturb(rng, rows)
+
+def load_replicated_base(conn, limit: int) -> np.ndarray:
+    """Read up to `limit` stored chunk embeddings in a stable order"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT embedding::text
+            FROM public.markdown_chunks
+            WHERE embedding IS NOT NULL
+            ORDER BY id
+            LIMIT %s;
+        """, (limit,))
+        values = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    if not values:
+        raise RuntimeError("No embedded chunks in markdown_chunks to replicate")
+    flat = np.array(','.join(value.strip('[]') for value in values).split(','), dtype=np.float32)
+    return flat.reshape(len(values), -1)
+
+def vector_literal_lines(ids: np.ndarray, rows: np.ndarray) -> str:
+    """COPY text rows: id<TAB>[v1,v2,...]"""
+    buffer = io.StringIO()
+    np.savetxt(buffer, rows, fmt='%.6g', delimiter=',')
+    lines = buffer.getvalue().splitlines()
+    return ''.join(f"{row_id}\t[{line}]\n" for row_id, line in zip(ids, lines))
+
+def table_name(rows: int) -> str:
+    return f"{BENCH_SCHEMA}.chunks_{rows}"
+
+def ensure_dataset(conn, source, rows: int, source_key: dict, reload: bool) -> float:
+    """
+    Create and fill rag_bench.chunks_<rows> unless an identical dataset exists
+
+    Returns load seconds (0.0 when the existing table was reused).
+    """
+    table = table_name(rows)
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA};")
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {BENCH_SCHEMA}.datasets (
+                table_name TEXT PRIMARY KEY,
+                rows BIGINT NOT NULL,
+                source JSONB NOT NULL,
+                loaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            );
+        """)
+        cur.execute(f"SELECT rows, source FROM {BENCH_SCHEMA}.datasets WHERE table_name = %s;", (table,))
+        existing = cur.fetchone()
+        conn.commit()
+
+        if existing and not reload and existing[0] == rows and existing[1] == source_key:
+            print(f"   ♻️  Reusing {table} ({rows:,} rows)")
+            return 0.0
+
+        print(f"   📥 Loading {rows:,} vectors into {table}...")
+        start = time.perf_counter()
+        cur.execute(f"DROP TABLE IF EXISTS {table};")
+        cur.execute(f"""
+            CREATE TABLE {table} (
+                id BIGINT PRIMARY KEY,
+                embedding vector({source.dimensions}) NOT NULL
+            );
+        """)
+        for block_index, block_start in enumerate(range(0, rows, BLOCK_ROWS)):
+            count = min(BLOCK_ROWS, rows - block_start)
+            data = source.block(block_index, count)
+            ids = np.arange(block_start, block_start + count)
+            cur.copy_expert(f"COPY {table} (id, embedding) FROM STDIN", io.StringIO(vector_literal_lines(ids, data)))
+            if (block_index + 1) % 10 == 0:
+                print(f"      {block_start + count:,}/{rows:,}", flush=True)
+
+        cur.execute(f"""
+            INSERT INTO {BENCH_SCHEMA}.datasets (table_name, rows, source)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (table_name) DO UPDATE
+            SET rows = EXCLUDED.rows, source = EXCLUDED.source, loaded_at = NOW();
+        """, (table, rows, json.dumps(source_key)))
+        conn.commit()
+
+    # VACUUM cannot run inside a transaction block
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"VACUUM ANALYZE {table};")
+    conn.autocommit = False
+
+    seconds = time.perf_counter() - start
+    print(f"   ✅ Loaded in {seconds:.1f}s")
+    return seconds
+
+def exact_top_k(source, rows: int, queries: np.ndarray, k: int) -> np.ndarray:
+    """
+    Ground truth computed in NumPy by regenerating the dataset block by block
+
+    Much faster than sequential scans in Postgres at 1M rows and does not
+    depend on the database's own distance code.
+    """
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+
+    for block_index, block_start in enumerate(range(0, rows, BLOCK_ROWS)):
+        count = min(BLOCK_ROWS, rows - block_start)
+        data = source.block(block_index, count)
+        scores = queries @ data.T
+
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_ids = np.concatenate([
+            best_ids,
+            np.broadcast_to(np.arange(block_start, block_start + count), scores.shape)
+        ], axis=1)
+        keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+        best_ids = np.take_along_axis(merged_ids, keep, axis=1)
+
+    return best_ids
+
+def lists_for(rows: int, lists) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above"""
+    if lists != 'auto':
+        return int(lists)
+    if rows <= 1000000:
+        return max(10, rows // 1000)
+    return int(np.sqrt(rows))
+
+def index_sql(config: dict, table: str, rows: int, dimensions: int) -> str:
+    """CREATE INDEX statement for a config (None for flat)"""
+    kind = config['kind']
+    options = dict(config.get('with', {}))
+    index_name = table.split('.')[-1] + '_bench_idx'
+
+    if kind == 'flat':
+        return None
+    if kind == 'ivfflat':
+        options['lists'] = lists_for(rows, options.get('lists', 'auto'))
+    with_clause = ', '.join(f"{key} = {value}" for key, value in options.items())
+
+    if kind == 'hnsw':
+        target = 'USING hnsw (embedding vector_cosine_ops)'
+    elif kind == 'ivfflat':
+        target = 'USING ivfflat (embedding vector_cosine_ops)'
+    elif kind == 'halfvec_hnsw':
+        target = f'USING hnsw ((embedding::halfvec({dimensions})) halfvec_cosine_ops)'
+    else:
+        raise ValueError(f"Unknown index kind: {kind}")
+
+    return f"CREATE INDEX {index_name} ON {table} {target} WITH ({with_clause});"
+
+def search_sql(config: dict, table: str, dimensions: int) -> str:
+    """Top-k query shaped so the config's index is usable"""
+    if config['kind'] == 'halfvec_hnsw':
+        return f"""
+            SELECT id FROM {table}
+            ORDER BY embedding::halfvec({dimensions}) <=> %s::halfvec({dimensions})
+            LIMIT %s;
+        """
+    return f"""
+        SELECT id FROM {table}
+        ORDER BY embedding <=> %s::vector
+        LIMIT %s;
+    """
+
+def drop_bench_indexes(conn, table: str):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP INDEX IF EXISTS {table}_bench_idx;")
+    conn.commit()
+
+def build_index(conn, config: dict, table: str, rows: int, dimensions: int, maintenance_work_mem: str) -> dict:
+    """Build one config's index (the only vector index on the table) and measure it"""
+    drop_bench_indexes(conn, table)
+    sql = index_sql(config, table, rows, dimensions)
+    if sql is None:
+        return {'build_seconds': 0.0, 'index_bytes': 0}
+
+    with conn.cursor() as cur:
+        cur.execute("SET maintenance_work_mem = %s;", (maintenance_work_mem,))
+        start = time.perf_counter()
+        cur.execute(sql)
+        conn.commit()
+        seconds = time.perf_counter() - start
+        cur.execute("SELECT pg_relation_size(%s::regclass);", (f"{table}_bench_idx",))
+        index_bytes = cur.fetchone()[0]
+    conn.commit()
+    return {'build_seconds': round(seconds, 2), 'index_bytes': index_bytes}
+
+def connect_for_search(config: dict, setting_value):
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        if config['kind'] == 'flat':
+            # Make sure the baseline is a real exact scan
+            cur.execute("SET enable_indexscan = off;")
+        elif setting_value is not None:
+            cur.execute(f"SET {config['sweep'][0]} = %s;", (setting_value,))
+    return conn
+
+def run_queries(config: dict, setting_value, sql: str, query_literals: list, k: int, concurrency: int, rounds: int):
+    """
+    Run the query set `rounds` times across `concurrency` connections
+
+    Returns (ids per query from the first round, latencies in ms, wall seconds).
+    """
+    total = len(query_literals) * rounds
+    next_item = [0]
+    lock = threading.Lock()
+    latencies = []
+    found = [None] * len(query_literals)
+    errors = []
+
+    def worker():
+        conn = connect_for_search(config, setting_value)
+        local_latencies = []
+        try:
+            with conn.cursor() as cur:
+                while True:
+                    with lock:
+                        item = next_item[0]
+                        next_item[0] += 1
+                    if item >= total:
+                        break
+                    query_index = item % len(query_literals)
+                    start = time.perf_counter()
+                    cur.execute(sql, (query_literals[query_index], k))
+                    ids = [row[0] for row in cur.fetchall()]
+                    local_latencies.append((time.perf_counter() - start) * 1000)
+                    if item < len(query_literals):
+                        found[query_index] = ids
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+            with lock:
+                latencies.extend(local_latencies)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+    return found, latencies, wall
+
+def latency_summary(latencies: list) -> dict:
+    values = np.asarray(latencies)
+    return {
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'mean': round(float(values.mean()), 3),
+    }
+
+def recall_at_k(found: list, truth: np.ndarray) -> float:
+    hits = 0
+    for ids, expected in zip(found, truth):
+        hits += len(set(ids or []) & set(expected.tolist()))
+    return round(hits / truth.size, 4)
+
+def server_info(conn) -> dict:
+    with conn.cursor() as cur:
+        cur.execute("SHOW server_version;")
+        server_version = cur.fetchone()[0]
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+        row = cur.fetchone()
+    conn.commit()
+    return {'postgres': server_version, 'pgvector': row[0] if row else None}
+
+def supports_halfvec(pgvector_version: str) -> bool:
+    if not pgvector_version:
+        return False
+    major, minor = (int(part) for part in pgvector_version.split('.')[:2])
+    return (major, minor) >= (0, 7)
+
+def benchmark(args) -> dict:
+    conn = psycopg2.connect(DATABASE_URL)
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+    conn.commit()
+    info = server_info(conn)
+
+    if args.source == 'replicate':
+        source = ReplicatedSource(load_replicated_base(conn, args.replicate_base), args.seed)
+        source_key = {'kind': 'replicate', 'seed': args.seed, 'base': args.replicate_base, 'dimensions': source.dimensions}
+    else:
+        source = SyntheticSource(args.dimensions, args.seed)
+        source_key = {'kind': 'synthetic', 'seed': args.seed, 'dimensions': source.dimensions}
+
+    queries = source.queries(args.queries)
+    query_literals = ['[' + ','.join(f"{value:.6g}" for value in query) + ']' for query in queries]
+    concurrency_levels = [int(value) for value in args.concurrency.split(',') if value.strip()]
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'host': platform.node(),
+            'server': info,
+            'source': source_key,
+            'k': args.k,
+            'queries': len(queries),
+            'rounds': args.rounds,
+            'concurrency': concurrency_levels,
+        },
+        'scales': {}
+    }
+
+    for rows in [int(value) for value in args.scales.split(',') if value.strip()]:
+        print(f"\n📏 Scale: {rows:,} chunks")
+        table = table_name(rows)
+        load_seconds = ensure_dataset(conn, source, rows, source_key, args.reload)
+
+        print("   🎯 Computing exact ground truth...")
+        truth_start = time.perf_counter()
+        truth = exact_top_k(source, rows, queries, args.k)
+        print(f"   ✅ Ground truth in {time.perf_counter() - truth_start:.1f}s")
+
+        scale_result = {'load_seconds': round(load_seconds, 2), 'configs': {}}
+
+        for name in args.configs.split(','):
+            name = name.strip()
+            config = INDEX_CONFIGS[name]
+            if config['kind'] == 'halfvec_hnsw' and not supports_halfvec(info['pgvector']):
+                print(f"   ⏭️  {name}: needs pgvector >= 0.7 (have {info['pgvector']})")
+                scale_result['configs'][name] = {'skipped': 'halfvec requires pgvector >= 0.7'}
+                continue
+
+            print(f"   🏗️  {name}: building index...")
+            built = build_index(conn, config, table, rows, source.dimensions, args.maintenance_work_mem)
+            sql = search_sql(config, table, source.dimensions)
+
+            runs = []
+            setting_name, setting_values = config['sweep'] or (None, [None])
+            for setting_value in setting_values:
+                run = {'setting': setting_name, 'value': setting_value, 'concurrency': {}}
+                for concurrency in concurrency_levels:
+                    found, latencies, wall = run_queries(
+                        config, setting_value, sql, query_literals, args.k, concurrency, args.rounds
+                    )
+                    if f'recall@{args.k}' not in run:
+                        run[f'recall@{args.k}'] = recall_at_k(found, truth)
+                    run['concurrency'][str(concurrency)] = {
+                        'qps': round(len(latencies) / wall, 1),
+                        'latency_ms': latency_summary(latencies),
+                    }
+
+                single = run['concurrency'][str(concurrency_levels[0])]
+                label = f"{setting_name}={setting_value}" if setting_name else 'exact'
+                print(
+                    f"      {label:<22} recall@{args.k} {run[f'recall@{args.k}']:.3f}  "
+                    f"p50 {single['latency_ms']['p50']:.2f}ms  p99 {single['latency_ms']['p99']:.2f}ms  "
+                    f"max QPS {max(level['qps'] for level in run['concurrency'].values()):.0f}",
+                    flush=True
+                )
+                runs.append(run)
+
+            scale_result['configs'][name] = dict(built, runs=runs)
+
+        drop_bench_indexes(conn, table)
+        if args.drop:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {table};")
+                cur.execute(f"DELETE FROM {BENCH_SCHEMA}.datasets WHERE table_name = %s;", (table,))
+            conn.commit()
+
+        results['scales'][str(rows)] = scale_result
+
+    conn.close()
+    return results
+
+def flatten_runs(results: dict) -> dict:
+    """(scale, config, setting) -> run, for comparing two result files"""
+    flat = {}
+    for scale, scale_result in results.get('scales', {}).items():
+        for name, config_result in scale_result.get('configs', {}).items():
+            for run in config_result.get('runs', []):
+                flat[(scale, name, f"{run['setting']}={run['value']}")] = run
+    return flat
+
+def compare(old_path: str, new_path: str):
+    """Print recall and latency deltas between two result files"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    k = new['meta']['k']
+    old_runs = flatten_runs(old)
+    new_runs = flatten_runs(new)
+
+    print(f"📊 {old['meta'].get('commit')} → {new['meta'].get('commit')}")
+    print("=" * 60)
+    for key in sorted(new_runs, key=lambda item: (int(item[0]), item[1], item[2])):
+        if key not in old_runs:
+            continue
+        before, after = old_runs[key], new_runs[key]
+        level = str(new['meta']['concurrency'][0])
+        if level not in before['concurrency'] or level not in after['concurrency']:
+            continue
+        p95_before = before['concurrency'][level]['latency_ms']['p95']
+        p95_after = after['concurrency'][level]['latency_ms']['p95']
+        recall_delta = after[f'recall@{k}'] - before[f'recall@{k}']
+        p95_change = (p95_after - p95_before) / p95_before * 100 if p95_before else 0.0
+        flag = '⚠️ ' if recall_delta < -0.01 or p95_change > 10 else '  '
+        print(
+            f"{flag}{key[0]:>8} {key[1]:<14} {key[2]:<22} "
+            f"recall {recall_delta:+.4f}  p95 {p95_before:.2f} → {p95_after:.2f}ms ({p95_change:+.1f}%)"
+        )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark vector search recall and latency at scale')
+    parser.add_argument('--scales', default='10000,100000', help='Comma-separated chunk counts (e.g. 10000,100000,1000000)')
+    parser.add_argument('--configs', default=DEFAULT_CONFIGS, help=f"Comma-separated index configs ({', '.join(INDEX_CONFIGS)})")
+    parser.add_argument('--source', choices=['synthetic', 'replicate'], default='synthetic', help='Synthetic clusters or replicated vault embeddings')
+    parser.add_argument('--replicate-base', type=int, default=20000, help='Stored embeddings used as the replication base')
+    parser.add_argument('--dimensions', type=int, default=384, help='Synthetic vector dimensions (384 local, 1536 OpenAI)')
+    parser.add_argument('--queries', type=int, default=200, help='Size of the fixed query set')
+    parser.add_argument('--k', type=int, default=10, help='Results per query (recall@k)')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated client counts')
+    parser.add_argument('--rounds', type=int, default=3, help='Passes over the query set per concurrency level')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for data and queries')
+    parser.add_argument('--maintenance-work-mem', default='1GB', help='maintenance_work_mem for index builds')
+    parser.add_argument('--reload', action='store_true', help='Reload datasets even if an identical one exists')
+    parser.add_argument('--drop', action='store_true', help='Drop each dataset table after benchmarking it')
+    parser.add_argument('--out', help='Write JSON results here (default: bench-results/search-<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two result files and exit')
+
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    if not DATABASE_URL:
+        print("❌ BENCH_DATABASE_URL or DATABASE_URL not found in .env.local")
+        exit(1)
+
+    unknown = [name for name in args.configs.split(',') if name.strip() not in INDEX_CONFIGS]
+    if unknown:
+        print(f"❌ Unknown configs: {', '.join(unknown)}")
+        sys.exit(1)
+
+    print("🏁 Search benchmark")
+    print("=" * 60)
+    print(f"   Writes only to the {BENCH_SCHEMA} schema of {DATABASE_URL.split('@')[-1]}")
+
+    results = benchmark(args)
+
+    out_path = args.out or os.path.join('bench-results', f"search-{results['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {out_path}")
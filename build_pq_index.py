@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Build IVF-PQ Index
+Compresses an exported local index (export_local_index.py) for million-chunk vaults
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from pq_index import build_ivfpq, IVFPQIndex, evaluate_ivfpq
+
+def main():
+    parser = argparse.ArgumentParser(description='Build an IVF-PQ index for the local search backend')
+    parser.add_argument('--index', default='./local-index', help='Local index directory')
+    parser.add_argument('--nlist', type=int, default=None, help='Inverted lists (default: ~4*sqrt(n))')
+    parser.add_argument('--m', type=int, default=None, help='PQ sub-quantizers, must divide dims (default: dims/8)')
+    parser.add_argument('--train-sample', type=int, default=100000, help='Rows used for training')
+    parser.add_argument('--iterations', type=int, default=20, help='k-means iterations')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--evaluate', type=int, default=200, help='Sampled queries for recall/QPS (0 to skip)')
+    parser.add_argument('--nprobe', type=int, default=16, help='Lists probed during evaluation')
+    parser.add_argument('--rerank', type=int, default=100, help='Candidates re-ranked exactly during evaluation')
+
+    args = parser.parse_args()
+    index_dir = os.path.abspath(args.index)
+
+    if not os.path.exists(os.path.join(index_dir, 'embeddings.npy')):
+        print(f"❌ No exported index in {index_dir}. Run export_local_index.py first.")
+        exit(1)
+
+    print("🗜️  Building IVF-PQ index...")
+    print("=" * 60)
+
+    start_time = time.time()
+    manifest = build_ivfpq(
+        index_dir,
+        nlist=args.nlist,
+        m=args.m,
+        train_sample=args.train_sample,
+        iterations=args.iterations,
+        seed=args.seed
+    )
+    elapsed = time.time() - start_time
+
+    print(f"✅ Encoded {manifest['count']} chunks in {elapsed:.1f}s")
+    print(f"   - nlist={manifest['nlist']}, m={manifest['m']}")
+    print(f"   - {manifest['bytes_per_chunk']} bytes/chunk vs {manifest['flat_bytes_per_chunk']} flat "
+          f"({manifest['flat_bytes_per_chunk'] / manifest['bytes_per_chunk']:.1f}x smaller)")
+
+    if args.evaluate > 0:
+        print(f"\n📏 Evaluating against exact search ({args.evaluate} queries)...")
+        index = IVFPQIndex(index_dir)
+
+        # Perturbed stored vectors as queries, so a query is not trivially its own neighbor
+        rng = np.random.default_rng(args.seed + 1)
+        rows = rng.choice(len(index), size=min(args.evaluate, len(index)), replace=False)
+        queries = np.asarray(index.flat.embeddings[np.sort(rows)], dtype=np.float32)
+        queries += rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+
+        evaluation = evaluate_ivfpq(index, queries, k=10, nprobe=args.nprobe, rerank=args.rerank)
+        index.close()
+
+        manifest['evaluation'] = evaluation
+        with open(os.path.join(index_dir, 'ivfpq.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        print(json.dumps(evaluation, indent=2))
+
+    print(f"\n🔍 Search with:")
+    print(f"   RAG_BACKEND=local RAG_LOCAL_ANN=ivfpq RAG_LOCAL_INDEX={index_dir} python3 rag_search.py \"your query\"")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Embed Pending Chunks
+Always-on backfill worker: indexers write chunk text with a NULL embedding
+(searchable by full-text at once), a trigger NOTIFYs, and this worker fills
+the embeddings in batches, keeping the embedding model off the write path
+
+    python embed_pending_chunks.py --model ada002             # run until stopped
+    python embed_pending_chunks.py --model minilm --once      # drain and exit (cron)
+    python embed_pending_chunks.py --shard 0/2 & python embed_pending_chunks.py --shard 1/2
+
+Writers: index_vault_rag.py --defer-embeddings, index_vault_queue.py work --defer-embeddings
+"""
+
+import os
+import sys
+import time
+import select
+import signal
+import argparse
+import threading
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2.extras import execute_values
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from embedders import EMBEDDING_MODELS, get_embedder
+from rag_schema import (
+    EMBEDDING_PENDING_CHANNEL,
+    EMBEDDING_PENDING_INDEX_SQL,
+    EMBEDDING_PENDING_TRIGGER_SQL,
+    REFRESH_FILE_CENTROID_SQL,
+)
+
+# Load environment variables
+load_dotenv('.env.local')
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+if not DATABASE_URL:
+    print("❌ DATABASE_URL not found in .env.local")
+    exit(1)
+
+def embedding_dimensions(cur) -> int:
+    """Declared dimension of markdown_chunks.embedding (vector typmod)"""
+    cur.execute("""
+        SELECT atttypmod
+        FROM pg_attribute
+        WHERE attrelid = 'markdown_chunks'::regclass
+          AND attname = 'embedding';
+    """)
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def fetch_pending(cur, batch_size: int, shard: tuple, skip_ids: list) -> list:
+    """
+    Next batch of (id, chunk_text, file_path, updated_at, vault_id) without an embedding
+
+    Rows are not locked: the embedding call can take seconds and a writer
+    re-indexing the same file must not wait on it. Shards keep several
+    workers from embedding the same rows.
+    """
+    index, count = shard
+    cur.execute("""
+        SELECT id, chunk_text, file_path, updated_at, vault_id
+        FROM markdown_chunks
+        WHERE embedding IS NULL
+          AND NOT (id = ANY(%s::uuid[]))
+          AND (%s = 1 OR (hashtext(id::text) & 2147483647) %% %s = %s)
+        LIMIT %s;
+    """, (skip_ids, count, count, index, batch_size))
+    return cur.fetchall()
+
+def embed_rows(embedder, rows: list) -> tuple:
+    """
+    Embed a batch, falling back to one row at a time if the batch fails,
+    so a single bad chunk (e.g. too long for the model) cannot stall the rest.
+    Returns ([(row, vector)], [failed rows]).
+    """
+    try:
+        vectors = embedder.embed_batch([row[1] for row in rows])
+        return list(zip(rows, vectors)), []
+    except Exception as e:
+        if len(rows) == 1:
+            print(f"❌ Chunk {rows[0][0]} ({rows[0][2]}): {e}", flush=True)
+            return [], rows
+    embedded, failed = [], []
+    for row in rows:
+        ok, bad = embed_rows(embedder, [row])
+        embedded += ok
+        failed += bad
+    return embedded, failed
+
+def write_embeddings(cur, embedded: list):
+    """
+    Fill embeddings and refresh the touched files' centroids
+
+    Rows deleted or re-embedded meanwhile (a re-index replaces chunk ids)
+    simply match nothing.
+    """
+    execute_values(cur, """
+        UPDATE markdown_chunks
+        SET embedding = batch.embedding::vector, updated_at = NOW()
+        FROM (VALUES %s) AS batch(vault_id, id, embedding)
+        WHERE markdown_chunks.vault_id = batch.vault_id::uuid
+          AND markdown_chunks.id = batch.id::uuid
+          AND markdown_chunks.embedding IS NULL;
+    """, [(str(row[4]), str(row[0]), vector) for row, vector in embedded])
+    for vault_id, file_path in sorted({(str(row[4]), row[2]) for row, _ in embedded}):
+        cur.execute(REFRESH_FILE_CENTROID_SQL, (vault_id, file_path))
+
+def drain(conn, embedder, batch_size: int, shard: tuple, skip_until: dict, retry_after: float, stopping: threading.Event) -> int:
+    """Embed batches until nothing is pending; returns chunks embedded"""
+    total = 0
+    while not stopping.is_set():
+        now = time.time()
+        for chunk_id in [chunk_id for chunk_id, until in skip_until.items() if until <= now]:
+            del skip_until[chunk_id]
+
+        with conn.cursor() as cur:
+            rows = fetch_pending(cur, batch_size, shard, list(skip_until))
+        conn.commit()
+        if not rows:
+            break
+
+        started = time.time()
+        embedded, failed = embed_rows(embedder, rows)
+        if embedded:
+            with conn.cursor() as cur:
+                write_embeddings(cur, embedded)
+            conn.commit()
+
+        for row in failed:
+            skip_until[str(row[0])] = time.time() + retry_after
+
+        total += len(embedded)
+        oldest = min((row[3] for row in rows if row[3]), default=None)
+        lag = (datetime.now(timezone.utc) - oldest).total_seconds() if oldest else 0.0
+        print(
+            f"✅ {len(embedded)} chunks ({len({row[2] for row, _ in embedded})} files) in "
+            f"{(time.time() - started) * 1000:.0f} ms, write-to-embed lag {lag:.1f}s"
+            + (f", {len(failed)} failed" if failed else ""),
+            flush=True
+        )
+        if len(rows) < batch_size:
+            break
+    return total
+
+def wait_for_notify(listen_conn, timeout: float) -> bool:
+    """Block until a NOTIFY arrives or timeout; True if notified"""
+    if listen_conn.notifies:
+        listen_conn.notifies.clear()
+        return True
+    readable, _, _ = select.select([listen_conn], [], [], timeout)
+    if not readable:
+        return False
+    listen_conn.poll()
+    notified = bool(listen_conn.notifies)
+    listen_conn.notifies.clear()
+    return notified
+
+def run(model_tag: str, batch_size: int, batch_window: float, poll_interval: float, retry_after: float, shard: tuple, once: bool):
+    print("🧵 Pending-embedding worker")
+    print("=" * 60)
+
+    embedder = get_embedder(model_tag)
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    skip_until = {}
+    total = 0
+
+    while not stopping.is_set():
+        conn = listen_conn = None
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            with conn.cursor() as cur:
+                dimensions = embedding_dimensions(cur)
+                if dimensions != embedder.dimensions:
+                    print(f"❌ --model {model_tag} produces {embedder.dimensions} dims but markdown_chunks.embedding is vector({dimensions})")
+                    exit(1)
+                # Databases set up before the trigger existed (DROP TRIGGER takes
+                # an exclusive lock, so only install when missing)
+                cur.execute("""
+                    SELECT 1 FROM pg_trigger
+                    WHERE tgrelid = 'markdown_chunks'::regclass AND tgname = 'markdown_chunks_embedding_pending';
+                """)
+                if not cur.fetchone():
+                    print("🔧 Installing pending-embedding index and trigger...")
+                    cur.execute(EMBEDDING_PENDING_INDEX_SQL)
+                    cur.execute(EMBEDDING_PENDING_TRIGGER_SQL)
+            conn.commit()
+
+            listen_conn = psycopg2.connect(DATABASE_URL)
+            listen_conn.autocommit = True
+            with listen_conn.cursor() as cur:
+                cur.execute(f"LISTEN {EMBEDDING_PENDING_CHANNEL};")
+            print(f"👂 Listening on {EMBEDDING_PENDING_CHANNEL} ({model_tag}, {embedder.dimensions} dims, shard {shard[0]}/{shard[1]})", flush=True)
+
+            # Listening before the first drain means nothing written in between is missed
+            total += drain(conn, embedder, batch_size, shard, skip_until, retry_after, stopping)
+            if once:
+                break
+
+            while not stopping.is_set():
+                # The timeout is a safety net for notifications lost across reconnects
+                if wait_for_notify(listen_conn, poll_interval) and batch_window:
+                    # Let a burst of writes accumulate into full batches
+                    time.sleep(batch_window)
+                    wait_for_notify(listen_conn, 0)
+                total += drain(conn, embedder, batch_size, shard, skip_until, retry_after, stopping)
+
+        except psycopg2.OperationalError as e:
+            print(f"⚠️  Database connection lost: {e}; reconnecting in 5s", flush=True)
+            stopping.wait(5)
+        except KeyboardInterrupt:
+            break
+        finally:
+            for connection in (conn, listen_conn):
+                if connection is not None and not connection.closed:
+                    connection.close()
+
+    print(f"\n👋 Stopped after embedding {total} chunks")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fill NULL chunk embeddings as they are written')
+    parser.add_argument('--model', default='ada002', choices=sorted(EMBEDDING_MODELS), help='Embedding model tag')
+    parser.add_argument('--batch-size', type=int, default=64, help='Chunks per embedding call')
+    parser.add_argument('--batch-window-ms', type=float, default=200, help='Wait after a notification to batch a burst')
+    parser.add_argument('--poll-interval', type=float, default=60, help='Re-check for pending chunks at least this often (seconds)')
+    parser.add_argument('--retry-failed-after', type=float, default=600, help='Seconds before a failed chunk is retried')
+    parser.add_argument('--shard', default='0/1', help='I/N: only embed this worker\'s share of chunks')
+    parser.add_argument('--once', action='store_true', help='Drain pending chunks and exit')
+
+    args = parser.parse_args()
+
+    try:
+        shard_index, shard_count = (int(part) for part in args.shard.split('/'))
+        assert 0 <= shard_index < shard_count
+    except (ValueError, AssertionError):
+        print(f"❌ --shard must be I/N with 0 <= I < N (got {args.shard})")
+        exit(1)
+
+    run(args.model, args.batch_size, args.batch_window_ms / 1000, args.poll_interval, args.retry_failed_after,
+        (shard_index, shard_count), args.once)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Export Local Vector Index
+Writes all chunk embeddings to a memory-mapped matrix for offline search (RAG_BACKEND=local)
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+import psycopg2
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from local_index import write_index
+
+# Load environment variables
+load_dotenv('.env.local')
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+if not DATABASE_URL:
+    print("❌ DATABASE_URL not found in .env.local")
+    exit(1)
+
+def stream_chunks(conn, fetch_size: int = 2000):
+    """Stream (record, embedding) pairs through a server-side cursor"""
+    with conn.cursor(name='export_local_index') as cur:
+        cur.itersize = fetch_size
+        cur.execute("""
+            SELECT id, file_path, chunk_index, chunk_text, metadata, embedding::text, vault_id
+            FROM markdown_chunks
+            WHERE embedding IS NOT NULL
+            ORDER BY vault_id, file_path, chunk_index;
+        """)
+        for row in cur:
+            record = {
+                'id': str(row[0]),
+                'vault_id': str(row[6]),
+                'file_path': row[1],
+                'chunk_index': row[2],
+                'chunk_text': row[3],
+                'metadata': row[4] or {}
+            }
+            yield record, row[5]
+
+def export_index(out_dir: str, dtype: str):
+    print("📦 Exporting local vector index...")
+    print("=" * 60)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    # One snapshot for the count and the streamed rows
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(*), max(vector_dims(embedding))
+                FROM markdown_chunks
+                WHERE embedding IS NOT NULL;
+            """)
+            count, dimensions = cur.fetchone()
+
+        if not count:
+            print("⚠️  No embedded chunks found. Nothing to export.")
+            return
+
+        print(f"📊 {count} chunks × {dimensions} dims ({dtype})")
+        start_time = time.time()
+
+        manifest = write_index(
+            out_dir,
+            stream_chunks(conn),
+            count,
+            dimensions,
+            dtype=dtype,
+            source={'exported_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        )
+
+        elapsed = time.time() - start_time
+        size_mb = os.path.getsize(os.path.join(out_dir, 'embeddings.npy')) / (1024 * 1024)
+
+        print(f"\n✅ Exported {manifest['count']} chunks to {out_dir}")
+        print(f"   - Matrix size: {size_mb:.1f} MB")
+        print(f"   - Export time: {elapsed:.1f}s")
+        print(f"\n🔍 Search offline with:")
+        print(f"   RAG_BACKEND=local RAG_LOCAL_INDEX={out_dir} python3 rag_search.py \"your query\"")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export chunk embeddings to a local memory-mapped index')
+    parser.add_argument('--out', default='./local-index', help='Output directory')
+    parser.add_argument('--dtype', choices=['float32', 'float16'], default='float32', help='Matrix precision')
+
+    args = parser.parse_args()
+
+    export_index(os.path.abspath(args.out), args.dtype)
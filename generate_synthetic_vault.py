@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Generate Synthetic Vault
+Builds a deterministic vault of N markdown notes from a seed for load testing
+(size distribution, heading depth, frontmatter, tags, wiki-links, folder fan-out)
+
+    python generate_synthetic_vault.py --files 1000000 --out ./synthetic-vault
+    python generate_synthetic_vault.py --out ./synthetic-vault --mutate 5
+
+Every note is generated from (seed, note index) alone, so output is identical
+regardless of worker count or order, and a note's path never changes.
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import random
+import argparse
+from datetime import datetime, timedelta
+from multiprocessing import Pool, cpu_count
+
+MANIFEST = '.synthetic-vault.json'
+
+WORDS = (
+    "vault note search index chunk embedding vector query context heading section markdown "
+    "product launch metric team roadmap review design api latency cache customer support "
+    "ticket release sprint planning feedback research interview persona pricing revenue "
+    "growth churn retention onboarding mobile desktop sync offline theme dark spooky ghost "
+    "pumpkin lantern horseman quest task habit goal focus deadline priority backlog bug "
+    "incident postmortem dashboard analytics experiment hypothesis cohort funnel signup "
+    "the a an of and to in is for on with as by that this from it be are was at or not "
+    "we they our their will should could need must can may also more most very just"
+).split()
+
+FOLDER_WORDS = (
+    "product engineering design marketing research support operations finance people "
+    "strategy analytics meetings journal projects archive inbox ideas reference logs"
+).split()
+
+# Zipf-like tag popularity: a few tags everywhere, a long tail of rare ones
+TAG_POOL = [f"{word}" for word in WORDS[:60]] + [f"topic-{i}" for i in range(440)]
+TAG_WEIGHTS = [1 / (rank + 1) for rank in range(len(TAG_POOL))]
+
+BASE_DATE = datetime(2025, 1, 1)
+
+def note_rng(seed: int, index: int, purpose: str, revision: int = 0) -> random.Random:
+    return random.Random(f"{seed}:{index}:{purpose}:{revision}")
+
+def build_folders(seed: int, fanout: int, depth: int) -> tuple:
+    """All leaf folders and skewed cumulative weights (some folders are much bigger)"""
+    rng = random.Random(f"{seed}:folders")
+    level = ['']
+    for _ in range(depth):
+        names = rng.sample(FOLDER_WORDS, min(fanout, len(FOLDER_WORDS)))
+        names += [f"area-{i}" for i in range(fanout - len(names))]
+        level = [os.path.join(parent, name) for parent in level for name in names]
+
+    weights = [rng.paretovariate(1.2) for _ in level]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return level, cumulative
+
+def note_stem(seed: int, index: int) -> str:
+    """Filename stem (also the wiki-link target) for a note index"""
+    rng = note_rng(seed, index, 'stem')
+    slug = '-'.join(rng.choices(WORDS[:80], k=rng.randint(2, 4)))
+    return f"{slug}-{index:07d}"
+
+def note_path(seed: int, index: int, folders: list, cumulative: list) -> str:
+    rng = note_rng(seed, index, 'path')
+    folder = rng.choices(folders, cum_weights=cumulative)[0]
+    return os.path.join(folder, note_stem(seed, index) + '.md')
+
+def target_bytes(rng: random.Random, median_kb: float, max_kb: float) -> int:
+    """Log-normal note size: mostly small notes, a long tail of big documents"""
+    size = rng.lognormvariate(math.log(median_kb * 1024), 1.0)
+    return int(min(max(size, 120), max_kb * 1024))
+
+# Sentences are drawn from a seeded pool: one RNG call per sentence instead
+# of one per word keeps generation I/O-bound
+SENTENCE_POOL_SIZE = 8192
+sentence_pools = {}
+
+def sentence_pool(seed: int) -> list:
+    if seed not in sentence_pools:
+        rng = random.Random(f"{seed}:sentences")
+        sentence_pools[seed] = [
+            ' '.join(rng.choices(WORDS, k=rng.randint(6, 22))).capitalize()
+            for _ in range(SENTENCE_POOL_SIZE)
+        ]
+    return sentence_pools[seed]
+
+def sentence(rng: random.Random, seed: int, index: int, total_files: int, link_rate: float) -> str:
+    text = sentence_pool(seed)[rng.randrange(SENTENCE_POOL_SIZE)]
+    if total_files > 1 and rng.random() < link_rate:
+        # Locality: most links point to nearby notes, some anywhere in the vault
+        if rng.random() < 0.7:
+            target = (index + rng.randint(-200, 200)) % total_files
+        else:
+            target = rng.randrange(total_files)
+        return f"{text} [[{note_stem(seed, target)}]]."
+    return text + '.'
+
+def block(rng: random.Random, seed: int, index: int, total_files: int, link_rate: float) -> str:
+    kind = rng.random()
+    if kind < 0.15:
+        return '\n'.join(f"- {sentence(rng, seed, index, total_files, link_rate)}" for _ in range(rng.randint(2, 7)))
+    if kind < 0.22:
+        return '\n'.join(
+            f"- [{'x' if rng.random() < 0.4 else ' '}] {' '.join(rng.choices(WORDS, k=rng.randint(3, 8)))}"
+            for _ in range(rng.randint(2, 6))
+        )
+    if kind < 0.26:
+        lines = [f"    {' '.join(rng.choices(WORDS, k=rng.randint(2, 6)))}" for _ in range(rng.randint(2, 10))]
+        return '```\n' + '\n'.join(lines) + '\n```'
+    if kind < 0.29:
+        rows = ['| Metric | Value | Trend |', '|---|---|---|']
+        rows += [f"| {rng.choice(WORDS)} | {rng.randint(1, 9999)} | {rng.choice(['up', 'down', 'flat'])} |" for _ in range(rng.randint(2, 8))]
+        return '\n'.join(rows)
+    return ' '.join(sentence(rng, seed, index, total_files, link_rate) for _ in range(rng.randint(2, 7)))
+
+def render_note(seed: int, index: int, total_files: int, options: dict, revision: int = 0) -> tuple:
+    """Returns (markdown, modified_datetime) for one note revision"""
+    rng = note_rng(seed, index, 'body', revision)
+    title = ' '.join(rng.choices(WORDS[:80], k=rng.randint(2, 6))).title()
+    modified = BASE_DATE - timedelta(days=rng.expovariate(1 / 180), seconds=rng.randint(0, 86399))
+    if revision:
+        modified = BASE_DATE + timedelta(days=revision, seconds=rng.randint(0, 86399))
+
+    tags = sorted(set(rng.choices(TAG_POOL, weights=TAG_WEIGHTS, k=rng.choice((0, 1, 2, 2, 3, 3, 4, 5)))))
+    parts = [
+        '---',
+        f"title: {title}",
+        f"date: {modified.strftime('%Y-%m-%d')}",
+    ]
+    if tags:
+        parts.append(f"tags: [{', '.join(tags)}]")
+    if rng.random() < 0.2:
+        parts.append(f"status: {rng.choice(['draft', 'active', 'done', 'archived'])}")
+    parts += ['---', '', f"# {title}", '']
+
+    budget = target_bytes(rng, options['median_kb'], options['max_kb'])
+    size = sum(len(part) + 1 for part in parts)
+    # Occasional notes with no structure below the title (worst case for the chunker)
+    flat = rng.random() < 0.05
+    level = 1
+    while size < budget:
+        if not flat and rng.random() < 0.35:
+            # Heading depth random-walks between H2 and H5
+            level = max(2, min(options['max_heading_depth'], level + rng.choice((-1, 0, 1, 1))))
+            heading = '#' * level + ' ' + ' '.join(rng.choices(WORDS, k=rng.randint(1, 5))).capitalize()
+            parts += [heading, '']
+            size += len(heading) + 2
+        text = block(rng, seed, index, total_files, options['link_rate'])
+        parts += [text, '']
+        size += len(text) + 2
+
+    return '\n'.join(parts), modified
+
+def write_note(out_dir: str, seed: int, index: int, total_files: int, options: dict, folders: list, cumulative: list, revision: int = 0) -> int:
+    path = os.path.join(out_dir, note_path(seed, index, folders, cumulative))
+    content, modified = render_note(seed, index, total_files, options, revision)
+    data = content.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+    timestamp = modified.timestamp()
+    os.utime(path, (timestamp, timestamp))
+    return len(data)
+
+# Worker state (set once per process by the pool initializer)
+worker_state = {}
+
+def init_worker(out_dir: str, seed: int, total_files: int, options: dict):
+    folders, cumulative = build_folders(seed, options['fanout'], options['depth'])
+    worker_state.update(
+        out_dir=out_dir, seed=seed, total_files=total_files, options=options,
+        folders=folders, cumulative=cumulative
+    )
+
+def write_range(task: tuple) -> tuple:
+    """Write notes [start, end) at `revision`; returns (notes, bytes)"""
+    start, end, revision = task
+    state = worker_state
+    written = 0
+    for index in range(start, end):
+        written += write_note(
+            state['out_dir'], state['seed'], index, state['total_files'], state['options'],
+            state['folders'], state['cumulative'], revision
+        )
+    return end - start, written
+
+def write_indexes(task: tuple) -> tuple:
+    """Write an explicit list of note indexes at `revision`; returns (notes, bytes)"""
+    indexes, revision = task
+    state = worker_state
+    written = 0
+    for index in indexes:
+        written += write_note(
+            state['out_dir'], state['seed'], index, state['total_files'], state['options'],
+            state['folders'], state['cumulative'], revision
+        )
+    return len(indexes), written
+
+def run_pool(func, tasks: list, out_dir: str, seed: int, total_files: int, options: dict, workers: int, total: int):
+    notes = 0
+    written = 0
+    start = time.perf_counter()
+    with Pool(workers, initializer=init_worker, initargs=(out_dir, seed, total_files, options)) as pool:
+        for count, size in pool.imap_unordered(func, tasks):
+            notes += count
+            written += size
+            if notes % 50000 < count or notes == total:
+                rate = notes / (time.perf_counter() - start)
+                print(f"   {notes:,}/{total:,} notes ({written / 1e6:,.0f} MB, {rate:,.0f} notes/s)", flush=True)
+    return notes, written, time.perf_counter() - start
+
+def load_manifest(out_dir: str) -> dict:
+    with open(os.path.join(out_dir, MANIFEST)) as f:
+        return json.load(f)
+
+def save_manifest(out_dir: str, manifest: dict):
+    with open(os.path.join(out_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def generate(out_dir: str, files: int, seed: int, options: dict, workers: int, batch: int):
+    print("🎃 Generating synthetic vault...")
+    print("=" * 60)
+    print(f"   Notes: {files:,}  Seed: {seed}  Workers: {workers}  Output: {out_dir}")
+
+    folders, _ = build_folders(seed, options['fanout'], options['depth'])
+    for folder in folders:
+        os.makedirs(os.path.join(out_dir, folder), exist_ok=True)
+
+    tasks = [(start, min(start + batch, files), 0) for start in range(0, files, batch)]
+    notes, written, seconds = run_pool(write_range, tasks, out_dir, seed, files, options, workers, files)
+
+    save_manifest(out_dir, {
+        'seed': seed,
+        'files': files,
+        'next_index': files,
+        'options': options,
+        'revisions': {},
+        'deleted': [],
+        'generations': 0,
+    })
+
+    print(f"\n✅ {notes:,} notes, {written / 1e6:,.1f} MB in {seconds:.1f}s ({notes / seconds:,.0f} notes/s)")
+    print(f"   {len(folders)} folders, median target {options['median_kb']} KB")
+
+def mutate(out_dir: str, percent: float, workers: int, batch: int, create_fraction: float, delete_fraction: float):
+    """
+    Edit, delete and create notes for incremental reindex tests
+
+    Of the mutated share, delete_fraction are removed, an equal-sized
+    create_fraction of new notes is added, and the rest are rewritten with
+    a new revision (new content and a newer mtime). Mutations are seeded by
+    the generation number, so replaying the same steps gives the same vault.
+    """
+    manifest = load_manifest(out_dir)
+    seed = manifest['seed']
+    options = manifest['options']
+    generation = manifest['generations'] + 1
+    folders, cumulative = build_folders(seed, options['fanout'], options['depth'])
+
+    deleted = set(manifest['deleted'])
+    live = [index for index in range(manifest['next_index']) if index not in deleted]
+    rng = random.Random(f"{seed}:mutate:{generation}")
+    count = min(len(live), round(len(live) * percent / 100))
+    chosen = rng.sample(live, count)
+
+    delete_count = int(count * delete_fraction)
+    create_count = int(count * create_fraction)
+    to_delete = chosen[:delete_count]
+    to_edit = chosen[delete_count:]
+
+    print(f"🔀 Mutating {percent}% of {len(live):,} notes (generation {generation})...")
+    print("=" * 60)
+
+    for index in to_delete:
+        path = os.path.join(out_dir, note_path(seed, index, folders, cumulative))
+        if os.path.exists(path):
+            os.remove(path)
+        deleted.add(index)
+
+    revisions = manifest['revisions']
+    for index in to_edit:
+        revisions[str(index)] = generation
+
+    # Edits: each note rewritten at the new generation
+    edit_tasks = [(to_edit[i:i + batch], generation) for i in range(0, len(to_edit), batch)]
+    edited, _, _ = run_pool(write_indexes, edit_tasks, out_dir, seed, manifest['next_index'], options, workers, len(to_edit)) if edit_tasks else (0, 0, 0)
+
+    # Creates: fresh note indexes after the current range
+    start = manifest['next_index']
+    create_tasks = [(i, min(i + batch, start + create_count), generation) for i in range(start, start + create_count, batch)]
+    created, _, _ = run_pool(write_range, create_tasks, out_dir, seed, start + create_count, options, workers, create_count) if create_tasks else (0, 0, 0)
+
+    manifest.update(
+        next_index=start + create_count,
+        revisions=revisions,
+        deleted=sorted(deleted),
+        generations=generation,
+    )
+    save_manifest(out_dir, manifest)
+
+    print(f"\n✅ Edited {edited:,}, deleted {len(to_delete):,}, created {created:,} notes")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic vault for load testing')
+    parser.add_argument('--out', default='./synthetic-vault', help='Output vault directory')
+    parser.add_argument('--files', type=int, default=10000, help='Number of notes to generate')
+    parser.add_argument('--seed', type=int, default=42, help='Seed (same seed = same vault)')
+    parser.add_argument('--workers', type=int, default=cpu_count(), help='Parallel writer processes')
+    parser.add_argument('--batch', type=int, default=2000, help='Notes per worker task')
+    parser.add_argument('--fanout', type=int, default=8, help='Subfolders per folder')
+    parser.add_argument('--depth', type=int, default=2, help='Folder nesting depth')
+    parser.add_argument('--median-kb', type=float, default=2.0, help='Median note size')
+    parser.add_argument('--max-kb', type=float, default=512.0, help='Largest note size')
+    parser.add_argument('--max-heading-depth', type=int, default=5, help='Deepest heading level')
+    parser.add_argument('--link-rate', type=float, default=0.08, help='Chance a sentence carries a wiki-link')
+    parser.add_argument('--mutate', type=float, help='Mutate this percentage of an existing generated vault')
+    parser.add_argument('--create-fraction', type=float, default=0.1, help='Share of mutations that create new notes')
+    parser.add_argument('--delete-fraction', type=float, default=0.1, help='Share of mutations that delete notes')
+
+    args = parser.parse_args()
+    out_dir = os.path.abspath(args.out)
+
+    if args.mutate is not None:
+        if not os.path.exists(os.path.join(out_dir, MANIFEST)):
+            print(f"❌ No generated vault at {out_dir} (missing {MANIFEST})")
+            sys.exit(1)
+        mutate(out_dir, args.mutate, args.workers, args.batch, args.create_fraction, args.delete_fraction)
+        sys.exit(0)
+
+    if os.path.exists(os.path.join(out_dir, MANIFEST)):
+        print(f"❌ {out_dir} already holds a generated vault (use --mutate, or remove it first)")
+        sys.exit(1)
+
+    generate(out_dir, args.files, args.seed, {
+        'fanout': args.fanout,
+        'depth': args.depth,
+        'median_kb': args.median_kb,
+        'max_kb': args.max_kb,
+        'max_heading_depth': args.max_heading_depth,
+        'link_rate': args.link_rate,
+    }, args.workers, args.batch)
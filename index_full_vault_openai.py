@@ -2,6 +2,9 @@
 """
 Index entire vault from scratch with OpenAI embeddings
 Scans vault folder, chunks files, generates OpenAI embeddings, inserts to DB
+
+Progress is journaled per file and chunk (lib/index_journal.py); an
+interrupted run continues with --resume instead of starting over.
 """
 
 import psycopg2
@@ -10,18 +13,36 @@ import os
 import sys
 import requests
 import time
+from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
 
 # Add lib to path
 sys.path.append(str(Path(__file__).parent / 'lib'))
 from chunking import chunk_markdown_file
+from frontmatter import parse_frontmatter, parse_tags
+from rag_schema import REFRESH_FILE_CENTROID_SQL
+from file_indexing import register_vault
+from index_priority import add_priority_arguments, load_hits, policy_from_args, prioritize
+from index_journal import (
+    FILE_ITEM,
+    ensure_journal,
+    file_fingerprint,
+    start_run,
+    find_run,
+    resume_run,
+    record_items,
+    finish_run,
+    iter_items,
+)
 
 # Load environment variables
 load_dotenv('.env.local')
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Point at a compatible server (e.g. mock_openai_server.py) for offline load tests
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
 
 if not DATABASE_URL:
     print("❌ DATABASE_URL not found in .env.local")
@@ -34,7 +55,7 @@ if not OPENAI_API_KEY:
 def generate_embedding(text: str) -> list[float]:
     """Generate embedding using OpenAI API"""
     response = requests.post(
-        'https://api.openai.com/v1/embeddings',
+        f'{OPENAI_BASE_URL}/embeddings',
         headers={
             'Authorization': f'Bearer {OPENAI_API_KEY}',
             'Content-Type': 'application/json',
@@ -65,70 +86,192 @@ def scan_vault(vault_path):
 
     return md_files
 
-def main():
+SCRIPT_NAME = 'index_full_vault_openai'
+
+def load_progress(conn, run_id: str) -> tuple:
+    """
+    Journal state of a run being resumed
+
+    Returns (done_files, started {file_path: fingerprint}, done_chunks
+    {file_path: set of chunk indexes}); streamed, so a multi-million chunk
+    journal is never fetched in one piece.
+
+    Items arrive ordered by (file_path, chunk_index) with FILE_ITEM (-1)
+    first, so the chunk rows of a finished file are skipped as they stream
+    past: only unfinished files' chunks are ever held.
+    """
+    done_files, started, done_chunks = set(), {}, {}
+    finished_path = None
+    for file_path, chunk_index, status, fingerprint in iter_items(conn, run_id):
+        if chunk_index == FILE_ITEM:
+            finished_path = file_path if status == 'done' else None
+            if status == 'done':
+                done_files.add(file_path)
+            elif status == 'started':
+                started[file_path] = fingerprint
+        elif status == 'done' and file_path != finished_path:
+            done_chunks.setdefault(file_path, set()).add(chunk_index)
+    conn.commit()
+    return done_files, started, done_chunks
+
+def main(vault_path: str, resume: str = None, checkpoint_every: int = 10, policy=None):
     print("🚀 Indexing vault with OpenAI embeddings")
     print("=" * 60)
 
-    vault_path = './demo-vault'
+    conn = None
+    run_id = None
 
     try:
         # Connect to database
         conn = psycopg2.connect(DATABASE_URL)
         cur = conn.cursor()
+        ensure_journal(cur)
+        conn.commit()
 
-        # Clear existing chunks
-        print("\n1️⃣ Clearing existing chunks...")
-        cur.execute("DELETE FROM markdown_chunks;")
-        cur.execute("DELETE FROM markdown_files;")
+        # Files are replaced one by one (never a table-wide DELETE), so an
+        # interrupted run leaves every finished file searchable
+        if resume:
+            print("\n1️⃣ Loading progress journal...")
+            run = find_run(cur, SCRIPT_NAME, resume)
+            if not run:
+                print(f"❌ No unfinished run to resume ({resume})")
+                exit(1)
+            run_id, vault_path, _ = run
+            resume_run(cur, run_id)
+            conn.commit()
+            done_files, started, done_chunks = load_progress(conn, run_id)
+            print(f"✅ Resuming run {run_id}: {len(done_files)} files done, "
+                  f"{sum(len(chunks) for chunks in done_chunks.values())} chunks of partial files kept")
+        else:
+            print("\n1️⃣ Starting run...")
+            vault_path = os.path.abspath(vault_path)
+            run_id = start_run(cur, SCRIPT_NAME, vault_path)
+            conn.commit()
+            done_files, started, done_chunks = set(), {}, {}
+            print(f"✅ Run {run_id}")
+
+        # This vault's rows live in their own markdown_chunks partition
+        vault_id = register_vault(cur, vault_path)
         conn.commit()
-        print("✅ Cleared old data")
 
         # Scan vault
         print(f"\n2️⃣ Scanning vault: {vault_path}")
         files = scan_vault(vault_path)
         print(f"📊 Found {len(files)} markdown files")
 
+        # Recent, frequently retrieved and small files first
+        if policy is not None:
+            ranked = prioritize(vault_path, [os.path.relpath(path, vault_path) for path in files],
+                                policy, load_hits(cur, vault_id, policy))
+            conn.commit()
+            files = [os.path.join(vault_path, rel_path) for rel_path, _, _ in ranked]
+            print(f"🚀 Ordered by priority ({sum(1 for _, _, lane in ranked if lane == 'fast')} files in the fast lane)")
+
         # Process each file
         print(f"\n3️⃣ Processing files...")
         start_time = time.time()
         total_chunks = 0
+        failed_files = 0
 
         for idx, file_path in enumerate(files, 1):
             # Get relative path
             rel_path = os.path.relpath(file_path, vault_path)
 
+            if rel_path in done_files:
+                continue
+
             print(f"\n[{idx}/{len(files)}] {rel_path}")
+            fingerprint = None
 
             try:
+                fingerprint = file_fingerprint(file_path)
+                # Chunks already written by the interrupted run, if the file is unchanged
+                skip_chunks = done_chunks.get(rel_path, set()) if started.get(rel_path) == fingerprint else set()
+
+                if not skip_chunks:
+                    cur.execute("DELETE FROM markdown_chunks WHERE vault_id = %s AND file_path = %s;", (vault_id, rel_path))
+                    cur.execute("""
+                        DELETE FROM index_run_items
+                        WHERE run_id = %s AND file_path = %s AND chunk_index <> %s;
+                    """, (run_id, rel_path, FILE_ITEM))
+                    record_items(cur, run_id, [(rel_path, FILE_ITEM, 'started', fingerprint, None)])
+                    conn.commit()
+
                 # Read and chunk file
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
 
+                frontmatter, _ = parse_frontmatter(content)
+                tags = parse_tags(frontmatter.get('tags'))
+                modified_at = datetime.fromtimestamp(os.path.getmtime(file_path))
+
                 chunks = chunk_markdown_file(rel_path, content)
-                print(f"  📄 Created {len(chunks)} chunks")
+                if skip_chunks:
+                    print(f"  📄 Created {len(chunks)} chunks ({len(skip_chunks)} already indexed)")
+                else:
+                    print(f"  📄 Created {len(chunks)} chunks")
 
                 # Process each chunk
+                journal = []
                 for chunk_idx, chunk in enumerate(chunks):
+                    if chunk_idx in skip_chunks:
+                        continue
+
                     # Generate embedding
                     embedding = generate_embedding(chunk['chunk_text'])
 
                     # Insert into database
                     cur.execute("""
-                        INSERT INTO markdown_chunks (file_path, chunk_index, chunk_text, embedding, metadata)
-                        VALUES (%s, %s, %s, %s, %s)
+                        INSERT INTO markdown_chunks
+                        (vault_id, file_path, chunk_index, chunk_text, embedding, metadata, tags, file_modified_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                     """, (
+                        vault_id,
                         rel_path,
                         chunk_idx,
                         chunk['chunk_text'],
                         embedding,
-                        psycopg2.extras.Json(chunk.get('metadata', {}))
+                        psycopg2.extras.Json(chunk.get('metadata', {})),
+                        tags,
+                        modified_at
                     ))
+                    journal.append((rel_path, chunk_idx, 'done', None, None))
+
+                    # Checkpoint: chunks and their journal rows commit together
+                    if len(journal) >= checkpoint_every:
+                        record_items(cur, run_id, journal)
+                        conn.commit()
+                        journal = []
 
                     total_chunks += 1
 
                     # Rate limiting
                     time.sleep(0.05)
 
+                # File row + centroid for two-stage (file-then-chunk) search
+                cur.execute("""
+                    INSERT INTO markdown_files
+                    (vault_id, file_path, filename, folder, size_bytes, chunk_count, last_modified, metadata)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (vault_id, file_path) DO UPDATE SET
+                        size_bytes = EXCLUDED.size_bytes,
+                        chunk_count = EXCLUDED.chunk_count,
+                        last_modified = EXCLUDED.last_modified,
+                        last_indexed = NOW(),
+                        metadata = EXCLUDED.metadata
+                """, (
+                    vault_id,
+                    rel_path,
+                    os.path.basename(rel_path),
+                    os.path.dirname(rel_path) or 'root',
+                    os.path.getsize(file_path),
+                    len(chunks),
+                    modified_at,
+                    psycopg2.extras.Json(frontmatter)
+                ))
+                cur.execute(REFRESH_FILE_CENTROID_SQL, (vault_id, rel_path))
+
+                record_items(cur, run_id, journal + [(rel_path, FILE_ITEM, 'done', fingerprint, None)])
                 conn.commit()
                 print(f"  ✅ Indexed {len(chunks)} chunks")
 
@@ -142,10 +285,35 @@ def main():
             except Exception as e:
                 print(f"  ❌ Error: {e}")
                 conn.rollback()
+                record_items(cur, run_id, [(rel_path, FILE_ITEM, 'failed', fingerprint, str(e))])
+                conn.commit()
+                failed_files += 1
                 continue
 
+        # Files no longer in the vault: everything of this vault the run did not touch
+        print(f"\n4️⃣ Removing files no longer in the vault...")
+        cur.execute("""
+            DELETE FROM markdown_chunks
+            WHERE vault_id = %s
+            AND file_path NOT IN (
+                SELECT file_path FROM index_run_items WHERE run_id = %s AND chunk_index = %s
+            );
+        """, (vault_id, run_id, FILE_ITEM))
+        removed_chunks = cur.rowcount
+        cur.execute("""
+            DELETE FROM markdown_files
+            WHERE vault_id = %s
+            AND file_path NOT IN (
+                SELECT file_path FROM index_run_items WHERE run_id = %s AND chunk_index = %s
+            );
+        """, (vault_id, run_id, FILE_ITEM))
+        print(f"✅ Removed {cur.rowcount} files ({removed_chunks} chunks)")
+
+        finish_run(cur, run_id, 'completed_with_errors' if failed_files else 'completed')
+        conn.commit()
+
         # Final stats
-        cur.execute("SELECT COUNT(*) FROM markdown_chunks;")
+        cur.execute("SELECT COUNT(*) FROM markdown_chunks WHERE vault_id = %s;", (vault_id,))
         final_count = cur.fetchone()[0]
 
         elapsed_total = time.time() - start_time
@@ -154,22 +322,49 @@ def main():
         print("🎉 INDEXING COMPLETE!")
         print("=" * 60)
         print(f"\n📊 Results:")
-        print(f"   - Files processed: {len(files)}")
+        print(f"   - Files processed: {len(files) - len(done_files)} ({len(done_files)} done before resume)")
+        print(f"   - Files failed: {failed_files}")
+        print(f"   - Chunks embedded this run: {total_chunks}")
         print(f"   - Total chunks: {final_count}")
         print(f"   - Processing time: {elapsed_total:.1f} seconds")
-        print(f"   - Average: {elapsed_total/len(files):.2f}s per file")
 
         cur.close()
         conn.close()
 
     except KeyboardInterrupt:
         print("\n\n⚠️  Indexing cancelled by user")
+        if conn is not None and run_id is not None:
+            conn.rollback()
+            with conn.cursor() as cur:
+                finish_run(cur, run_id, 'interrupted')
+            conn.commit()
+            print(f"   Resume with: python3 index_full_vault_openai.py --resume {run_id}")
         exit(0)
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
         traceback.print_exc()
+        if conn is not None and run_id is not None and not conn.closed:
+            try:
+                conn.rollback()
+                with conn.cursor() as cur:
+                    finish_run(cur, run_id, 'failed')
+                conn.commit()
+                print(f"   Resume with: python3 index_full_vault_openai.py --resume {run_id}")
+            except psycopg2.Error:
+                pass
         exit(1)
 
 if __name__ == '__main__':
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Index the whole vault with OpenAI embeddings')
+    parser.add_argument('--vault', default='./demo-vault', help='Path to vault directory')
+    parser.add_argument('--resume', nargs='?', const='latest', metavar='RUN_ID',
+                        help='Continue an interrupted run (default: the latest one)')
+    parser.add_argument('--checkpoint-every', type=int, default=10, help='Chunks per journal checkpoint')
+    add_priority_arguments(parser)
+
+    args = parser.parse_args()
+
+    main(args.vault, args.resume, args.checkpoint_every, policy_from_args(args))
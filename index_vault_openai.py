@@ -2,20 +2,32 @@
 """
 Re-index markdown chunks with OpenAI embeddings
 Generates 1536-dim embeddings using text-embedding-ada-002
+
+Pending chunks are read in keyset pages, and the last processed key is
+checkpointed in the run journal (lib/index_journal.py), so memory stays
+bounded and --resume continues after the last committed chunk.
 """
 
 import psycopg2
 import os
 import requests
 import json
+import sys
 import time
 from dotenv import load_dotenv
 
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from rag_schema import REFRESH_ALL_FILE_CENTROIDS_SQL
+from index_journal import ensure_journal, start_run, find_run, resume_run, record_items, save_checkpoint, finish_run
+
 # Load environment variables
 load_dotenv('.env.local')
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Point at a compatible server (e.g. mock_openai_server.py) for offline load tests
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
 
 if not DATABASE_URL:
     print("❌ DATABASE_URL not found in .env.local")
@@ -31,7 +43,7 @@ def generate_embedding(text: str) -> list[float]:
     Returns 1536-dimensional vector
     """
     response = requests.post(
-        'https://api.openai.com/v1/embeddings',
+        f'{OPENAI_BASE_URL}/embeddings',
         headers={
             'Authorization': f'Bearer {OPENAI_API_KEY}',
             'Content-Type': 'application/json',
@@ -49,28 +61,77 @@ def generate_embedding(text: str) -> list[float]:
     data = response.json()
     return data['data'][0]['embedding']
 
-def main():
+SCRIPT_NAME = 'index_vault_openai'
+
+# Sorts before every vault_id
+NIL_UUID = '00000000-0000-0000-0000-000000000000'
+
+def iter_pending_chunks(conn, after: tuple, page_size: int):
+    """
+    Chunks without embeddings in (vault_id, file_path, chunk_index) order,
+    one keyset page at a time; each page is an index range scan on the
+    UNIQUE key, so page N costs the same as page 1 and only one page is
+    held in memory
+    """
+    while True:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, chunk_text, file_path, chunk_index, vault_id
+                FROM markdown_chunks
+                WHERE embedding IS NULL AND (vault_id, file_path, chunk_index) > (%s::uuid, %s, %s)
+                ORDER BY vault_id, file_path, chunk_index
+                LIMIT %s;
+            """, (after[0], after[1], after[2], page_size))
+            rows = cur.fetchall()
+        conn.commit()
+        if not rows:
+            return
+        yield from rows
+        after = (str(rows[-1][4]), rows[-1][2], rows[-1][3])
+
+def main(resume: str = None, page_size: int = 500, assume_yes: bool = False):
     print("🚀 Re-indexing vault with OpenAI embeddings")
     print("=" * 60)
 
+    conn = None
+    run_id = None
+
     try:
         # Connect to database
         conn = psycopg2.connect(DATABASE_URL)
         cur = conn.cursor()
+        ensure_journal(cur)
 
-        # Get chunks that need embeddings
-        print("\n1️⃣ Fetching chunks from database...")
+        # Keys sort after (nil uuid, '', -1); a resumed run starts after its checkpoint
+        after = (NIL_UUID, '', -1)
+        if resume:
+            run = find_run(cur, SCRIPT_NAME, resume)
+            if not run:
+                print(f"❌ No unfinished run to resume ({resume})")
+                exit(1)
+            run_id, _, checkpoint = run
+            resume_run(cur, run_id)
+            if checkpoint:
+                after = (checkpoint.get('vault_id', NIL_UUID), checkpoint['file_path'], checkpoint['chunk_index'])
+            print(f"\n♻️  Resuming run {run_id} after {after[1] or 'the start'} #{after[2]}")
+        else:
+            run_id = start_run(cur, SCRIPT_NAME)
+        conn.commit()
+
+        # Count chunks that need embeddings (the rows themselves are paged)
+        print("\n1️⃣ Counting chunks to embed...")
         cur.execute("""
-            SELECT id, chunk_text, file_path, chunk_index
+            SELECT COUNT(*)
             FROM markdown_chunks
-            WHERE embedding IS NULL
-            ORDER BY file_path, chunk_index;
-        """)
-        chunks = cur.fetchall()
-        total_chunks = len(chunks)
+            WHERE embedding IS NULL AND (vault_id, file_path, chunk_index) > (%s::uuid, %s, %s);
+        """, after)
+        total_chunks = cur.fetchone()[0]
+        conn.commit()
 
         if total_chunks == 0:
             print("✅ All chunks already have embeddings!")
+            finish_run(cur, run_id, 'completed')
+            conn.commit()
             cur.close()
             conn.close()
             return
@@ -88,23 +149,27 @@ def main():
         print(f"   - Estimated cost: ~${estimated_cost:.4f}")
         print(f"   - Time estimate: ~{total_chunks * 0.3:.0f} seconds")
 
-        input("\n⚠️  Press Enter to continue or Ctrl+C to cancel...")
+        if not assume_yes:
+            input("\n⚠️  Press Enter to continue or Ctrl+C to cancel...")
 
         # Process each chunk
         print(f"\n2️⃣ Generating embeddings...")
         start_time = time.time()
 
-        for idx, (chunk_id, chunk_text, file_path, chunk_index) in enumerate(chunks, 1):
+        failed = 0
+        for idx, (chunk_id, chunk_text, file_path, chunk_index, vault_id) in enumerate(iter_pending_chunks(conn, after, page_size), 1):
+            checkpoint = {'vault_id': str(vault_id), 'file_path': file_path, 'chunk_index': chunk_index}
             try:
                 # Generate embedding
                 embedding = generate_embedding(chunk_text)
 
-                # Update database
+                # Update database; the checkpoint commits with the row
                 cur.execute("""
                     UPDATE markdown_chunks
                     SET embedding = %s, updated_at = NOW()
-                    WHERE id = %s;
-                """, (embedding, chunk_id))
+                    WHERE vault_id = %s AND id = %s;
+                """, (embedding, vault_id, chunk_id))
+                save_checkpoint(cur, run_id, checkpoint)
                 conn.commit()
 
                 # Progress indicator
@@ -121,8 +186,18 @@ def main():
                 print(f"\n   ❌ Error processing chunk {chunk_id}: {e}")
                 print(f"      File: {file_path}, Chunk: {chunk_index}")
                 conn.rollback()
+                # Journal the failure and move past it; a new run retries it
+                record_items(cur, run_id, [(file_path, chunk_index, 'failed', None, str(e))])
+                save_checkpoint(cur, run_id, checkpoint)
+                conn.commit()
+                failed += 1
                 continue
 
+        # Per-file centroids for two-stage (file-then-chunk) search
+        cur.execute(REFRESH_ALL_FILE_CENTROIDS_SQL)
+        finish_run(cur, run_id, 'completed_with_errors' if failed else 'completed')
+        conn.commit()
+
         # Verify
         print(f"\n3️⃣ Verifying re-indexing...")
         cur.execute("SELECT COUNT(*) FROM markdown_chunks WHERE embedding IS NOT NULL;")
@@ -156,12 +231,37 @@ def main():
 
     except KeyboardInterrupt:
         print("\n\n⚠️  Indexing cancelled by user")
+        if conn is not None and run_id is not None:
+            conn.rollback()
+            with conn.cursor() as cur:
+                finish_run(cur, run_id, 'interrupted')
+            conn.commit()
+            print(f"   Resume with: python3 index_vault_openai.py --resume {run_id}")
         exit(0)
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
         traceback.print_exc()
+        if conn is not None and run_id is not None and not conn.closed:
+            try:
+                conn.rollback()
+                with conn.cursor() as cur:
+                    finish_run(cur, run_id, 'failed')
+                conn.commit()
+                print(f"   Resume with: python3 index_vault_openai.py --resume {run_id}")
+            except psycopg2.Error:
+                pass
         exit(1)
 
 if __name__ == '__main__':
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Embed chunks that have no embedding yet')
+    parser.add_argument('--resume', nargs='?', const='latest', metavar='RUN_ID',
+                        help='Continue an interrupted run after its checkpoint (default: the latest one)')
+    parser.add_argument('--page-size', type=int, default=500, help='Chunks fetched per keyset page')
+    parser.add_argument('--yes', action='store_true', help='Skip the cost confirmation prompt')
+
+    args = parser.parse_args()
+
+    main(args.resume, args.page_size, args.yes)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Distributed Vault Indexing
+Work-queue mode: a scanner fills index_jobs with one job per changed file,
+and any number of workers (on any machine that can reach the database and
+see the vault) claim and index them in parallel
+
+    python index_vault_queue.py scan --vault ./demo-vault
+    python index_vault_queue.py work --vault ./demo-vault --model ada002    # run N of these
+    python index_vault_queue.py status --vault ./demo-vault
+
+Workers on other machines pass the scanner's --vault (it identifies the
+queue) and --mount for where the vault lives locally.
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+from dotenv import load_dotenv
+import psycopg2
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from embedders import EMBEDDING_MODELS, get_embedder
+from file_indexing import register_vault, scan_vault, read_file, write_file, delete_file
+from index_journal import file_fingerprint
+from index_priority import add_priority_arguments, load_hits, policy_from_args, prioritize
+from job_queue import (
+    ensure_job_queue,
+    new_worker_id,
+    enqueue_jobs,
+    claim_jobs,
+    heartbeat,
+    complete_job,
+    fail_job,
+    release_jobs,
+    reclaim_stale_jobs,
+    queue_status,
+)
+
+# Load environment variables
+load_dotenv('.env.local')
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+if not DATABASE_URL:
+    print("❌ DATABASE_URL not found in .env.local")
+    exit(1)
+
+def embedding_dimensions(cur) -> int:
+    """Declared dimension of markdown_chunks.embedding (vector typmod)"""
+    cur.execute("""
+        SELECT atttypmod
+        FROM pg_attribute
+        WHERE attrelid = 'markdown_chunks'::regclass
+          AND attname = 'embedding';
+    """)
+    row = cur.fetchone()
+    return row[0] if row else None
+
+# ---------------------------------------------------------------------------
+# Scanner
+# ---------------------------------------------------------------------------
+
+def scan(vault_path: str, force: bool, policy=None):
+    print("🔍 Scanning vault into the job queue...")
+    print("=" * 60)
+    print(f"Vault: {vault_path}")
+
+    conn = psycopg2.connect(DATABASE_URL)
+    cur = conn.cursor()
+    try:
+        ensure_job_queue(cur)
+        vault_id = register_vault(cur, vault_path)
+        conn.commit()
+
+        start_time = time.time()
+        files = scan_vault(vault_path)
+        # Workers claim highest priority first: recent, retrieved, small files
+        ranked = prioritize(vault_path, files, policy, load_hits(cur, vault_id, policy)) if policy else [
+            (rel_path, 0.0, 'normal') for rel_path in files
+        ]
+        jobs = []
+        for rel_path, priority, _ in ranked:
+            try:
+                fingerprint = file_fingerprint(os.path.join(vault_path, rel_path))
+            except FileNotFoundError:
+                continue
+            jobs.append((rel_path, 'index', fingerprint, priority))
+
+        # Indexed files that are gone from disk get a delete job; cheap, so first
+        cur.execute("SELECT file_path FROM markdown_files WHERE vault_id = %s;", (vault_id,))
+        on_disk = set(files)
+        delete_priority = max([priority for _, priority, _ in ranked] + [0.0])
+        jobs += [(file_path, 'delete', None, delete_priority) for (file_path,) in cur.fetchall() if file_path not in on_disk]
+
+        queued = enqueue_jobs(cur, vault_path, jobs, force=force)
+        conn.commit()
+
+        fast = sum(1 for _, _, lane in ranked if lane == 'fast')
+        print(f"✅ {len(files)} files scanned, {queued} jobs queued in {time.time() - start_time:.1f}s")
+        if policy:
+            print(f"🚀 {fast} files in the fast lane")
+        print(f"\n👷 Start workers with:")
+        print(f"   python3 index_vault_queue.py work --vault {vault_path}")
+    finally:
+        cur.close()
+        conn.close()
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+class HeartbeatThread(threading.Thread):
+    """Refreshes heartbeat_at on its own connection while the worker embeds"""
+
+    def __init__(self, worker_id: str, interval: float):
+        super().__init__(daemon=True)
+        self.worker_id = worker_id
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        conn = psycopg2.connect(DATABASE_URL)
+        conn.autocommit = True
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    with conn.cursor() as cur:
+                        heartbeat(cur, self.worker_id)
+                except psycopg2.OperationalError as e:
+                    print(f"⚠️  Heartbeat failed: {e}", flush=True)
+                    conn.close()
+                    conn = psycopg2.connect(DATABASE_URL)
+                    conn.autocommit = True
+        finally:
+            conn.close()
+
+    def stop(self):
+        self.stopped.set()
+
+def process_job(conn, embedder, vault_id: str, vault_dir: str, job: tuple, worker_id: str, batch_size: int) -> str:
+    """
+    Index or delete one file and complete its job in the same transaction
+
+    Embedding happens before the transaction starts, so row locks are held
+    only for the short write. Returns 'done' or 'lost' (reclaimed meanwhile).
+    """
+    job_id, rel_path, action, _ = job
+    full_path = os.path.join(vault_dir, rel_path)
+
+    if action == 'delete' or not os.path.exists(full_path):
+        chunks = file_info = embeddings = None
+    else:
+        chunks, file_info = read_file(vault_dir, rel_path)
+        # No embedder: written with NULL embeddings for embed_pending_chunks.py
+        embeddings = None
+        if embedder is not None:
+            embeddings = []
+            for start in range(0, len(chunks), batch_size):
+                embeddings += embedder.embed_batch([chunk['chunk_text'] for chunk in chunks[start:start + batch_size]])
+
+    with conn.cursor() as cur:
+        if file_info is None:
+            delete_file(cur, vault_id, rel_path)
+        else:
+            write_file(cur, vault_id, file_info, chunks, embeddings)
+        if not complete_job(cur, job_id, worker_id):
+            conn.rollback()
+            return 'lost'
+    conn.commit()
+    return 'done'
+
+def work(vault_path: str, vault_dir: str, model_tag: str, claim: int, batch_size: int,
+         heartbeat_interval: float, stale_after: float, idle_sleep: float, exit_when_empty: bool,
+         defer_embeddings: bool = False):
+    worker_id = new_worker_id()
+    print(f"👷 Worker {worker_id}")
+    print("=" * 60)
+    print(f"Queue: {vault_path}")
+    print(f"Vault: {vault_dir}")
+
+    embedder = None if defer_embeddings else get_embedder(model_tag)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    with conn.cursor() as cur:
+        ensure_job_queue(cur)
+        vault_id = register_vault(cur, vault_path)
+        dimensions = embedding_dimensions(cur)
+    conn.commit()
+    if embedder is None:
+        print("⏭️  Embeddings deferred to embed_pending_chunks.py")
+    elif dimensions != embedder.dimensions:
+        print(f"❌ --model {model_tag} produces {embedder.dimensions} dims but markdown_chunks.embedding is vector({dimensions})")
+        exit(1)
+    else:
+        print(f"🤖 Model: {model_tag} ({embedder.dimensions} dims)")
+
+    # SIGTERM (e.g. from an orchestrator) finishes the current job, then exits
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+
+    beat = HeartbeatThread(worker_id, heartbeat_interval)
+    beat.start()
+
+    stats = {'done': 0, 'failed': 0, 'lost': 0}
+    started = time.time()
+    try:
+        while not stopping.is_set():
+            with conn.cursor() as cur:
+                reclaimed = reclaim_stale_jobs(cur, stale_after)
+                jobs = claim_jobs(cur, vault_path, worker_id, claim)
+            conn.commit()
+            if reclaimed:
+                print(f"♻️  Reclaimed {reclaimed} jobs from dead workers", flush=True)
+
+            if not jobs:
+                if exit_when_empty:
+                    with conn.cursor() as cur:
+                        counts = queue_status(cur, vault_path)['counts']
+                    conn.commit()
+                    if not counts.get('pending') and not counts.get('running'):
+                        break
+                stopping.wait(idle_sleep)
+                continue
+
+            for job in jobs:
+                if stopping.is_set():
+                    break
+                job_start = time.time()
+                try:
+                    result = process_job(conn, embedder, vault_id, vault_dir, job, worker_id, batch_size)
+                    stats[result] += 1
+                    marker = '✅' if result == 'done' else '⚠️  lost'
+                    print(f"{marker} {job[1]} ({(time.time() - job_start) * 1000:.0f} ms)", flush=True)
+                except psycopg2.OperationalError:
+                    raise
+                except Exception as e:
+                    conn.rollback()
+                    with conn.cursor() as cur:
+                        fail_job(cur, job[0], worker_id, str(e))
+                    conn.commit()
+                    stats['failed'] += 1
+                    print(f"❌ {job[1]}: {e}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        beat.stop()
+        # Unstarted claims go straight back to the queue
+        try:
+            conn.rollback()
+            with conn.cursor() as cur:
+                released = release_jobs(cur, worker_id)
+            conn.commit()
+            if released:
+                print(f"\n↩️  Released {released} unfinished jobs")
+        except psycopg2.Error:
+            pass
+        conn.close()
+
+    elapsed = time.time() - started
+    print(f"\n👋 Worker stopped: {stats['done']} done, {stats['failed']} failed, {stats['lost']} lost "
+          f"in {elapsed:.1f}s ({stats['done'] / elapsed if elapsed else 0:.1f} files/s)")
+
+# ---------------------------------------------------------------------------
+# Status
+# ---------------------------------------------------------------------------
+
+def status(vault_path: str = None):
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor() as cur:
+            ensure_job_queue(cur)
+            result = queue_status(cur, vault_path)
+        conn.commit()
+    finally:
+        conn.close()
+
+    print("📋 Index job queue" + (f" ({vault_path})" if vault_path else ""))
+    print("=" * 60)
+    for state in ('pending', 'running', 'done', 'failed'):
+        print(f"   {state:<8} {result['counts'].get(state, 0):>8}")
+    print(f"\n   Throughput: {result['done_last_minute']} files in the last minute")
+    if result['workers']:
+        print(f"\n👷 Active workers:")
+        for worker_id, jobs, age in result['workers']:
+            print(f"   {worker_id:<40} {jobs} jobs, heartbeat {age:.0f}s ago")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Index a vault through a Postgres job queue')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan_parser = subparsers.add_parser('scan', help='Queue jobs for new, changed and deleted files')
+    scan_parser.add_argument('--vault', default='./demo-vault', help='Path to vault directory')
+    scan_parser.add_argument('--force', action='store_true', help='Re-queue every file, changed or not')
+    add_priority_arguments(scan_parser)
+
+    work_parser = subparsers.add_parser('work', help='Claim and index jobs until stopped')
+    work_parser.add_argument('--vault', default='./demo-vault', help='Vault path the scanner used (identifies the queue)')
+    work_parser.add_argument('--mount', help='Where the vault is on this machine (default: --vault)')
+    work_parser.add_argument('--model', default='ada002', choices=sorted(EMBEDDING_MODELS), help='Embedding model tag')
+    work_parser.add_argument('--claim', type=int, default=1, help='Jobs claimed per round trip')
+    work_parser.add_argument('--batch-size', type=int, default=32, help='Chunks per embedding request')
+    work_parser.add_argument('--heartbeat', type=float, default=10.0, help='Heartbeat interval (seconds)')
+    work_parser.add_argument('--stale-after', type=float, default=60.0, help='Reclaim jobs whose heartbeat is older than this')
+    work_parser.add_argument('--idle-sleep', type=float, default=2.0, help='Wait between polls of an empty queue')
+    work_parser.add_argument('--exit-when-empty', action='store_true', help='Stop once nothing is pending or running')
+    work_parser.add_argument('--defer-embeddings', action='store_true',
+                             help='Write chunks with NULL embeddings for embed_pending_chunks.py to fill')
+
+    status_parser = subparsers.add_parser('status', help='Show queue counts and active workers')
+    status_parser.add_argument('--vault', help='Only this vault')
+
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        status(os.path.abspath(args.vault) if args.vault else None)
+        exit(0)
+
+    vault_path = os.path.abspath(args.vault)
+
+    if args.command == 'scan':
+        if not os.path.exists(vault_path):
+            print(f"❌ Vault not found: {vault_path}")
+            exit(1)
+        scan(vault_path, args.force, policy_from_args(args))
+    else:
+        if args.stale_after <= args.heartbeat * 2:
+            print("❌ --stale-after must be well above --heartbeat, or live workers lose their jobs")
+            exit(1)
+        vault_dir = os.path.abspath(args.mount) if args.mount else vault_path
+        work(vault_path, vault_dir, args.model, args.claim, args.batch_size,
+             args.heartbeat, args.stale_after, args.idle_sleep, args.exit_when_empty, args.defer_embeddings)
@@ -6,17 +6,16 @@ Processes markdown files, generates embeddings using sentence-transformers, and
 
 import os
 import sys
-import json
-from pathlib import Path
-from datetime import datetime
+import time
 from dotenv import load_dotenv
 import psycopg2
-from psycopg2.extras import execute_values
-from sentence_transformers import SentenceTransformer
 
 # Add lib to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
-from chunking import chunk_markdown_file, count_tokens
+from file_indexing import is_indexable, scan_vault, read_file, register_vault, delete_file, write_file
+from search_metrics import StageTimer
+from index_priority import PriorityPolicy, add_priority_arguments, load_hits, policy_from_args, prioritize
+from vault_watcher import ChangeBatcher, create_watcher
 
 # Load environment variables
 load_dotenv('.env.local')
@@ -27,11 +26,25 @@ if not DATABASE_URL:
     print("❌ DATABASE_URL not found in .env.local")
     exit(1)
 
-# Initialize local embedding model
-# Using all-MiniLM-L6-v2: Fast, efficient, 384-dimensional embeddings
-print("🤖 Loading local embedding model (all-MiniLM-L6-v2)...")
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-print("✅ Model loaded and ready!")
+# "local" (sentence-transformers) or "mock" (deterministic hash vectors for benchmarks)
+RAG_EMBEDDER = os.getenv('RAG_EMBEDDER', 'local')
+
+if RAG_EMBEDDER == 'mock':
+    from mock_embeddings import MockEmbedder
+    embedding_model = MockEmbedder(
+        dimensions=int(os.getenv('RAG_MOCK_DIMENSIONS', '384')),
+        latency_ms=float(os.getenv('RAG_MOCK_LATENCY_MS', '0')),
+        ms_per_1k_chars=float(os.getenv('RAG_MOCK_MS_PER_1K_CHARS', '0'))
+    )
+    print(f"🧪 Using mock embedder ({embedding_model.dimensions} dimensions)")
+else:
+    from sentence_transformers import SentenceTransformer
+
+    # Initialize local embedding model
+    # Using all-MiniLM-L6-v2: Fast, efficient, 384-dimensional embeddings
+    print("🤖 Loading local embedding model (all-MiniLM-L6-v2)...")
+    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+    print("✅ Model loaded and ready!")
 
 def generate_embedding(text: str) -> list:
     """
@@ -46,71 +59,53 @@ def generate_embedding(text: str) -> list:
         print(f"  ❌ Error generating embedding: {e}")
         raise e
 
-def scan_vault(vault_path: str) -> list:
-    """Scan vault directory for markdown files"""
-    markdown_files = []
-
-    for root, dirs, files in os.walk(vault_path):
-        # Skip hidden directories
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
-
-        for file in files:
-            if file.endswith('.md') and file != 'README.md' and not file.startswith('.'):
-                full_path = os.path.join(root, file)
-                rel_path = os.path.relpath(full_path, vault_path)
-                markdown_files.append(rel_path)
-
-    return markdown_files
-
-def process_file(vault_path: str, rel_path: str) -> tuple:
-    """
-    Process a single markdown file
-    Returns: (chunks, file_info)
+def index_file(cur, vault_id: str, vault_path: str, rel_path: str, batch_size: int = 10, timer: StageTimer = None,
+               verbose: bool = True, defer_embeddings: bool = False) -> tuple:
     """
-    full_path = os.path.join(vault_path, rel_path)
-
-    # Read file
-    with open(full_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Get file stats
-    stats = os.stat(full_path)
-
-    # Parse frontmatter (basic YAML parsing)
-    metadata = {}
-    if content.startswith('---'):
-        end = content.find('---', 3)
-        if end != -1:
-            frontmatter = content[3:end].strip()
-            content = content[end + 3:].strip()
-
-            # Simple YAML parsing
-            for line in frontmatter.split('\n'):
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    metadata[key.strip()] = value.strip()
-
-    # Chunk the file
-    chunks = chunk_markdown_file(rel_path, content, max_tokens=500, overlap_tokens=100)
-
-    # File info
-    file_info = {
-        'file_path': rel_path,
-        'filename': os.path.basename(rel_path),
-        'folder': os.path.dirname(rel_path) or 'root',
-        'size_bytes': stats.st_size,
-        'chunk_count': len(chunks),
-        'last_modified': datetime.fromtimestamp(stats.st_mtime),
-        'metadata': metadata
-    }
+    Replace one file's rows (markdown_files, markdown_chunks, centroid)
+    Does not commit. Returns: (file_info, chunk_count, tokens)
 
-    return chunks, file_info
-
-def index_vault(vault_path: str, batch_size: int = 10):
+    With defer_embeddings the chunks are written with NULL embeddings for
+    embed_pending_chunks.py to fill in.
+    """
+    timer = timer or StageTimer()
+
+    chunks, file_info = read_file(vault_path, rel_path, timer=timer)
+    if verbose:
+        print(f"  📄 Created {len(chunks)} chunks")
+
+    embeddings = None
+    if not defer_embeddings:
+        embeddings = []
+        # Generate embeddings in batches
+        for batch_start in range(0, len(chunks), batch_size):
+            batch = chunks[batch_start:batch_start + batch_size]
+            if verbose:
+                print(f"  🤖 Generating embeddings for batch {batch_start//batch_size + 1}...", end='')
+            with timer.stage('embed'):
+                embeddings.extend(generate_embedding(chunk['chunk_text']) for chunk in batch)
+            if verbose:
+                print(" ✅")
+
+    with timer.stage('write'):
+        write_file(cur, vault_id, file_info, chunks, embeddings)
+
+    tokens = sum(chunk['chunk_tokens'] for chunk in chunks)
+    return file_info, len(chunks), tokens
+
+def index_vault(vault_path: str, batch_size: int = 10, timer: StageTimer = None, defer_embeddings: bool = False,
+                policy: PriorityPolicy = None, scan_order: bool = False) -> dict:
     """
     Main indexing function
     Processes all markdown files in vault and stores in database
+
+    Files are indexed highest priority first (lib/index_priority.py:
+    recent, frequently retrieved and small files lead) unless scan_order.
+    Time spent per stage (scan, read, chunk, embed, write, commit) is
+    collected in `timer`; returns file/chunk/token counts.
     """
+    timer = timer or StageTimer()
+    stats = {'files': 0, 'chunks': 0, 'tokens': 0, 'bytes': 0, 'errors': 0}
     print("🔍 Indexing vault with RAG...")
     print("=" * 60)
     print(f"Vault: {vault_path}")
@@ -124,25 +119,28 @@ def index_vault(vault_path: str, batch_size: int = 10):
     try:
         # Create or update vault config
         print("1️⃣ Registering vault...")
-        cur.execute("""
-            INSERT INTO vault_configs (vault_path, settings)
-            VALUES (%s, %s)
-            ON CONFLICT (vault_path)
-            DO UPDATE SET updated_at = NOW()
-            RETURNING id;
-        """, (vault_path, json.dumps({})))
-        vault_id = cur.fetchone()[0]
+        vault_id = register_vault(cur, vault_path)
         conn.commit()
         print(f"✅ Vault ID: {vault_id}")
 
         # Scan for markdown files
         print("\n2️⃣ Scanning for markdown files...")
-        markdown_files = scan_vault(vault_path)
+        with timer.stage('scan'):
+            markdown_files = scan_vault(vault_path)
         print(f"✅ Found {len(markdown_files)} markdown files")
 
         if not markdown_files:
             print("⚠️  No markdown files found. Exiting.")
-            return
+            return stats
+
+        if not scan_order:
+            policy = policy or PriorityPolicy.from_env()
+            with timer.stage('scan'):
+                ranked = prioritize(vault_path, markdown_files, policy, load_hits(cur, vault_id, policy))
+            conn.commit()
+            markdown_files = [rel_path for rel_path, _, _ in ranked]
+            fast = sum(1 for _, _, lane in ranked if lane == 'fast')
+            print(f"✅ Ordered by priority ({fast} files in the fast lane)")
 
         # Process files
         print("\n3️⃣ Processing files and generating embeddings...")
@@ -153,70 +151,26 @@ def index_vault(vault_path: str, batch_size: int = 10):
             print(f"\n[{i}/{len(markdown_files)}] Processing: {rel_path}")
 
             try:
-                # Process file
-                chunks, file_info = process_file(vault_path, rel_path)
-                print(f"  📄 Created {len(chunks)} chunks")
-
-                # Delete existing chunks for this file
-                cur.execute("DELETE FROM markdown_chunks WHERE file_path = %s", (rel_path,))
-                cur.execute("DELETE FROM markdown_files WHERE file_path = %s", (rel_path,))
-
-                # Insert file info
-                cur.execute("""
-                    INSERT INTO markdown_files
-                    (file_path, filename, folder, size_bytes, chunk_count, last_modified, metadata)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    file_info['file_path'],
-                    file_info['filename'],
-                    file_info['folder'],
-                    file_info['size_bytes'],
-                    file_info['chunk_count'],
-                    file_info['last_modified'],
-                    json.dumps(file_info['metadata'])
-                ))
-
-                # Process chunks in batches
-                for batch_start in range(0, len(chunks), batch_size):
-                    batch = chunks[batch_start:batch_start + batch_size]
-
-                    # Generate embeddings
-                    print(f"  🤖 Generating embeddings for batch {batch_start//batch_size + 1}...", end='')
-                    embeddings = []
-                    for chunk in batch:
-                        embedding = generate_embedding(chunk['chunk_text'])
-                        embeddings.append(embedding)
-                    print(" ✅")
-
-                    # Insert chunks with embeddings
-                    values = []
-                    for chunk, embedding in zip(batch, embeddings):
-                        values.append((
-                            chunk['file_path'],
-                            chunk['chunk_index'],
-                            chunk['chunk_text'],
-                            chunk['chunk_tokens'],
-                            embedding,
-                            json.dumps(chunk['metadata'])
-                        ))
-
-                    execute_values(cur, """
-                        INSERT INTO markdown_chunks
-                        (file_path, chunk_index, chunk_text, chunk_tokens, embedding, metadata)
-                        VALUES %s
-                    """, values)
-
-                    total_chunks += len(batch)
-                    total_tokens += sum(chunk['chunk_tokens'] for chunk in batch)
-
-                conn.commit()
+                file_info, chunk_count, tokens = index_file(cur, vault_id, vault_path, rel_path, batch_size, timer,
+                                                            defer_embeddings=defer_embeddings)
+                total_chunks += chunk_count
+                total_tokens += tokens
+
+                with timer.stage('commit'):
+                    conn.commit()
+                stats['files'] += 1
+                stats['bytes'] += file_info['size_bytes']
                 print(f"  ✅ Indexed successfully")
 
             except Exception as e:
                 print(f"  ❌ Error processing {rel_path}: {e}")
                 conn.rollback()
+                stats['errors'] += 1
                 continue
 
+        stats['chunks'] = total_chunks
+        stats['tokens'] = total_tokens
+
         # Update vault stats
         print("\n4️⃣ Updating vault statistics...")
         cur.execute("""
@@ -239,6 +193,8 @@ def index_vault(vault_path: str, batch_size: int = 10):
         print(f"   Avg tokens/chunk: {total_tokens // total_chunks if total_chunks > 0 else 0}")
         print(f"\n✅ Vault indexed and ready for semantic search!")
 
+        return stats
+
     except Exception as e:
         print(f"\n❌ Indexing failed: {e}")
         import traceback
@@ -249,12 +205,172 @@ def index_vault(vault_path: str, batch_size: int = 10):
         cur.close()
         conn.close()
 
+def load_indexed_files(cur, vault_id: str) -> dict:
+    """{file_path: (mtime, size_bytes)} of everything currently indexed for a vault"""
+    cur.execute("SELECT file_path, last_modified, size_bytes FROM markdown_files WHERE vault_id = %s;", (vault_id,))
+    return {
+        file_path: (last_modified.timestamp() if last_modified else 0.0, size_bytes)
+        for file_path, last_modified, size_bytes in cur.fetchall()
+    }
+
+def is_current(known: dict, vault_path: str, rel_path: str) -> bool:
+    """True if the indexed mtime and size still match the file on disk"""
+    if rel_path not in known:
+        return False
+    stats = os.stat(os.path.join(vault_path, rel_path))
+    mtime, size = known[rel_path]
+    return size == stats.st_size and abs(mtime - stats.st_mtime) < 1e-3
+
+def reconcile_paths(conn, vault_id: str, vault_path: str, paths: list, known: dict, batch_size: int, timer: StageTimer,
+                    defer_embeddings: bool = False, policy: PriorityPolicy = None, hits: dict = None) -> dict:
+    """
+    Bring the index in line with the filesystem for each changed path
+
+    Events are only hints: each path is re-examined on disk, so a burst of
+    create/modify/move events resolves to one re-index of the final file,
+    a deleted file or folder removes its rows, and a moved-in folder is
+    indexed in full. `known` is updated in place. With a policy, re-indexes
+    run highest priority first (matters for the catch-up pass).
+    """
+    stats = {'indexed': 0, 'removed': 0, 'chunks': 0, 'errors': 0}
+    upserts, removals = set(), set()
+
+    for rel_path in paths:
+        full_path = os.path.join(vault_path, rel_path)
+        prefix = '' if rel_path == '.' else rel_path + '/'
+        if os.path.isdir(full_path):
+            on_disk = {os.path.normpath(os.path.join(rel_path, path)) for path in scan_vault(full_path)}
+            upserts |= on_disk
+            removals |= {path for path in known if path.startswith(prefix) and path not in on_disk}
+        elif os.path.isfile(full_path):
+            if is_indexable(os.path.basename(rel_path)):
+                upserts.add(rel_path)
+        else:
+            # Gone: either a file or a whole folder
+            removals |= {path for path in known if path == rel_path or path.startswith(prefix)}
+
+    cur = conn.cursor()
+    try:
+        for rel_path in sorted(removals):
+            delete_file(cur, vault_id, rel_path)
+            conn.commit()
+            known.pop(rel_path, None)
+            stats['removed'] += 1
+            print(f"  🗑️  {rel_path}")
+
+        upserts = sorted(upserts)
+        if policy is not None:
+            upserts = [rel_path for rel_path, _, _ in prioritize(vault_path, upserts, policy, hits or {})]
+
+        for rel_path in upserts:
+            try:
+                if is_current(known, vault_path, rel_path):
+                    continue
+                start = time.time()
+                file_info, chunk_count, _ = index_file(
+                    cur, vault_id, vault_path, rel_path, batch_size, timer, verbose=False, defer_embeddings=defer_embeddings
+                )
+                with timer.stage('commit'):
+                    conn.commit()
+                known[rel_path] = (file_info['last_modified'].timestamp(), file_info['size_bytes'])
+                stats['indexed'] += 1
+                stats['chunks'] += chunk_count
+                print(f"  🔄 {rel_path} ({chunk_count} chunks, {(time.time() - start) * 1000:.0f} ms)")
+            except psycopg2.OperationalError:
+                raise
+            except Exception as e:
+                # Deleted mid-burst, half-written, unparseable: the next event retries it
+                conn.rollback()
+                stats['errors'] += 1
+                print(f"  ⚠️  Skipped {rel_path}: {e}")
+    finally:
+        cur.close()
+
+    return stats
+
+def watch_vault(vault_path: str, batch_size: int = 10, debounce: float = 1.0, max_delay: float = 10.0,
+                poll_interval: float = 2.0, defer_embeddings: bool = False, policy: PriorityPolicy = None):
+    """
+    Keep the index in sync with the vault until interrupted
+
+    Catches up on anything changed while not running, then re-indexes only
+    the paths the watcher reports. The embedding model stays loaded for the
+    whole session, so an edit is searchable about `debounce` seconds after
+    the last save.
+    """
+    print("👀 Watching vault for changes...")
+    print("=" * 60)
+    print(f"Vault: {vault_path}")
+    print(f"Debounce: {debounce:g}s (max {max_delay:g}s)")
+
+    # First encode pays one-off initialization costs; do it before any edit waits on it
+    if not defer_embeddings:
+        generate_embedding("warm up")
+
+    watcher = create_watcher(vault_path, poll_interval)
+    batcher = ChangeBatcher(debounce, max_delay)
+    timer = StageTimer()
+    conn = None
+    known = {}
+    hits = {}
+    # Catch-up pass: '.' reconciles the whole vault
+    batcher.add(['.'], now=0.0)
+
+    try:
+        while True:
+            paths, rescan = watcher.poll(batcher.next_timeout())
+            if rescan:
+                print("⚠️  Event queue overflowed; rescanning the vault")
+                paths.add('.')
+            batcher.add(paths)
+
+            ready = batcher.due()
+            if not ready:
+                continue
+
+            try:
+                if conn is None:
+                    conn = psycopg2.connect(DATABASE_URL)
+                    with conn.cursor() as cur:
+                        vault_id = register_vault(cur, vault_path)
+                        known = load_indexed_files(cur, vault_id)
+                        hits = load_hits(cur, vault_id, policy) if policy is not None else {}
+                    conn.commit()
+
+                start = time.time()
+                stats = reconcile_paths(conn, vault_id, vault_path, ready, known, batch_size, timer, defer_embeddings, policy, hits)
+                if stats['indexed'] or stats['removed']:
+                    print(
+                        f"✅ {stats['indexed']} indexed ({stats['chunks']} chunks), "
+                        f"{stats['removed']} removed in {time.time() - start:.2f}s"
+                    )
+            except psycopg2.OperationalError as e:
+                # Database went away: retry these paths after reconnecting
+                print(f"❌ Database error: {e}; retrying in {poll_interval:g}s")
+                if conn is not None:
+                    conn.close()
+                conn = None
+                batcher.add(ready, now=time.monotonic() + poll_interval)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        watcher.close()
+        if conn is not None:
+            conn.close()
+
 if __name__ == '__main__':
     import argparse
 
     parser = argparse.ArgumentParser(description='Index vault with RAG')
     parser.add_argument('--vault', default='./demo-vault', help='Path to vault directory')
     parser.add_argument('--batch-size', type=int, default=10, help='Batch size for embedding generation')
+    parser.add_argument('--watch', action='store_true', help='Keep running and re-index files as they change')
+    parser.add_argument('--debounce', type=float, default=1.0, help='Seconds a file must be quiet before re-indexing (--watch)')
+    parser.add_argument('--max-delay', type=float, default=10.0, help='Re-index a continuously changing file at least this often (--watch)')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='Polling interval when inotify is unavailable (--watch)')
+    parser.add_argument('--defer-embeddings', action='store_true',
+                        help='Write chunks with NULL embeddings for embed_pending_chunks.py to fill')
+    add_priority_arguments(parser)
 
     args = parser.parse_args()
 
@@ -264,4 +380,10 @@ if __name__ == '__main__':
         print(f"❌ Vault not found: {vault_path}")
         exit(1)
 
-    index_vault(vault_path, args.batch_size)
+    policy = policy_from_args(args)
+    if args.watch:
+        watch_vault(vault_path, args.batch_size, args.debounce, args.max_delay, args.poll_interval,
+                    args.defer_embeddings, policy)
+    else:
+        index_vault(vault_path, args.batch_size, defer_embeddings=args.defer_embeddings,
+                    policy=policy, scan_order=args.scan_order)
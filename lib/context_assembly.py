@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Context Assembly Module
+Turns search hits into a compact, token-budgeted prompt context
+
+Search often returns neighboring chunks of the same file, and
+chunk_by_tokens() makes neighbors overlap by up to 100 tokens. This stage
+groups hits by file, stitches adjacent chunks into spans with the overlap
+removed, optionally fetches the chunk that bridges two nearby hits, and
+packs the best spans under a token budget.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from chunking import count_tokens, encoding, optimize_chunk_for_context
+
+# Longest overlap we look for between neighbors (100 tokens is ~400-600 chars)
+MAX_OVERLAP_CHARS = 2000
+
+# Prefix of the next chunk used to locate the overlap in the previous one
+OVERLAP_PROBE_CHARS = 32
+
+def overlap_length(previous: str, following: str) -> int:
+    """
+    Length of the longest suffix of `previous` that is a prefix of `following`
+
+    Only considers overlaps up to MAX_OVERLAP_CHARS and at least
+    OVERLAP_PROBE_CHARS long, so unrelated chunks that happen to share a
+    short phrase are not glued together.
+    """
+    if not previous or not following:
+        return 0
+
+    probe = following[:OVERLAP_PROBE_CHARS]
+    if len(probe) < OVERLAP_PROBE_CHARS:
+        return 0
+
+    window_start = max(0, len(previous) - MAX_OVERLAP_CHARS)
+    position = previous.find(probe, window_start)
+    while position != -1:
+        tail = previous[position:]
+        if following.startswith(tail):
+            return len(tail)
+        position = previous.find(probe, position + 1)
+
+    return 0
+
+def stitch_texts(previous: str, following: str) -> str:
+    """Join two neighboring chunk texts, dropping the duplicated overlap"""
+    overlap = overlap_length(previous, following)
+    if overlap:
+        return previous + following[overlap:]
+    return previous.rstrip() + '\n\n' + following.lstrip()
+
+def group_spans(chunks: List[Dict[str, Any]], max_gap: int = 0) -> List[List[Dict[str, Any]]]:
+    """
+    Group chunks into runs of consecutive chunk_index per file
+
+    Files are keyed by (vault_id, file_path): paths are only unique within
+    a vault, and an unscoped search can hit the same path in two vaults.
+    With max_gap > 0, runs separated by up to max_gap missing indexes are
+    kept together; the caller fills the gaps (see fetch_gap_chunks()).
+    """
+    by_file = {}
+    for chunk in chunks:
+        by_file.setdefault((chunk.get('vault_id'), chunk['file_path']), {})[chunk['chunk_index']] = chunk
+
+    spans = []
+    for indexed in by_file.values():
+        span = []
+        for chunk_index in sorted(indexed):
+            if span and chunk_index - span[-1]['chunk_index'] > max_gap + 1:
+                spans.append(span)
+                span = []
+            span.append(indexed[chunk_index])
+        if span:
+            spans.append(span)
+
+    return spans
+
+def fetch_gap_chunks(conn, spans: List[List[Dict[str, Any]]]) -> Dict[tuple, Dict[str, Any]]:
+    """
+    Fetch every chunk missing inside a span in a single query
+
+    Gaps are looked up next to the span's first hit (same vault and file),
+    so vaults that share a file path never fill each other's gaps. Keyed
+    by (vault_id, file_path, chunk_index).
+    """
+    wanted_anchors = []
+    wanted_indexes = []
+    for span in spans:
+        present = {chunk['chunk_index'] for chunk in span}
+        for chunk_index in range(span[0]['chunk_index'], span[-1]['chunk_index'] + 1):
+            if chunk_index not in present:
+                wanted_anchors.append(span[0]['id'])
+                wanted_indexes.append(chunk_index)
+
+    if not wanted_anchors:
+        return {}
+
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT markdown_chunks.id, markdown_chunks.file_path, markdown_chunks.chunk_index,
+               markdown_chunks.chunk_text, markdown_chunks.metadata, markdown_chunks.vault_id
+        FROM unnest(%s::uuid[], %s::int[]) AS wanted(anchor_id, chunk_index)
+        JOIN markdown_chunks AS anchor
+          ON anchor.id = wanted.anchor_id
+        JOIN markdown_chunks
+          ON markdown_chunks.vault_id = anchor.vault_id
+         AND markdown_chunks.file_path = anchor.file_path
+         AND markdown_chunks.chunk_index = wanted.chunk_index;
+    """, (wanted_anchors, wanted_indexes))
+    rows = cur.fetchall()
+    cur.close()
+
+    return {
+        (str(row[5]), row[1], row[2]): {
+            'id': str(row[0]),
+            'vault_id': str(row[5]),
+            'file_path': row[1],
+            'chunk_index': row[2],
+            'chunk_text': row[3],
+            'metadata': row[4] or {},
+            'similarity': None
+        }
+        for row in rows
+    }
+
+def build_span(chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Stitch a run of consecutive chunks into one span"""
+    text = optimize_chunk_for_context(chunks[0])
+    previous = chunks[0]
+    for chunk in chunks[1:]:
+        same_section = chunk['metadata'].get('heading') == previous['metadata'].get('heading')
+        # Later parts of the same section: no heading re-prepended, overlap removed
+        following = chunk['chunk_text'] if same_section else optimize_chunk_for_context(chunk)
+        text = stitch_texts(text, following)
+        previous = chunk
+
+    similarities = [chunk['similarity'] for chunk in chunks if chunk.get('similarity') is not None]
+    headings = []
+    for chunk in chunks:
+        heading = chunk['metadata'].get('heading')
+        if heading and heading not in headings:
+            headings.append(heading)
+
+    return {
+        'vault_id': chunks[0].get('vault_id'),
+        'file_path': chunks[0]['file_path'],
+        'chunk_indexes': [chunk['chunk_index'] for chunk in chunks],
+        'headings': headings,
+        'similarity': max(similarities) if similarities else 0.0,
+        'text': text,
+        'tokens': count_tokens(text)
+    }
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to max_tokens, preferring the last paragraph break"""
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    truncated = encoding.decode(tokens[:max_tokens])
+    last_break = truncated.rfind('\n\n')
+    if last_break > len(truncated) // 2:
+        truncated = truncated[:last_break]
+    return truncated.rstrip()
+
+def format_context(spans: List[Dict[str, Any]]) -> str:
+    """Render spans in the same shape the chat route uses for RAG context"""
+    context = '# 🔮 Relevant Context from Your Vault\n\n'
+    context += f'Found {len(spans)} relevant sections:\n\n'
+    for idx, span in enumerate(spans, 1):
+        heading = ', '.join(span['headings']) or 'Content'
+        similarity = span['similarity'] * 100
+        context += f"## [{idx}] {span['file_path']}\n"
+        context += f"**Section:** {heading} ({similarity:.1f}% relevant)\n\n"
+        context += f"{span['text']}\n\n"
+        context += '---\n\n'
+    return context
+
+def assemble_context(
+    chunks: List[Dict[str, Any]],
+    token_budget: int = 3000,
+    conn=None,
+    max_gap: int = 1,
+    min_span_tokens: int = 50
+) -> Dict[str, Any]:
+    """
+    Build the prompt context from search hits
+
+    Args:
+        chunks: Search results (id, vault_id, file_path, chunk_index, chunk_text, metadata, similarity)
+        token_budget: Maximum tokens for all span texts together
+        conn: Optional database connection; when given, chunks missing
+              between two hits (up to max_gap apart) are fetched in one query
+        max_gap: Largest run of missing chunk indexes bridged between hits
+        min_span_tokens: Smallest truncated span worth including
+
+    Returns:
+        {'context', 'spans', 'tokens', 'input_tokens', 'dropped_spans'}
+    """
+    input_tokens = sum(count_tokens(optimize_chunk_for_context(chunk)) for chunk in chunks)
+
+    spans_chunks = group_spans(chunks, max_gap if conn is not None else 0)
+    if conn is not None and max_gap > 0:
+        gap_chunks = fetch_gap_chunks(conn, spans_chunks)
+        filled = []
+        for span in spans_chunks:
+            present = {chunk['chunk_index']: chunk for chunk in span}
+            run = []
+            for chunk_index in range(span[0]['chunk_index'], span[-1]['chunk_index'] + 1):
+                chunk = present.get(chunk_index) or gap_chunks.get(
+                    (span[0].get('vault_id'), span[0]['file_path'], chunk_index)
+                )
+                if chunk is None:
+                    # Gap could not be filled: split the span here
+                    if run:
+                        filled.append(run)
+                    run = []
+                else:
+                    run.append(chunk)
+            if run:
+                filled.append(run)
+        spans_chunks = filled
+
+    spans = sorted((build_span(span) for span in spans_chunks), key=lambda span: -span['similarity'])
+
+    packed = []
+    used = 0
+    dropped = 0
+    for span in spans:
+        remaining = token_budget - used
+        if span['tokens'] <= remaining:
+            packed.append(span)
+            used += span['tokens']
+        elif remaining >= min_span_tokens:
+            span = dict(span, text=truncate_to_tokens(span['text'], remaining))
+            span['tokens'] = count_tokens(span['text'])
+            packed.append(span)
+            used += span['tokens']
+        else:
+            dropped += 1
+
+    return {
+        'context': format_context(packed),
+        'spans': packed,
+        'tokens': used,
+        'input_tokens': input_tokens,
+        'dropped_spans': dropped
+    }
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Embedders Module
+Batch embedding backends (local model, OpenAI-compatible API, mock) behind one interface
+"""
+
+import os
+import time
+import random
+from typing import List
+
+# tag -> (backend, model name, dimensions); tags name shadow columns (embedding_<tag>)
+EMBEDDING_MODELS = {
+    'minilm': ('local', 'all-MiniLM-L6-v2', 384),
+    'ada002': ('openai', 'text-embedding-ada-002', 1536),
+    'te3small': ('openai', 'text-embedding-3-small', 1536),
+    'mock384': ('mock', 'mock', 384),
+    'mock1536': ('mock', 'mock', 1536),
+}
+
+class LocalEmbedder:
+    """sentence-transformers model, batched"""
+
+    def __init__(self, model_name: str, dimensions: int):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dimensions = dimensions
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(texts, convert_to_tensor=False, batch_size=len(texts)).tolist()
+
+class OpenAIEmbedder:
+    """
+    OpenAI-compatible /embeddings endpoint (OPENAI_BASE_URL), one request per batch
+
+    Retries 429 and 5xx responses with Retry-After or exponential backoff,
+    since backfills run for hours and must ride out rate limits.
+    """
+
+    def __init__(self, model_name: str, dimensions: int, max_retries: int = 8):
+        import requests
+
+        self.session = requests.Session()
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.max_retries = max_retries
+        self.url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/') + '/embeddings'
+        self.api_key = os.getenv('OPENAI_API_KEY')
+        if not self.api_key:
+            raise RuntimeError("OPENAI_API_KEY not found in .env.local")
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            response = self.session.post(
+                self.url,
+                headers={
+                    'Authorization': f'Bearer {self.api_key}',
+                    'Content-Type': 'application/json',
+                },
+                json={'model': self.model_name, 'input': texts},
+                timeout=60
+            )
+            if response.status_code == 200:
+                data = sorted(response.json()['data'], key=lambda item: item['index'])
+                return [item['embedding'] for item in data]
+
+            if (response.status_code == 429 or response.status_code >= 500) and attempt < self.max_retries:
+                retry_after = response.headers.get('retry-after')
+                delay = float(retry_after) if retry_after else min(60.0, 2 ** attempt)
+                time.sleep(delay + random.random() * 0.5)
+                continue
+
+            error = response.json().get('error', {}) if response.content else {}
+            raise Exception(f"OpenAI API error: {error.get('message', response.text)}")
+
+class MockBatchEmbedder:
+    """Deterministic hash vectors (see mock_embeddings.py)"""
+
+    def __init__(self, dimensions: int):
+        from mock_embeddings import MockEmbedder
+
+        self.embedder = MockEmbedder(
+            dimensions=dimensions,
+            latency_ms=float(os.getenv('RAG_MOCK_LATENCY_MS', '0'))
+        )
+        self.dimensions = dimensions
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return self.embedder.encode(texts).tolist()
+
+def get_embedder(tag: str):
+    """Build the embedder for a model tag from EMBEDDING_MODELS"""
+    if tag not in EMBEDDING_MODELS:
+        raise ValueError(f"Unknown model tag {tag!r} (known: {', '.join(EMBEDDING_MODELS)})")
+    backend, model_name, dimensions = EMBEDDING_MODELS[tag]
+    if backend == 'local':
+        return LocalEmbedder(model_name, dimensions)
+    if backend == 'openai':
+        return OpenAIEmbedder(model_name, dimensions)
+    return MockBatchEmbedder(dimensions)
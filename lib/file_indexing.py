@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+File Indexing Module
+Read, chunk and write one vault file: the per-file unit of work shared by
+index_vault_rag.py, the queue workers and the backfill pipeline
+"""
+
+import os
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from psycopg2.extras import execute_values
+
+from chunking import chunk_markdown_file
+from frontmatter import parse_frontmatter, parse_tags
+from rag_schema import REFRESH_FILE_CENTROID_SQL
+from search_metrics import StageTimer
+
+def is_indexable(filename: str) -> bool:
+    """Markdown files except README.md and hidden files"""
+    return filename.endswith('.md') and filename != 'README.md' and not filename.startswith('.')
+
+def scan_vault(vault_path: str) -> List[str]:
+    """Relative paths of every indexable file, skipping hidden directories"""
+    markdown_files = []
+    for root, dirs, files in os.walk(vault_path):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for file in files:
+            if is_indexable(file):
+                markdown_files.append(os.path.relpath(os.path.join(root, file), vault_path))
+    return markdown_files
+
+def read_file(vault_path: str, rel_path: str, max_tokens: int = 500, overlap_tokens: int = 100,
+              timer: Optional[StageTimer] = None) -> tuple:
+    """
+    Chunk a vault file, timing the 'read' and 'chunk' stages in `timer`
+    Returns: (chunks, file_info)
+    """
+    timer = timer or StageTimer()
+    full_path = os.path.join(vault_path, rel_path)
+    with timer.stage('read'):
+        with open(full_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        stats = os.stat(full_path)
+
+    with timer.stage('chunk'):
+        metadata, content = parse_frontmatter(content)
+        chunks = chunk_markdown_file(rel_path, content, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+    file_info = {
+        'file_path': rel_path,
+        'filename': os.path.basename(rel_path),
+        'folder': os.path.dirname(rel_path) or 'root',
+        'size_bytes': stats.st_size,
+        'chunk_count': len(chunks),
+        'last_modified': datetime.fromtimestamp(stats.st_mtime),
+        'tags': parse_tags(metadata.get('tags')),
+        'metadata': metadata
+    }
+    return chunks, file_info
+
+def register_vault(cur, vault_path: str) -> str:
+    """
+    vault_configs id for a vault path, creating the row and the vault's
+    markdown_chunks partition on first use
+
+    Partition creation locks the parent table briefly, so call this once
+    per run (and commit), not per file.
+    """
+    cur.execute("""
+        INSERT INTO vault_configs (vault_path, settings)
+        VALUES (%s, %s)
+        ON CONFLICT (vault_path)
+        DO UPDATE SET updated_at = NOW()
+        RETURNING id;
+    """, (vault_path, json.dumps({})))
+    vault_id = str(cur.fetchone()[0])
+    cur.execute("SELECT ensure_vault_partition(%s);", (vault_id,))
+    return vault_id
+
+def delete_file(cur, vault_id: str, rel_path: str):
+    """Delete a file's chunks and file row"""
+    cur.execute("DELETE FROM markdown_chunks WHERE vault_id = %s AND file_path = %s", (vault_id, rel_path))
+    cur.execute("DELETE FROM markdown_files WHERE vault_id = %s AND file_path = %s", (vault_id, rel_path))
+
+def write_file(cur, vault_id: str, file_info: dict, chunks: list, embeddings: Optional[list]):
+    """
+    Replace a file's rows and refresh its centroid (does not commit)
+
+    With embeddings=None the chunks are written with NULL embeddings, to be
+    filled in later by the backfill worker.
+    """
+    rel_path = file_info['file_path']
+    delete_file(cur, vault_id, rel_path)
+
+    cur.execute("""
+        INSERT INTO markdown_files
+        (vault_id, file_path, filename, folder, size_bytes, chunk_count, last_modified, metadata)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, (
+        vault_id,
+        rel_path,
+        file_info['filename'],
+        file_info['folder'],
+        file_info['size_bytes'],
+        file_info['chunk_count'],
+        file_info['last_modified'],
+        json.dumps(file_info['metadata'])
+    ))
+
+    if chunks:
+        embeddings = embeddings if embeddings is not None else [None] * len(chunks)
+        execute_values(cur, """
+            INSERT INTO markdown_chunks
+            (vault_id, file_path, chunk_index, chunk_text, chunk_tokens, embedding, metadata,
+             tags, file_modified_at)
+            VALUES %s
+        """, [
+            (
+                vault_id,
+                chunk['file_path'],
+                chunk['chunk_index'],
+                chunk['chunk_text'],
+                chunk['chunk_tokens'],
+                embedding,
+                json.dumps(chunk['metadata']),
+                file_info['tags'],
+                file_info['last_modified']
+            )
+            for chunk, embedding in zip(chunks, embeddings)
+        ])
+
+    # Per-file centroid for two-stage (file-then-chunk) search
+    cur.execute(REFRESH_FILE_CENTROID_SQL, (vault_id, rel_path))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Frontmatter Parsing Module
+Minimal YAML frontmatter parsing shared by the indexers
+"""
+
+from typing import Any, Dict, List, Tuple
+
+def parse_frontmatter(content: str) -> Tuple[Dict[str, str], str]:
+    """
+    Split a markdown document into (frontmatter, body)
+    Frontmatter values are kept as raw strings (simple key: value parsing)
+    """
+    metadata = {}
+    if content.startswith('---'):
+        end = content.find('---', 3)
+        if end != -1:
+            frontmatter = content[3:end].strip()
+            content = content[end + 3:].strip()
+
+            # Simple YAML parsing
+            for line in frontmatter.split('\n'):
+                if ':' in line:
+                    key, value = line.split(':', 1)
+                    metadata[key.strip()] = value.strip()
+
+    return metadata, content
+
+def parse_tags(value: Any) -> List[str]:
+    """
+    Normalize a frontmatter tags value into a list of lowercase tags
+
+    Handles the forms found in our vaults:
+        tags: [feedback, complaints]
+        tags: ['analytics', 'testing']
+        tags: roadmap, strategy
+        tags: #bug #mobile
+    """
+    if not value:
+        return []
+
+    if isinstance(value, (list, tuple)):
+        items = [str(item) for item in value]
+    else:
+        text = str(value).strip()
+        if text.startswith('[') and text.endswith(']'):
+            text = text[1:-1]
+        items = text.replace(',', ' ').split()
+
+    tags = []
+    for item in items:
+        tag = item.strip().strip('\'"').lstrip('#').strip().lower()
+        if tag and tag not in tags:
+            tags.append(tag)
+
+    return tags
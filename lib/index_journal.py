@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Index Journal Module
+Durable progress journal for long indexing runs, so an interrupted run can
+resume where it stopped instead of starting over
+
+    index_runs       one row per run: script, target, status, checkpoint
+    index_run_items  one row per finished file (chunk_index = -1) or chunk
+
+Journal rows are written in the same transaction as the data they
+describe, so the journal never claims work that was rolled back.
+"""
+
+import os
+import json
+import time
+import secrets
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+# chunk_index of the file-level row (status started/done/failed)
+FILE_ITEM = -1
+
+JOURNAL_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS index_runs (
+        run_id TEXT PRIMARY KEY,
+        script TEXT NOT NULL,
+        target TEXT,
+        status TEXT NOT NULL DEFAULT 'running',
+        checkpoint JSONB NOT NULL DEFAULT '{}',
+        items_done BIGINT NOT NULL DEFAULT 0,
+        items_failed BIGINT NOT NULL DEFAULT 0,
+        started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        finished_at TIMESTAMP WITH TIME ZONE
+    );
+
+    CREATE TABLE IF NOT EXISTS index_run_items (
+        run_id TEXT NOT NULL REFERENCES index_runs (run_id) ON DELETE CASCADE,
+        file_path TEXT NOT NULL,
+        chunk_index INTEGER NOT NULL DEFAULT -1,
+        status TEXT NOT NULL,
+        fingerprint TEXT,
+        error TEXT,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (run_id, file_path, chunk_index)
+    );
+"""
+
+def ensure_journal(cur):
+    cur.execute(JOURNAL_SCHEMA_SQL)
+
+def file_fingerprint(path: str) -> str:
+    """mtime + size; a resumed file whose fingerprint changed is redone from chunk 0"""
+    stats = os.stat(path)
+    return f"{stats.st_mtime_ns}:{stats.st_size}"
+
+def start_run(cur, script: str, target: str = None) -> str:
+    run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+    cur.execute("""
+        INSERT INTO index_runs (run_id, script, target)
+        VALUES (%s, %s, %s);
+    """, (run_id, script, target))
+    return run_id
+
+def find_run(cur, script: str, run_id: str = 'latest') -> Optional[Tuple[str, str, dict]]:
+    """
+    (run_id, target, checkpoint) of a run to resume
+
+    'latest' picks the most recent unfinished run of this script.
+    """
+    if run_id == 'latest':
+        cur.execute("""
+            SELECT run_id, target, checkpoint
+            FROM index_runs
+            WHERE script = %s AND status IN ('running', 'interrupted', 'failed')
+            ORDER BY started_at DESC
+            LIMIT 1;
+        """, (script,))
+    else:
+        cur.execute("""
+            SELECT run_id, target, checkpoint
+            FROM index_runs
+            WHERE script = %s AND run_id = %s;
+        """, (script, run_id))
+    return cur.fetchone()
+
+def resume_run(cur, run_id: str):
+    cur.execute("""
+        UPDATE index_runs
+        SET status = 'running', updated_at = NOW(), finished_at = NULL
+        WHERE run_id = %s;
+    """, (run_id,))
+
+def record_items(cur, run_id: str, items: Iterable[Tuple[str, int, str, Optional[str], Optional[str]]]):
+    """Upsert (file_path, chunk_index, status, fingerprint, error) rows"""
+    items = list(items)
+    if not items:
+        return
+
+    execute_values(cur, """
+        INSERT INTO index_run_items (run_id, file_path, chunk_index, status, fingerprint, error)
+        VALUES %s
+        ON CONFLICT (run_id, file_path, chunk_index) DO UPDATE SET
+            status = EXCLUDED.status,
+            fingerprint = EXCLUDED.fingerprint,
+            error = EXCLUDED.error,
+            updated_at = NOW();
+    """, [(run_id,) + tuple(item) for item in items])
+
+    done = sum(1 for item in items if item[2] == 'done')
+    failed = sum(1 for item in items if item[2] == 'failed')
+    cur.execute("""
+        UPDATE index_runs
+        SET items_done = items_done + %s, items_failed = items_failed + %s, updated_at = NOW()
+        WHERE run_id = %s;
+    """, (done, failed, run_id))
+
+def save_checkpoint(cur, run_id: str, checkpoint: Dict):
+    cur.execute("""
+        UPDATE index_runs
+        SET checkpoint = %s, updated_at = NOW()
+        WHERE run_id = %s;
+    """, (json.dumps(checkpoint), run_id))
+
+def finish_run(cur, run_id: str, status: str):
+    """
+    Close a run; completed runs keep only their failed items, which
+    bounds the journal to one row per file/chunk of unfinished runs
+    """
+    cur.execute("""
+        UPDATE index_runs
+        SET status = %s, updated_at = NOW(),
+            finished_at = CASE WHEN %s = 'interrupted' THEN NULL ELSE NOW() END
+        WHERE run_id = %s;
+    """, (status, status, run_id))
+    if status in ('completed', 'completed_with_errors'):
+        cur.execute("""
+            DELETE FROM index_run_items
+            WHERE run_id = %s AND status <> 'failed';
+        """, (run_id,))
+
+def iter_items(conn, run_id: str, fetch_size: int = 5000) -> Iterator[Tuple[str, int, str, Optional[str]]]:
+    """Stream (file_path, chunk_index, status, fingerprint) through a server-side cursor"""
+    with conn.cursor(name=f'index_run_items_{secrets.token_hex(4)}') as cur:
+        cur.itersize = fetch_size
+        cur.execute("""
+            SELECT file_path, chunk_index, status, fingerprint
+            FROM index_run_items
+            WHERE run_id = %s
+            ORDER BY file_path, chunk_index;
+        """, (run_id,))
+        for row in cur:
+            yield row
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Index Priority Module
+Orders indexing work so the notes people edit and ask about are fresh first,
+instead of waiting behind the archive in os.walk order
+
+    priority = recency + retrieval + size    (each term in [0, its weight])
+
+A file in the fast lane (small, and recently edited or retrieved) gets
+FAST_LANE_BOOST on top, so it goes ahead of every normal-lane file.
+
+Retrieval counts come from chat_history.chunks_used and, when
+RAG_SEARCH_LOG is set, the JSON-lines log that rag_search.py appends to.
+"""
+
+import os
+import json
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Added to fast-lane priorities; larger than any normal-lane score
+FAST_LANE_BOOST = 100.0
+
+# Chat messages reference chunks either as objects carrying file_path or
+# as chunk ids (plain strings or objects with id/chunk_id). Only the vault
+# being indexed counts: chunk ids are looked up in its partition (the JSON
+# side is cast to uuid so the primary key serves the join; anything that
+# is not a uuid cannot match), and file paths count when the element or
+# its chat names that vault, or neither names any.
+RETRIEVAL_COUNTS_SQL = """
+    WITH referenced AS (
+        SELECT
+            element->>'file_path' AS file_path,
+            coalesce(element->>'vault_id', chat_history.vault_id::text) AS vault_id,
+            coalesce(element->>'chunk_id', element->>'id', element #>> '{}') AS chunk_id
+        FROM chat_history,
+             jsonb_array_elements(
+                 CASE WHEN jsonb_typeof(chunks_used) = 'array' THEN chunks_used ELSE '[]'::jsonb END
+             ) AS element
+        WHERE created_at > NOW() - make_interval(days => %(window_days)s)
+    )
+    SELECT coalesce(referenced.file_path, markdown_chunks.file_path) AS file_path, count(*)
+    FROM referenced
+    LEFT JOIN markdown_chunks
+      ON referenced.file_path IS NULL
+     AND markdown_chunks.vault_id = %(vault_id)s
+     AND markdown_chunks.id = (
+             CASE WHEN referenced.chunk_id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+                  THEN referenced.chunk_id END
+         )::uuid
+    WHERE CASE
+              WHEN referenced.file_path IS NULL THEN markdown_chunks.id IS NOT NULL
+              ELSE coalesce(referenced.vault_id = %(vault_id)s::text, true)
+          END
+    GROUP BY 1;
+"""
+
+class PriorityPolicy:
+    """Scores files for indexing order; defaults overridable via RAG_PRIORITY_* env vars"""
+
+    def __init__(
+        self,
+        recency_weight: float = 1.0,
+        retrieval_weight: float = 2.0,
+        size_weight: float = 0.5,
+        recency_half_life_days: float = 7.0,
+        retrieval_half_hits: float = 3.0,
+        size_scale_bytes: float = 16384,
+        fast_lane_max_bytes: int = 8192,
+        fast_lane_recent_hours: float = 24.0,
+        fast_lane_min_hits: int = 1,
+        retrieval_window_days: int = 30
+    ):
+        self.recency_weight = recency_weight
+        self.retrieval_weight = retrieval_weight
+        self.size_weight = size_weight
+        self.recency_half_life_days = recency_half_life_days
+        self.retrieval_half_hits = retrieval_half_hits
+        self.size_scale_bytes = size_scale_bytes
+        self.fast_lane_max_bytes = fast_lane_max_bytes
+        self.fast_lane_recent_hours = fast_lane_recent_hours
+        self.fast_lane_min_hits = fast_lane_min_hits
+        self.retrieval_window_days = retrieval_window_days
+
+    @classmethod
+    def from_env(cls, **overrides) -> 'PriorityPolicy':
+        """Defaults, then RAG_PRIORITY_* env vars, then explicit (non-None) overrides"""
+        policy = cls()
+        for name, value in vars(policy).items():
+            env_value = os.getenv(f'RAG_PRIORITY_{name.upper()}')
+            if env_value is not None:
+                setattr(policy, name, type(value)(float(env_value)))
+        for name, value in overrides.items():
+            if value is not None:
+                setattr(policy, name, value)
+        return policy
+
+    def is_fast_lane(self, age_seconds: float, size_bytes: int, hits: int) -> bool:
+        """Small files that were just edited or that people ask about"""
+        if self.fast_lane_max_bytes <= 0 or size_bytes > self.fast_lane_max_bytes:
+            return False
+        recent = age_seconds <= self.fast_lane_recent_hours * 3600
+        hot = self.fast_lane_min_hits > 0 and hits >= self.fast_lane_min_hits
+        return recent or hot
+
+    def score(self, mtime: float, size_bytes: int, hits: int = 0, now: float = None) -> Tuple[float, str]:
+        """(priority, lane) for one file; higher is indexed sooner"""
+        age = max(0.0, (now or time.time()) - mtime)
+        recency = 0.5 ** (age / 86400 / self.recency_half_life_days) if self.recency_half_life_days > 0 else 0.0
+        retrieval = 1 - 0.5 ** (hits / self.retrieval_half_hits) if self.retrieval_half_hits > 0 else 0.0
+        # Small files are cheap: favour them so more content is fresh per second
+        size = 1 / (1 + size_bytes / self.size_scale_bytes)
+
+        priority = self.recency_weight * recency + self.retrieval_weight * retrieval + self.size_weight * size
+        if self.is_fast_lane(age, size_bytes, hits):
+            return priority + FAST_LANE_BOOST, 'fast'
+        return priority, 'normal'
+
+def load_retrieval_counts(cur, vault_id: str, window_days: int = 30) -> Dict[str, int]:
+    """Times each of a vault's files had chunks used in chat answers over the window"""
+    try:
+        cur.execute("SAVEPOINT retrieval_counts;")
+        cur.execute(RETRIEVAL_COUNTS_SQL, {'vault_id': vault_id, 'window_days': window_days})
+        counts = dict(cur.fetchall())
+        cur.execute("RELEASE SAVEPOINT retrieval_counts;")
+        return counts
+    except Exception:
+        # Databases without chat_history simply have no retrieval signal
+        cur.execute("ROLLBACK TO SAVEPOINT retrieval_counts;")
+        return {}
+
+def load_search_log_counts(path: Optional[str], window_days: int = 30) -> Dict[str, int]:
+    """Times each file appeared in search results, from rag_search.py's RAG_SEARCH_LOG"""
+    counts = {}
+    if not path or not os.path.exists(path):
+        return counts
+    cutoff = time.time() - window_days * 86400
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('ts', 0) < cutoff:
+                continue
+            for file_path in entry.get('files', []):
+                counts[file_path] = counts.get(file_path, 0) + 1
+    return counts
+
+def load_hits(cur, vault_id: str, policy: PriorityPolicy) -> Dict[str, int]:
+    """Chat and search-log retrieval counts for one vault's files combined"""
+    hits = load_retrieval_counts(cur, vault_id, policy.retrieval_window_days) if cur is not None else {}
+    for file_path, count in load_search_log_counts(os.getenv('RAG_SEARCH_LOG'), policy.retrieval_window_days).items():
+        hits[file_path] = hits.get(file_path, 0) + count
+    return hits
+
+def prioritize(
+    vault_path: str,
+    rel_paths: Iterable[str],
+    policy: PriorityPolicy,
+    hits: Dict[str, int]
+) -> List[Tuple[str, float, str]]:
+    """
+    [(rel_path, priority, lane)] highest priority first
+
+    Files that vanished since the scan sort last (their job still runs and
+    notices the deletion). Ties keep scan order.
+    """
+    now = time.time()
+    scored = []
+    for order, rel_path in enumerate(rel_paths):
+        try:
+            stats = os.stat(os.path.join(vault_path, rel_path))
+            priority, lane = policy.score(stats.st_mtime, stats.st_size, hits.get(rel_path, 0), now)
+        except FileNotFoundError:
+            priority, lane = -math.inf, 'normal'
+        scored.append((-priority, order, rel_path, lane))
+    scored.sort()
+    return [(rel_path, -negated, lane) for negated, _, rel_path, lane in scored]
+
+def add_priority_arguments(parser):
+    """--scan-order / fast-lane flags shared by the indexing scripts"""
+    parser.add_argument('--scan-order', action='store_true',
+                        help='Index in filesystem order instead of by priority')
+    parser.add_argument('--fast-lane-bytes', type=int,
+                        help='Largest file eligible for the fast lane; 0 disables it (default 8192)')
+    parser.add_argument('--fast-lane-hours', type=float,
+                        help='Files edited within this many hours qualify for the fast lane (default 24)')
+    parser.add_argument('--fast-lane-hits', type=int,
+                        help='Retrievals that qualify a file for the fast lane; 0 disables (default 1)')
+
+def policy_from_args(args) -> Optional[PriorityPolicy]:
+    """Policy for the parsed flags, or None with --scan-order"""
+    if args.scan_order:
+        return None
+    return PriorityPolicy.from_env(
+        fast_lane_max_bytes=args.fast_lane_bytes,
+        fast_lane_recent_hours=args.fast_lane_hours,
+        fast_lane_min_hits=args.fast_lane_hits
+    )
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Job Queue Module
+Postgres-backed queue of file-level indexing jobs (index_jobs)
+
+Workers on any number of machines claim jobs with FOR UPDATE SKIP LOCKED,
+keep them alive with heartbeats, and finish them in the same transaction
+as the rows they wrote. Jobs whose worker stopped heartbeating are put
+back in the queue by whichever worker notices first.
+"""
+
+import os
+import socket
+import secrets
+from typing import Iterable, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+JOB_QUEUE_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS index_jobs (
+        id BIGSERIAL PRIMARY KEY,
+        vault_path TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        action TEXT NOT NULL DEFAULT 'index',
+        status TEXT NOT NULL DEFAULT 'pending',
+        priority DOUBLE PRECISION NOT NULL DEFAULT 0,
+        fingerprint TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        worker_id TEXT,
+        heartbeat_at TIMESTAMP WITH TIME ZONE,
+        error TEXT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        started_at TIMESTAMP WITH TIME ZONE,
+        finished_at TIMESTAMP WITH TIME ZONE,
+        UNIQUE (vault_path, file_path)
+    );
+
+    -- Claim order: only pending rows, highest priority first
+    CREATE INDEX IF NOT EXISTS index_jobs_pending_idx
+    ON index_jobs (vault_path, priority DESC, id)
+    WHERE status = 'pending';
+
+    -- Reaper: running jobs by heartbeat age
+    CREATE INDEX IF NOT EXISTS index_jobs_running_idx
+    ON index_jobs (heartbeat_at)
+    WHERE status = 'running';
+"""
+
+def ensure_job_queue(cur):
+    cur.execute(JOB_QUEUE_SCHEMA_SQL)
+
+def new_worker_id() -> str:
+    """host:pid:random, unique across machines and restarts"""
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+
+def enqueue_jobs(cur, vault_path: str, jobs: Iterable[Tuple[str, str, Optional[str], float]], force: bool = False) -> int:
+    """
+    Upsert (file_path, action, fingerprint, priority) jobs
+
+    A job that already exists is only re-queued when its fingerprint
+    changed, its action changed, it failed, or force is set; unchanged
+    files stay done. Jobs currently running are left alone (a changed file
+    is picked up by the next scan). Jobs still pending take the new
+    priority either way. Returns the number of rows queued.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return 0
+    execute_values(cur, """
+        UPDATE index_jobs
+        SET priority = batch.priority
+        FROM (VALUES %s) AS batch(vault_path, file_path, priority)
+        WHERE index_jobs.vault_path = batch.vault_path
+          AND index_jobs.file_path = batch.file_path
+          AND index_jobs.status = 'pending'
+          AND index_jobs.priority <> batch.priority;
+    """, [(vault_path, job[0], float(job[3])) for job in jobs])
+    rows = execute_values(cur, f"""
+        INSERT INTO index_jobs (vault_path, file_path, action, fingerprint, priority)
+        VALUES %s
+        ON CONFLICT (vault_path, file_path) DO UPDATE SET
+            action = EXCLUDED.action,
+            fingerprint = EXCLUDED.fingerprint,
+            priority = EXCLUDED.priority,
+            status = 'pending',
+            attempts = 0,
+            error = NULL,
+            updated_at = NOW()
+        WHERE index_jobs.status <> 'running'
+          AND ({'TRUE' if force else 'FALSE'}
+               OR index_jobs.status = 'failed'
+               OR index_jobs.action IS DISTINCT FROM EXCLUDED.action
+               OR index_jobs.fingerprint IS DISTINCT FROM EXCLUDED.fingerprint)
+        RETURNING id;
+    """, [(vault_path,) + tuple(job) for job in jobs], fetch=True)
+    return len(rows)
+
+def claim_jobs(cur, vault_path: str, worker_id: str, limit: int = 1) -> List[tuple]:
+    """
+    Atomically take up to `limit` pending jobs
+
+    SKIP LOCKED makes concurrent claimers pass over each other's rows
+    instead of queueing on them, so N workers never block one another.
+    Returns [(id, file_path, action, fingerprint)].
+    """
+    cur.execute("""
+        UPDATE index_jobs
+        SET status = 'running',
+            worker_id = %s,
+            heartbeat_at = NOW(),
+            started_at = NOW(),
+            attempts = attempts + 1,
+            updated_at = NOW()
+        WHERE id IN (
+            SELECT id
+            FROM index_jobs
+            WHERE vault_path = %s AND status = 'pending'
+            ORDER BY priority DESC, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, file_path, action, fingerprint;
+    """, (worker_id, vault_path, limit))
+    return cur.fetchall()
+
+def heartbeat(cur, worker_id: str) -> int:
+    """Refresh every job this worker holds; returns how many it still holds"""
+    cur.execute("""
+        UPDATE index_jobs
+        SET heartbeat_at = NOW()
+        WHERE worker_id = %s AND status = 'running';
+    """, (worker_id,))
+    return cur.rowcount
+
+def complete_job(cur, job_id: int, worker_id: str) -> bool:
+    """
+    Mark a job done, in the caller's transaction
+
+    Returns False if the job is no longer ours (it was reclaimed after a
+    missed heartbeat); the caller must then roll back its writes.
+    """
+    cur.execute("""
+        UPDATE index_jobs
+        SET status = 'done', finished_at = NOW(), updated_at = NOW(), error = NULL
+        WHERE id = %s AND worker_id = %s AND status = 'running';
+    """, (job_id, worker_id))
+    return cur.rowcount == 1
+
+def fail_job(cur, job_id: int, worker_id: str, error: str):
+    """Back to pending for another attempt, or failed once attempts run out"""
+    cur.execute("""
+        UPDATE index_jobs
+        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+            worker_id = NULL,
+            error = %s,
+            updated_at = NOW()
+        WHERE id = %s AND worker_id = %s AND status = 'running';
+    """, (error[:2000], job_id, worker_id))
+
+def release_jobs(cur, worker_id: str) -> int:
+    """Hand back every job this worker holds (clean shutdown); the attempt is not counted"""
+    cur.execute("""
+        UPDATE index_jobs
+        SET status = 'pending', worker_id = NULL, attempts = greatest(attempts - 1, 0), updated_at = NOW()
+        WHERE worker_id = %s AND status = 'running';
+    """, (worker_id,))
+    return cur.rowcount
+
+def reclaim_stale_jobs(cur, stale_seconds: float) -> int:
+    """Requeue running jobs whose worker has not heartbeated within stale_seconds"""
+    cur.execute("""
+        UPDATE index_jobs
+        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+            error = 'worker ' || coalesce(worker_id, '?') || ' stopped heartbeating',
+            worker_id = NULL,
+            updated_at = NOW()
+        WHERE status = 'running'
+          AND heartbeat_at < NOW() - make_interval(secs => %s);
+    """, (stale_seconds,))
+    return cur.rowcount
+
+def queue_status(cur, vault_path: str = None) -> dict:
+    """Job counts by status, workers holding jobs (id, jobs, heartbeat age s), jobs done in the last minute"""
+    cur.execute("""
+        SELECT status, count(*)
+        FROM index_jobs
+        WHERE %s::text IS NULL OR vault_path = %s
+        GROUP BY status;
+    """, (vault_path, vault_path))
+    counts = dict(cur.fetchall())
+    cur.execute("""
+        SELECT worker_id, count(*), extract(epoch FROM NOW() - max(heartbeat_at))
+        FROM index_jobs
+        WHERE status = 'running' AND (%s::text IS NULL OR vault_path = %s)
+        GROUP BY worker_id
+        ORDER BY worker_id;
+    """, (vault_path, vault_path))
+    workers = cur.fetchall()
+    cur.execute("""
+        SELECT count(*)
+        FROM index_jobs
+        WHERE status = 'done' AND finished_at > NOW() - interval '1 minute'
+          AND (%s::text IS NULL OR vault_path = %s);
+    """, (vault_path, vault_path))
+    return {'counts': counts, 'workers': workers, 'done_last_minute': cur.fetchone()[0]}
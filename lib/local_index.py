@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Local Vector Index Module
+Memory-mapped embedding matrix for searching without Postgres
+
+Layout of an index directory:
+    embeddings.npy  - (n, dim) float32/float16 matrix, rows L2-normalized
+    chunks.jsonl    - one JSON record per row (id, file_path, chunk_index, chunk_text, metadata)
+    offsets.npy     - (n + 1,) int64 byte offsets of each record in chunks.jsonl
+    manifest.json   - row count, dimensions, dtype, source
+"""
+
+import os
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+EMBEDDINGS_FILE = 'embeddings.npy'
+CHUNKS_FILE = 'chunks.jsonl'
+OFFSETS_FILE = 'offsets.npy'
+MANIFEST_FILE = 'manifest.json'
+
+# Rows scored per block; bounds the float32 temporaries for float16 matrices
+SEARCH_BLOCK_ROWS = 65536
+
+def parse_vector(value: Any) -> np.ndarray:
+    """Parse a pgvector value ('[0.1,0.2,...]' text or a sequence) into float32"""
+    if isinstance(value, str):
+        return np.array(value.strip('[]').split(','), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so cosine similarity becomes a dot product"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def write_index(
+    out_dir: str,
+    rows: Iterable[Tuple[Dict[str, Any], Any]],
+    count: int,
+    dimensions: int,
+    dtype: str = 'float32',
+    source: Optional[Dict[str, Any]] = None,
+    normalize: bool = True
+) -> Dict[str, Any]:
+    """
+    Stream (record, embedding) pairs into an index directory
+
+    The matrix is written through a memory-mapped .npy file, so exporting
+    never holds more than one row in memory. With normalize=False the
+    stored vectors are kept exactly (database snapshots).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    matrix = np.lib.format.open_memmap(
+        os.path.join(out_dir, EMBEDDINGS_FILE),
+        mode='w+',
+        dtype=np.dtype(dtype),
+        shape=(count, dimensions)
+    )
+    offsets = np.zeros(count + 1, dtype=np.int64)
+
+    written = 0
+    with open(os.path.join(out_dir, CHUNKS_FILE), 'wb') as f:
+        for record, embedding in rows:
+            if written >= count:
+                break
+            vector = parse_vector(embedding)
+            if vector.shape[0] != dimensions:
+                raise ValueError(
+                    f"Chunk {record.get('id')} has {vector.shape[0]} dimensions, expected {dimensions}"
+                )
+            matrix[written] = normalize_rows(vector) if normalize else vector
+            f.write(json.dumps(record, default=str).encode('utf-8') + b'\n')
+            written += 1
+            offsets[written] = f.tell()
+
+    matrix.flush()
+    del matrix
+
+    if written != count:
+        raise ValueError(f"Expected {count} rows, got {written}")
+
+    np.save(os.path.join(out_dir, OFFSETS_FILE), offsets)
+
+    manifest = {
+        'count': count,
+        'dimensions': dimensions,
+        'dtype': dtype,
+        'normalized': normalize,
+        'source': source or {}
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+class LocalIndex:
+    """
+    Exact cosine top-k over a memory-mapped embedding matrix
+
+    Loading is zero-copy: the matrix and offsets are mapped read-only and
+    only the records of the final top-k are read from chunks.jsonl.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+
+        self.embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode='r')
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode='r')
+        self._chunks_file = open(os.path.join(index_dir, CHUNKS_FILE), 'rb')
+        # seek() + read() on the shared handle must not interleave (--serve threads)
+        self._chunks_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    @property
+    def dimensions(self) -> int:
+        return self.embeddings.shape[1]
+
+    def close(self):
+        self._chunks_file.close()
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """Read one chunk record by row number"""
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        with self._chunks_lock:
+            self._chunks_file.seek(start)
+            data = self._chunks_file.read(end - start)
+        return json.loads(data)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of the query against all rows (or a subset of row ids)"""
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        matrix = self.embeddings if rows is None else self.embeddings[rows]
+
+        if matrix.dtype == np.float32:
+            return matrix @ query
+
+        out = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], SEARCH_BLOCK_ROWS):
+            block = matrix[start:start + SEARCH_BLOCK_ROWS].astype(np.float32)
+            out[start:start + SEARCH_BLOCK_ROWS] = block @ query
+        return out
+
+    def top_k(self, query: np.ndarray, k: int = 10, threshold: float = -1.0) -> List[Tuple[int, float]]:
+        """Return [(row, similarity)] sorted by similarity, best first"""
+        if len(self) == 0 or k <= 0:
+            return []
+
+        scores = self.scores(query)
+        k = min(k, scores.shape[0])
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        return [(int(row), float(scores[row])) for row in candidates if scores[row] > threshold]
+
+    def search(self, query: np.ndarray, match_count: int = 10, threshold: float = 0.3) -> List[Dict[str, Any]]:
+        """
+        Same contract as match_markdown_chunks(): chunks with similarity
+        above threshold, best first, at most match_count
+        """
+        chunks = []
+        for row, similarity in self.top_k(query, match_count, threshold):
+            chunk = self.record(row)
+            chunk['similarity'] = similarity
+            chunks.append(chunk)
+        return chunks
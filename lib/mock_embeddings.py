@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Mock Embeddings Module
+Deterministic hash-derived vectors for benchmarks and offline tests
+"""
+
+import time
+import hashlib
+
+import numpy as np
+
+def hash_embedding(text: str, dimensions: int) -> np.ndarray:
+    """
+    Unit vector seeded from the text's hash
+
+    The same text always maps to the same vector on every machine, so
+    indexing and search benchmarks are reproducible without a model.
+    """
+    seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+class MockEmbedder:
+    """
+    Stand-in for SentenceTransformer with configurable latency
+
+    Each encode() call sleeps latency_ms plus ms_per_1k_chars for the input
+    size, which approximates model or API cost without using CPU.
+    """
+
+    def __init__(self, dimensions: int = 384, latency_ms: float = 0.0, ms_per_1k_chars: float = 0.0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+        self.ms_per_1k_chars = ms_per_1k_chars
+
+    def encode(self, text, convert_to_tensor: bool = False, **kwargs):
+        texts = [text] if isinstance(text, str) else list(text)
+
+        delay_ms = self.latency_ms + self.ms_per_1k_chars * sum(len(item) for item in texts) / 1000
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+        vectors = np.stack([hash_embedding(item, self.dimensions) for item in texts])
+        return vectors[0] if isinstance(text, str) else vectors
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+IVF-PQ Index Module
+Compressed approximate search for the local backend (million-chunk vaults)
+
+Built from a local index directory (see local_index.py) and stored next to it:
+    ivf_centroids.npy    - (nlist, dim) float32 coarse centroids
+    pq_codebooks.npy     - (m, 256, dim / m) float32 residual codebooks
+    pq_codes.npy         - (n, m) uint8 codes, grouped by inverted list
+    ivf_list_rows.npy    - (n,) int32 matrix row of each code
+    ivf_list_offsets.npy - (nlist + 1,) int64 start of each inverted list
+    ivfpq.json           - build parameters and evaluation results
+
+Only the codes, row ids and small codebooks need to be resident: m + 4
+bytes per chunk instead of 2 * dim (float16) or 4 * dim (float32). The
+final candidates are re-ranked against the exact vectors in embeddings.npy.
+"""
+
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from local_index import LocalIndex, normalize_rows
+
+PQ_CODEBOOK_SIZE = 256
+ENCODE_BLOCK_ROWS = 16384
+
+def _assign(x: np.ndarray, centroids: np.ndarray, block_rows: int = 8192) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) for each row of x"""
+    centroid_norms = (centroids * centroids).sum(axis=1)
+    labels = np.empty(x.shape[0], dtype=np.int32)
+    for start in range(0, x.shape[0], block_rows):
+        block = np.asarray(x[start:start + block_rows], dtype=np.float32)
+        # ||x||^2 is constant per row, so argmin(||c||^2 - 2 x.c) is enough
+        distances = centroid_norms[None, :] - 2.0 * (block @ centroids.T)
+        labels[start:start + block_rows] = distances.argmin(axis=1)
+    return labels
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means with empty clusters re-seeded from random points"""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    if x.shape[0] <= k:
+        # Fewer points than clusters: pad with jittered copies
+        extra = x[rng.integers(0, x.shape[0], size=k - x.shape[0])]
+        return np.concatenate([x, extra + 1e-4 * rng.standard_normal(extra.shape).astype(np.float32)])
+
+    centroids = x[rng.choice(x.shape[0], size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(x, centroids)
+        counts = np.bincount(labels, minlength=k).astype(np.float32)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(x.shape[0], size=int(empty.sum()), replace=False)]
+
+    return centroids
+
+def default_nlist(count: int) -> int:
+    """Rule of thumb: about 4 * sqrt(n) inverted lists"""
+    return int(max(1, min(65536, 4 * np.sqrt(max(count, 1)))))
+
+def build_ivfpq(
+    index_dir: str,
+    nlist: Optional[int] = None,
+    m: Optional[int] = None,
+    train_sample: int = 100000,
+    iterations: int = 20,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Train IVF centroids and PQ codebooks on a sample, then encode every row
+
+    Args:
+        index_dir: Directory written by export_local_index.py
+        nlist: Number of inverted lists (default: ~4 * sqrt(n))
+        m: Number of PQ sub-quantizers, must divide dim (default: dim / 8)
+        train_sample: Rows used for training
+        iterations: k-means iterations
+        seed: RNG seed (builds are deterministic for a given seed)
+    """
+    embeddings = np.load(os.path.join(index_dir, 'embeddings.npy'), mmap_mode='r')
+    count, dimensions = embeddings.shape
+    nlist = nlist or default_nlist(count)
+    m = m or max(1, dimensions // 8)
+    if dimensions % m != 0:
+        raise ValueError(f"m={m} must divide the embedding dimensions ({dimensions})")
+    dsub = dimensions // m
+
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(count, size=min(train_sample, count), replace=False))
+    sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+
+    # Coarse quantizer
+    centroids = kmeans(sample, nlist, iterations, seed)
+
+    # Residual product quantizer
+    residuals = sample - centroids[_assign(sample, centroids)]
+    codebooks = np.stack([
+        kmeans(residuals[:, j * dsub:(j + 1) * dsub], PQ_CODEBOOK_SIZE, iterations, seed + j + 1)
+        for j in range(m)
+    ])
+
+    # Encode all rows block by block from the memory-mapped matrix
+    lists = np.empty(count, dtype=np.int32)
+    codes = np.empty((count, m), dtype=np.uint8)
+    for start in range(0, count, ENCODE_BLOCK_ROWS):
+        block = np.asarray(embeddings[start:start + ENCODE_BLOCK_ROWS], dtype=np.float32)
+        block_lists = _assign(block, centroids)
+        block_residuals = block - centroids[block_lists]
+        lists[start:start + block.shape[0]] = block_lists
+        for j in range(m):
+            codes[start:start + block.shape[0], j] = _assign(
+                block_residuals[:, j * dsub:(j + 1) * dsub], codebooks[j]
+            )
+
+    # Group codes by inverted list
+    order = np.argsort(lists, kind='stable')
+    list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+    list_offsets[1:] = np.cumsum(np.bincount(lists, minlength=nlist))
+
+    np.save(os.path.join(index_dir, 'ivf_centroids.npy'), centroids.astype(np.float32))
+    np.save(os.path.join(index_dir, 'pq_codebooks.npy'), codebooks.astype(np.float32))
+    np.save(os.path.join(index_dir, 'pq_codes.npy'), codes[order])
+    np.save(os.path.join(index_dir, 'ivf_list_rows.npy'), order.astype(np.int32))
+    np.save(os.path.join(index_dir, 'ivf_list_offsets.npy'), list_offsets)
+
+    manifest = {
+        'count': int(count),
+        'dimensions': int(dimensions),
+        'nlist': int(nlist),
+        'm': int(m),
+        'codebook_size': PQ_CODEBOOK_SIZE,
+        'train_sample': int(sample.shape[0]),
+        'iterations': iterations,
+        'seed': seed,
+        'bytes_per_chunk': int(m + 4),
+        'flat_bytes_per_chunk': int(embeddings.dtype.itemsize * dimensions)
+    }
+    with open(os.path.join(index_dir, 'ivfpq.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+class IVFPQIndex:
+    """
+    Approximate top-k: probe the nearest inverted lists, score their PQ
+    codes with a lookup table, then re-rank the best candidates exactly
+    """
+
+    def __init__(self, index_dir: str):
+        self.flat = LocalIndex(index_dir)
+        with open(os.path.join(index_dir, 'ivfpq.json')) as f:
+            self.manifest = json.load(f)
+
+        self.centroids = np.load(os.path.join(index_dir, 'ivf_centroids.npy'))
+        self.codebooks = np.load(os.path.join(index_dir, 'pq_codebooks.npy'))
+        self.codes = np.load(os.path.join(index_dir, 'pq_codes.npy'))
+        self.list_rows = np.load(os.path.join(index_dir, 'ivf_list_rows.npy'))
+        self.list_offsets = np.load(os.path.join(index_dir, 'ivf_list_offsets.npy'))
+
+        self.m = self.codebooks.shape[0]
+        self.dsub = self.codebooks.shape[2]
+
+    def __len__(self) -> int:
+        return self.list_rows.shape[0]
+
+    def close(self):
+        self.flat.close()
+
+    def resident_bytes(self) -> int:
+        """Memory held by the compressed index (the flat matrix stays on disk)"""
+        return int(
+            self.codes.nbytes + self.list_rows.nbytes + self.list_offsets.nbytes
+            + self.centroids.nbytes + self.codebooks.nbytes
+        )
+
+    def candidates(self, query: np.ndarray, nprobe: int = 16, rerank: int = 100) -> np.ndarray:
+        """Matrix rows of the best `rerank` candidates by approximate score"""
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        nprobe = min(nprobe, self.centroids.shape[0])
+
+        coarse = self.centroids @ query
+        probed = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+
+        starts = self.list_offsets[probed]
+        ends = self.list_offsets[probed + 1]
+        sizes = ends - starts
+        if sizes.sum() == 0:
+            return np.empty(0, dtype=np.int64)
+
+        positions = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        base = np.repeat(coarse[probed], sizes)
+
+        # Inner-product lookup table: lut[j, c] = q_j . codebook[j, c]
+        lut = np.einsum('jcd,jd->jc', self.codebooks, query.reshape(self.m, self.dsub))
+        approx = base + lut[np.arange(self.m), self.codes[positions]].sum(axis=1)
+
+        keep = min(rerank, approx.shape[0])
+        best = np.argpartition(-approx, keep - 1)[:keep]
+        return self.list_rows[positions[best]].astype(np.int64)
+
+    def top_k(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        threshold: float = -1.0,
+        nprobe: int = 16,
+        rerank: int = 100
+    ) -> List[Tuple[int, float]]:
+        """Return [(row, exact similarity)] best first"""
+        rows = self.candidates(query, nprobe, max(rerank, k))
+        if rows.shape[0] == 0:
+            return []
+
+        rows = np.sort(rows)  # sequential reads from the memory map
+        scores = self.flat.scores(query, rows)
+        order = np.argsort(-scores, kind='stable')[:k]
+
+        return [(int(rows[i]), float(scores[i])) for i in order if scores[i] > threshold]
+
+    def search(
+        self,
+        query: np.ndarray,
+        match_count: int = 10,
+        threshold: float = 0.3,
+        nprobe: int = 16,
+        rerank: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Same contract as LocalIndex.search(), approximate candidate set"""
+        chunks = []
+        for row, similarity in self.top_k(query, match_count, threshold, nprobe, rerank):
+            chunk = self.flat.record(row)
+            chunk['similarity'] = similarity
+            chunks.append(chunk)
+        return chunks
+
+def evaluate_ivfpq(
+    index: IVFPQIndex,
+    queries: np.ndarray,
+    k: int = 10,
+    nprobe: int = 16,
+    rerank: int = 100
+) -> Dict[str, Any]:
+    """recall@k against exact flat search, and single-threaded QPS for both"""
+    truth = []
+    start = time.perf_counter()
+    for query in queries:
+        truth.append({row for row, _ in index.flat.top_k(query, k)})
+    flat_seconds = time.perf_counter() - start
+
+    recalls = []
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        found = {row for row, _ in index.top_k(query, k, nprobe=nprobe, rerank=rerank)}
+        recalls.append(len(found & expected) / max(len(expected), 1))
+    ivfpq_seconds = time.perf_counter() - start
+
+    return {
+        'queries': int(len(queries)),
+        'k': k,
+        'nprobe': nprobe,
+        'rerank': rerank,
+        f'recall@{k}': round(float(np.mean(recalls)), 4),
+        'qps': round(len(queries) / ivfpq_seconds, 1),
+        'flat_qps': round(len(queries) / flat_seconds, 1),
+        'resident_bytes_per_chunk': round(index.resident_bytes() / max(len(index), 1), 1),
+        'flat_bytes_per_chunk': int(index.flat.embeddings.dtype.itemsize * index.flat.dimensions)
+    }
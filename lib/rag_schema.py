@@ -0,0 +1,773 @@
+#!/usr/bin/env python3
+"""
+RAG Schema Module
+SQL for the search functions and indexes shared by the setup and migration scripts
+"""
+
+import re
+from typing import List
+
+def folder_like_pattern(folder: str) -> str:
+    """
+    LIKE pattern matching every file under a vault folder
+
+    Must stay byte-for-byte identical to the pattern match_markdown_chunks()
+    builds from folder_prefix, otherwise the planner cannot prove that a
+    hot-folder partial index covers the query.
+    """
+    folder = folder.strip().rstrip('/')
+    escaped = folder.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '/%'
+
+def hot_folder_index_name(folder: str) -> str:
+    """Index name for a hot-folder partial HNSW index"""
+    slug = re.sub(r'[^a-z0-9]+', '_', folder.strip().rstrip('/').lower()).strip('_')
+    return f"markdown_chunks_embedding_{slug}_idx"[:63]
+
+def shadow_index_name(name: str, tag: str) -> str:
+    """Name of an index built on a model's shadow column (see migrate_embeddings_online.py)"""
+    suffix = f"_{tag}"
+    return name[:63 - len(suffix)] + suffix
+
+def vault_partition_name(vault_id) -> str:
+    """markdown_chunks partition holding one vault's chunks"""
+    return f"markdown_chunks_{str(vault_id).replace('-', '')}"
+
+# markdown_chunks is list-partitioned by vault_id: each vault's chunks (and
+# their HNSW graph, since indexes on the parent cascade to every partition)
+# live in their own table. Unique keys must include the partition key.
+CHUNKS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS markdown_chunks (
+        id UUID NOT NULL DEFAULT gen_random_uuid(),
+        vault_id UUID NOT NULL REFERENCES vault_configs(id) ON DELETE CASCADE,
+        file_path TEXT NOT NULL,
+        chunk_index INTEGER NOT NULL,
+        chunk_text TEXT NOT NULL,
+        chunk_tokens INTEGER,
+        embedding vector(1536),
+        metadata JSONB DEFAULT '{}',
+        tags TEXT[] NOT NULL DEFAULT '{}',
+        file_modified_at TIMESTAMP WITH TIME ZONE,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        search_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(chunk_text, ''))) STORED,
+        PRIMARY KEY (vault_id, id),
+        UNIQUE (vault_id, file_path, chunk_index)
+    ) PARTITION BY LIST (vault_id);
+"""
+
+# Creating a partition briefly locks the parent, so writers call this once
+# when they register a vault, never per file. The narrow chunk_embeddings
+# table (when set up) is partitioned the same way.
+VAULT_PARTITION_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION ensure_vault_partition(target_vault_id UUID)
+    RETURNS TEXT
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        suffix TEXT := replace(target_vault_id::text, '-', '');
+        partition_name TEXT := 'markdown_chunks_' || suffix;
+    BEGIN
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF markdown_chunks FOR VALUES IN (%L)',
+                partition_name, target_vault_id
+            );
+        END IF;
+        IF to_regclass('chunk_embeddings') IS NOT NULL
+           AND to_regclass('chunk_embeddings_' || suffix) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF chunk_embeddings FOR VALUES IN (%L)',
+                'chunk_embeddings_' || suffix, target_vault_id
+            );
+        END IF;
+        RETURN partition_name;
+    END;
+    $$;
+"""
+
+def hot_folder_index_sql(
+    folder: str,
+    column: str = 'embedding',
+    index_name: str = None,
+    concurrently: bool = False,
+    table: str = 'markdown_chunks'
+) -> str:
+    """
+    Partial HNSW index over a single folder
+
+    Scoped searches on a hot folder walk a graph that only contains that
+    folder's chunks, so they return a full match_count without relying on
+    post-filtering a global graph.
+    """
+    pattern = folder_like_pattern(folder).replace("'", "''")
+    return f"""
+        CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {index_name or hot_folder_index_name(folder)}
+        ON {table}
+        USING hnsw ({column} vector_cosine_ops)
+        WITH (m = 16, ef_construction = 64)
+        WHERE file_path LIKE '{pattern}';
+    """
+
+def parse_hot_folders(value: str) -> List[str]:
+    """Parse a comma-separated RAG_HOT_FOLDERS value"""
+    return [folder.strip().rstrip('/') for folder in (value or '').split(',') if folder.strip()]
+
+# Older databases have the 3-argument signature, and the signatures from
+# before filter_vault_id; CREATE OR REPLACE with new arguments would add an
+# ambiguous overload instead of replacing them.
+def drop_outdated_search_function_sql(function_name: str) -> str:
+    """
+    Drop every overload of a search function whose result lacks vault_id
+
+    CREATE OR REPLACE cannot change a function's result columns, so
+    definitions from before results carried vault_id (file paths are only
+    unique per vault) are dropped before being recreated.
+    """
+    return f"""
+        DO $$
+        DECLARE
+            outdated regprocedure;
+        BEGIN
+            FOR outdated IN
+                SELECT oid::regprocedure FROM pg_proc
+                WHERE proname = '{function_name}'
+                  AND pg_function_is_visible(oid)
+                  AND NOT ('vault_id' = ANY (coalesce(proargnames, '{{}}')))
+            LOOP
+                EXECUTE 'DROP FUNCTION ' || outdated;
+            END LOOP;
+        END;
+        $$;
+    """
+
+DROP_LEGACY_MATCH_FUNCTION_SQL = """
+    DROP FUNCTION IF EXISTS match_markdown_chunks(vector, FLOAT, INT);
+    DROP FUNCTION IF EXISTS match_markdown_chunks(vector, FLOAT, INT, TEXT, TEXT[], TEXT, TIMESTAMP WITH TIME ZONE);
+    DROP FUNCTION IF EXISTS hybrid_match_markdown_chunks(TEXT, vector, INT, FLOAT, FLOAT, INT);
+    DROP FUNCTION IF EXISTS two_stage_match_markdown_chunks(vector, FLOAT, INT, INT);
+    DROP FUNCTION IF EXISTS binary_match_markdown_chunks(vector, FLOAT, INT, INT);
+"""
+
+def match_function_sql(dimensions: int = 1536) -> str:
+    """
+    match_markdown_chunks() with optional pushed-down filters
+
+    Without filters this is the original static query. With filters the
+    query is built with literal values (so custom plans can use partial
+    and B-tree/GIN indexes) and HNSW iterative scans are enabled where
+    available (pgvector >= 0.8) so filtered searches still fill match_count.
+    filter_vault_id prunes the search to that vault's partition and HNSW graph.
+    """
+    return drop_outdated_search_function_sql('match_markdown_chunks') + f"""
+        CREATE OR REPLACE FUNCTION match_markdown_chunks(
+            query_embedding vector({dimensions}),
+            match_threshold FLOAT DEFAULT 0.7,
+            match_count INT DEFAULT 10,
+            folder_prefix TEXT DEFAULT NULL,
+            filter_tags TEXT[] DEFAULT NULL,
+            filter_section_type TEXT DEFAULT NULL,
+            modified_after TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+            filter_vault_id UUID DEFAULT NULL
+        )
+        RETURNS TABLE (
+            id UUID,
+            file_path TEXT,
+            chunk_index INTEGER,
+            chunk_text TEXT,
+            metadata JSONB,
+            similarity FLOAT,
+            vault_id UUID
+        )
+        LANGUAGE plpgsql
+        AS $$
+        DECLARE
+            filters TEXT := '';
+        BEGIN
+            -- An HNSW scan returns at most ef_search rows (pgvector default
+            -- 40); MMR and re-ranking over-fetch well past that
+            PERFORM set_config('hnsw.ef_search', greatest(40, least(match_count * 4, 1000))::text, true);
+
+            IF folder_prefix IS NULL AND filter_tags IS NULL
+               AND filter_section_type IS NULL AND modified_after IS NULL THEN
+                IF filter_vault_id IS NULL THEN
+                    RETURN QUERY
+                    SELECT
+                        markdown_chunks.id,
+                        markdown_chunks.file_path,
+                        markdown_chunks.chunk_index,
+                        markdown_chunks.chunk_text,
+                        markdown_chunks.metadata,
+                        1 - (markdown_chunks.embedding <=> query_embedding) AS similarity,
+                        markdown_chunks.vault_id
+                    FROM markdown_chunks
+                    WHERE 1 - (markdown_chunks.embedding <=> query_embedding) > match_threshold
+                    ORDER BY markdown_chunks.embedding <=> query_embedding
+                    LIMIT match_count;
+                ELSE
+                    RETURN QUERY
+                    SELECT
+                        markdown_chunks.id,
+                        markdown_chunks.file_path,
+                        markdown_chunks.chunk_index,
+                        markdown_chunks.chunk_text,
+                        markdown_chunks.metadata,
+                        1 - (markdown_chunks.embedding <=> query_embedding) AS similarity,
+                        markdown_chunks.vault_id
+                    FROM markdown_chunks
+                    WHERE markdown_chunks.vault_id = filter_vault_id
+                    AND 1 - (markdown_chunks.embedding <=> query_embedding) > match_threshold
+                    ORDER BY markdown_chunks.embedding <=> query_embedding
+                    LIMIT match_count;
+                END IF;
+                RETURN;
+            END IF;
+
+            IF filter_vault_id IS NOT NULL THEN
+                filters := filters || format(' AND vault_id = %L::uuid', filter_vault_id);
+            END IF;
+            IF folder_prefix IS NOT NULL THEN
+                filters := filters || format(
+                    ' AND file_path LIKE %L',
+                    replace(replace(replace(rtrim(btrim(folder_prefix), '/'),
+                        '\\', '\\\\'), '%', '\\%'), '_', '\\_') || '/%'
+                );
+            END IF;
+            IF filter_tags IS NOT NULL THEN
+                filters := filters || format(' AND tags @> %L::text[]', filter_tags);
+            END IF;
+            IF filter_section_type IS NOT NULL THEN
+                filters := filters || format(' AND metadata->>''section_type'' = %L', filter_section_type);
+            END IF;
+            IF modified_after IS NOT NULL THEN
+                filters := filters || format(' AND file_modified_at > %L::timestamptz', modified_after);
+            END IF;
+
+            -- A filtered HNSW scan stops after ef_search candidates; keep
+            -- scanning until enough rows pass the filters.
+            BEGIN
+                PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+            EXCEPTION WHEN OTHERS THEN
+                NULL;
+            END;
+
+            RETURN QUERY EXECUTE format($q$
+                WITH candidates AS MATERIALIZED (
+                    SELECT
+                        id,
+                        file_path,
+                        chunk_index,
+                        chunk_text,
+                        metadata,
+                        vault_id,
+                        embedding <=> $1 AS distance
+                    FROM markdown_chunks
+                    WHERE embedding IS NOT NULL %s
+                    ORDER BY embedding <=> $1
+                    LIMIT $2
+                )
+                SELECT id, file_path, chunk_index, chunk_text, metadata, 1 - distance AS similarity, vault_id
+                FROM candidates
+                WHERE 1 - distance > $3
+                ORDER BY distance
+            $q$, filters)
+            USING query_embedding, match_count, match_threshold;
+        END;
+        $$;
+    """
+
+# Chunks may be written with a NULL embedding (searchable lexically at once)
+# and embedded later by embed_pending_chunks.py, which LISTENs on this channel.
+EMBEDDING_PENDING_CHANNEL = 'chunk_embeddings_pending'
+
+EMBEDDING_PENDING_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS markdown_chunks_embedding_pending_idx
+    ON markdown_chunks (id)
+    WHERE embedding IS NULL;
+"""
+
+# Identical notifications within a transaction are collapsed into one, so a
+# file's worth of pending chunks wakes the worker once, at commit. Trigger
+# column references follow renames, so swapping embedding columns must
+# re-run this (see migrate_embeddings_online.py).
+EMBEDDING_PENDING_TRIGGER_SQL = f"""
+    CREATE OR REPLACE FUNCTION notify_chunk_embedding_pending()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        PERFORM pg_notify('{EMBEDDING_PENDING_CHANNEL}', '');
+        RETURN NULL;
+    END;
+    $$;
+
+    DROP TRIGGER IF EXISTS markdown_chunks_embedding_pending ON markdown_chunks;
+    CREATE TRIGGER markdown_chunks_embedding_pending
+    AFTER INSERT OR UPDATE OF embedding ON markdown_chunks
+    FOR EACH ROW
+    WHEN (NEW.embedding IS NULL)
+    EXECUTE FUNCTION notify_chunk_embedding_pending();
+"""
+
+# Per-file centroid: mean of the file's chunk embeddings. Cosine distance
+# ignores magnitude, so the unnormalized mean is fine for ranking files.
+# Parameters: (vault_id, file_path)
+REFRESH_FILE_CENTROID_SQL = """
+    UPDATE markdown_files
+    SET centroid_embedding = (
+        SELECT avg(markdown_chunks.embedding)
+        FROM markdown_chunks
+        WHERE markdown_chunks.vault_id = markdown_files.vault_id
+        AND markdown_chunks.file_path = markdown_files.file_path
+        AND markdown_chunks.embedding IS NOT NULL
+    )
+    WHERE markdown_files.vault_id = %s AND markdown_files.file_path = %s;
+"""
+
+def refresh_all_file_centroids_sql(column: str = 'embedding', centroid_column: str = 'centroid_embedding') -> str:
+    """Recompute every file centroid from one chunk embedding column"""
+    return f"""
+        UPDATE markdown_files
+        SET {centroid_column} = centroids.centroid
+        FROM (
+            SELECT vault_id, file_path, avg({column}) AS centroid
+            FROM markdown_chunks
+            WHERE {column} IS NOT NULL
+            GROUP BY vault_id, file_path
+        ) centroids
+        WHERE markdown_files.vault_id = centroids.vault_id
+        AND markdown_files.file_path = centroids.file_path;
+    """
+
+REFRESH_ALL_FILE_CENTROIDS_SQL = refresh_all_file_centroids_sql()
+
+def two_stage_match_function_sql(dimensions: int = 1536) -> str:
+    """
+    Coarse-to-fine search: rank files by centroid, then rank only their chunks
+
+    Both stages are MATERIALIZED so the planner fetches the chunks of the
+    selected files through the file_path index and sorts them exactly,
+    instead of walking the global chunk HNSW graph. plpgsql so that
+    filter_vault_id is planned as a constant (partition pruning).
+    """
+    return drop_outdated_search_function_sql('two_stage_match_markdown_chunks') + f"""
+        CREATE OR REPLACE FUNCTION two_stage_match_markdown_chunks(
+            query_embedding vector({dimensions}),
+            match_threshold FLOAT DEFAULT 0.7,
+            match_count INT DEFAULT 10,
+            file_count INT DEFAULT 20,
+            filter_vault_id UUID DEFAULT NULL
+        )
+        RETURNS TABLE (
+            id UUID,
+            file_path TEXT,
+            chunk_index INTEGER,
+            chunk_text TEXT,
+            metadata JSONB,
+            similarity FLOAT,
+            vault_id UUID
+        )
+        LANGUAGE plpgsql
+        AS $$
+        #variable_conflict use_column
+        BEGIN
+            IF filter_vault_id IS NOT NULL THEN
+                -- Centroids of all vaults share one graph; keep scanning
+                -- until file_count files of this vault are found
+                BEGIN
+                    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+                EXCEPTION WHEN OTHERS THEN
+                    NULL;
+                END;
+            END IF;
+
+            RETURN QUERY
+            WITH top_files AS MATERIALIZED (
+                SELECT markdown_files.vault_id, markdown_files.file_path
+                FROM markdown_files
+                WHERE markdown_files.centroid_embedding IS NOT NULL
+                AND (filter_vault_id IS NULL OR markdown_files.vault_id = filter_vault_id)
+                ORDER BY markdown_files.centroid_embedding <=> query_embedding
+                LIMIT file_count
+            ),
+            candidates AS MATERIALIZED (
+                SELECT
+                    markdown_chunks.id,
+                    markdown_chunks.file_path,
+                    markdown_chunks.chunk_index,
+                    markdown_chunks.chunk_text,
+                    markdown_chunks.metadata,
+                    markdown_chunks.vault_id,
+                    markdown_chunks.embedding <=> query_embedding AS distance
+                FROM markdown_chunks
+                JOIN top_files
+                  ON top_files.vault_id = markdown_chunks.vault_id
+                 AND top_files.file_path = markdown_chunks.file_path
+                WHERE markdown_chunks.embedding IS NOT NULL
+                AND (filter_vault_id IS NULL OR markdown_chunks.vault_id = filter_vault_id)
+            )
+            SELECT
+                candidates.id,
+                candidates.file_path,
+                candidates.chunk_index,
+                candidates.chunk_text,
+                candidates.metadata,
+                1 - candidates.distance AS similarity,
+                candidates.vault_id
+            FROM candidates
+            WHERE 1 - candidates.distance > match_threshold
+            ORDER BY candidates.distance
+            LIMIT match_count;
+        END;
+        $$;
+    """
+
+def hybrid_match_function_sql(dimensions: int = 1536) -> str:
+    """
+    Full-text and vector candidate lists fused with reciprocal rank fusion
+    (score = sum of weight / (rrf_k + rank))
+
+    Each candidate list is a LIMITed index scan, so the fusion only ever
+    touches a few dozen rows. plpgsql so that filter_vault_id is planned as
+    a constant (partition pruning).
+    """
+    return drop_outdated_search_function_sql('hybrid_match_markdown_chunks') + f"""
+        CREATE OR REPLACE FUNCTION hybrid_match_markdown_chunks(
+            query_text TEXT,
+            query_embedding vector({dimensions}),
+            match_count INT DEFAULT 10,
+            full_text_weight FLOAT DEFAULT 1.0,
+            semantic_weight FLOAT DEFAULT 1.0,
+            rrf_k INT DEFAULT 60,
+            filter_vault_id UUID DEFAULT NULL
+        )
+        RETURNS TABLE (
+            id UUID,
+            file_path TEXT,
+            chunk_index INTEGER,
+            chunk_text TEXT,
+            metadata JSONB,
+            similarity FLOAT,
+            rrf_score FLOAT,
+            vault_id UUID
+        )
+        LANGUAGE plpgsql
+        AS $$
+        #variable_conflict use_column
+        BEGIN
+            -- The semantic list must not be cut short by ef_search (pgvector
+            -- default 40) while the full-text list runs to its full LIMIT
+            PERFORM set_config('hnsw.ef_search', greatest(40, least(match_count, 50) * 4)::text, true);
+
+            RETURN QUERY
+            WITH full_text AS (
+                SELECT
+                    ft.vault_id,
+                    ft.id,
+                    row_number() OVER (ORDER BY ft.rank DESC) AS rank_ix
+                FROM (
+                    SELECT
+                        markdown_chunks.vault_id,
+                        markdown_chunks.id,
+                        ts_rank_cd(markdown_chunks.search_tsv, websearch_to_tsquery('english', query_text)) AS rank
+                    FROM markdown_chunks
+                    WHERE markdown_chunks.search_tsv @@ websearch_to_tsquery('english', query_text)
+                    AND (filter_vault_id IS NULL OR markdown_chunks.vault_id = filter_vault_id)
+                    ORDER BY rank DESC
+                    LIMIT least(match_count, 50) * 4
+                ) ft
+            ),
+            semantic AS (
+                SELECT
+                    sem.vault_id,
+                    sem.id,
+                    row_number() OVER (ORDER BY sem.distance) AS rank_ix
+                FROM (
+                    SELECT
+                        markdown_chunks.vault_id,
+                        markdown_chunks.id,
+                        markdown_chunks.embedding <=> query_embedding AS distance
+                    FROM markdown_chunks
+                    WHERE markdown_chunks.embedding IS NOT NULL
+                    AND (filter_vault_id IS NULL OR markdown_chunks.vault_id = filter_vault_id)
+                    ORDER BY markdown_chunks.embedding <=> query_embedding
+                    LIMIT least(match_count, 50) * 4
+                ) sem
+            )
+            SELECT
+                markdown_chunks.id,
+                markdown_chunks.file_path,
+                markdown_chunks.chunk_index,
+                markdown_chunks.chunk_text,
+                markdown_chunks.metadata,
+                1 - (markdown_chunks.embedding <=> query_embedding) AS similarity,
+                coalesce(full_text_weight / (rrf_k + full_text.rank_ix), 0.0)
+                    + coalesce(semantic_weight / (rrf_k + semantic.rank_ix), 0.0) AS rrf_score,
+                markdown_chunks.vault_id
+            FROM full_text
+            FULL OUTER JOIN semantic ON full_text.id = semantic.id
+            JOIN markdown_chunks
+              ON markdown_chunks.vault_id = coalesce(full_text.vault_id, semantic.vault_id)
+             AND markdown_chunks.id = coalesce(full_text.id, semantic.id)
+            ORDER BY rrf_score DESC
+            LIMIT match_count;
+        END;
+        $$;
+    """
+
+def parse_vector_index_kinds(value: str) -> List[str]:
+    """
+    RAG_VECTOR_INDEX: which chunk vector indexes to keep
+
+        hnsw   - full-precision HNSW (default)
+        binary - binary-quantized HNSW only (much smaller, re-rank needed)
+        both   - keep both
+    """
+    value = (value or 'hnsw').strip().lower()
+    if value == 'both':
+        return ['hnsw', 'binary']
+    if value not in ('hnsw', 'binary'):
+        raise ValueError(f"RAG_VECTOR_INDEX must be hnsw, binary or both (got {value!r})")
+    return [value]
+
+def binary_index_sql(
+    dimensions: int = 1536,
+    column: str = 'embedding',
+    index_name: str = 'markdown_chunks_embedding_bq_idx',
+    concurrently: bool = False,
+    table: str = 'markdown_chunks'
+) -> str:
+    """
+    HNSW over binary_quantize(embedding): one bit per dimension instead of
+    four bytes, searched by Hamming distance (pgvector >= 0.7)
+    """
+    return f"""
+        CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {index_name}
+        ON {table}
+        USING hnsw ((binary_quantize({column})::bit({dimensions})) bit_hamming_ops)
+        WITH (m = 16, ef_construction = 64);
+    """
+
+def binary_match_function_sql(dimensions: int = 1536) -> str:
+    """
+    Binary-quantized first pass with exact re-ranking
+
+    Hamming distance on the bit index picks match_count * candidate_multiplier
+    candidates; those are re-ranked by exact cosine on the stored vectors.
+    The ::bit(N) casts must match the expression in binary_index_sql().
+    filter_vault_id restricts both passes to that vault's partition.
+    """
+    return drop_outdated_search_function_sql('binary_match_markdown_chunks') + f"""
+        CREATE OR REPLACE FUNCTION binary_match_markdown_chunks(
+            query_embedding vector({dimensions}),
+            match_threshold FLOAT DEFAULT 0.7,
+            match_count INT DEFAULT 10,
+            candidate_multiplier INT DEFAULT 10,
+            filter_vault_id UUID DEFAULT NULL
+        )
+        RETURNS TABLE (
+            id UUID,
+            file_path TEXT,
+            chunk_index INTEGER,
+            chunk_text TEXT,
+            metadata JSONB,
+            similarity FLOAT,
+            vault_id UUID
+        )
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            PERFORM set_config(
+                'hnsw.ef_search',
+                greatest(40, least(match_count * candidate_multiplier, 1000))::text,
+                true
+            );
+
+            RETURN QUERY
+            WITH candidates AS MATERIALIZED (
+                SELECT markdown_chunks.vault_id, markdown_chunks.id
+                FROM markdown_chunks
+                WHERE filter_vault_id IS NULL OR markdown_chunks.vault_id = filter_vault_id
+                ORDER BY binary_quantize(markdown_chunks.embedding)::bit({dimensions})
+                    <~> binary_quantize(query_embedding)::bit({dimensions})
+                LIMIT match_count * candidate_multiplier
+            ),
+            reranked AS MATERIALIZED (
+                SELECT
+                    markdown_chunks.id,
+                    markdown_chunks.file_path,
+                    markdown_chunks.chunk_index,
+                    markdown_chunks.chunk_text,
+                    markdown_chunks.metadata,
+                    markdown_chunks.vault_id,
+                    markdown_chunks.embedding <=> query_embedding AS distance
+                FROM markdown_chunks
+                JOIN candidates
+                  ON candidates.vault_id = markdown_chunks.vault_id
+                 AND candidates.id = markdown_chunks.id
+            )
+            SELECT
+                reranked.id,
+                reranked.file_path,
+                reranked.chunk_index,
+                reranked.chunk_text,
+                reranked.metadata,
+                1 - reranked.distance AS similarity,
+                reranked.vault_id
+            FROM reranked
+            WHERE 1 - reranked.distance > match_threshold
+            ORDER BY reranked.distance
+            LIMIT match_count;
+        END;
+        $$;
+    """
+
+# ---------------------------------------------------------------------------
+# Narrow embedding layout (RAG_EMBEDDING_LAYOUT=narrow)
+# ---------------------------------------------------------------------------
+
+EMBEDDING_LAYOUTS = ('wide', 'narrow')
+
+def parse_embedding_layout(value: str) -> str:
+    """Validate a RAG_EMBEDDING_LAYOUT value"""
+    value = (value or 'wide').strip().lower()
+    if value not in EMBEDDING_LAYOUTS:
+        raise ValueError(f"RAG_EMBEDDING_LAYOUT must be wide or narrow (got {value!r})")
+    return value
+
+def chunk_embeddings_table_sql(dimensions: int = 1536) -> str:
+    """
+    chunk_embeddings: (vault_id, chunk_id, embedding) and nothing else
+
+    A vector search over markdown_chunks fetches heap pages full of chunk
+    text and JSONB just to reach vectors; here a page holds only vectors.
+    Vectors that fit in a page are stored PLAIN (inline, uncompressed), so
+    reading one never goes through TOAST.
+    """
+    plain = dimensions * 4 + 8 <= 8000
+    return f"""
+        CREATE TABLE IF NOT EXISTS chunk_embeddings (
+            vault_id UUID NOT NULL,
+            chunk_id UUID NOT NULL,
+            embedding vector({dimensions}) NOT NULL,
+            PRIMARY KEY (vault_id, chunk_id),
+            FOREIGN KEY (vault_id, chunk_id) REFERENCES markdown_chunks (vault_id, id) ON DELETE CASCADE
+        ) PARTITION BY LIST (vault_id);
+        {'ALTER TABLE chunk_embeddings ALTER COLUMN embedding SET STORAGE PLAIN;' if plain else ''}
+    """
+
+# markdown_chunks.embedding stays the column writers, embed_pending_chunks.py
+# and the migrations work with; this trigger keeps chunk_embeddings in step
+# (deletes cascade through the foreign key).
+CHUNK_EMBEDDINGS_SYNC_TRIGGER_SQL = """
+    CREATE OR REPLACE FUNCTION sync_chunk_embedding()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        IF NEW.embedding IS NULL THEN
+            DELETE FROM chunk_embeddings
+            WHERE vault_id = NEW.vault_id AND chunk_id = NEW.id;
+        ELSE
+            INSERT INTO chunk_embeddings (vault_id, chunk_id, embedding)
+            VALUES (NEW.vault_id, NEW.id, NEW.embedding)
+            ON CONFLICT (vault_id, chunk_id) DO UPDATE SET embedding = EXCLUDED.embedding;
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+
+    DROP TRIGGER IF EXISTS markdown_chunks_sync_embedding ON markdown_chunks;
+    CREATE TRIGGER markdown_chunks_sync_embedding
+    AFTER INSERT OR UPDATE OF embedding ON markdown_chunks
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_chunk_embedding();
+"""
+
+CHUNK_EMBEDDINGS_BACKFILL_SQL = """
+    INSERT INTO chunk_embeddings (vault_id, chunk_id, embedding)
+    SELECT vault_id, id, embedding
+    FROM markdown_chunks
+    WHERE embedding IS NOT NULL
+    ON CONFLICT (vault_id, chunk_id) DO UPDATE SET embedding = EXCLUDED.embedding;
+"""
+
+CHUNK_EMBEDDINGS_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS chunk_embeddings_embedding_idx
+    ON chunk_embeddings
+    USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+"""
+
+# The copy has the old model's dimension after an embedding model change;
+# drop it (and its trigger, which would fail every write) and re-run
+# setup_rag_database.py with RAG_EMBEDDING_LAYOUT=narrow.
+DROP_CHUNK_EMBEDDINGS_SQL = """
+    DROP TRIGGER IF EXISTS markdown_chunks_sync_embedding ON markdown_chunks;
+    DROP FUNCTION IF EXISTS narrow_match_markdown_chunks(vector, FLOAT, INT, UUID);
+    DROP TABLE IF EXISTS chunk_embeddings;
+"""
+
+def narrow_match_function_sql(dimensions: int = 1536) -> str:
+    """
+    narrow_match_markdown_chunks(): match_markdown_chunks() over chunk_embeddings
+
+    The top-k is chosen from the narrow table alone (MATERIALIZED, so the
+    LIMIT applies first), then chunk text and metadata are fetched for
+    just those k rows by primary key.
+    """
+    def top_k(where: str) -> str:
+        return f"""
+                    RETURN QUERY
+                    WITH top_chunks AS MATERIALIZED (
+                        SELECT
+                            chunk_embeddings.vault_id,
+                            chunk_embeddings.chunk_id,
+                            chunk_embeddings.embedding <=> query_embedding AS distance
+                        FROM chunk_embeddings
+                        {where}
+                        ORDER BY chunk_embeddings.embedding <=> query_embedding
+                        LIMIT match_count
+                    )
+                    SELECT
+                        markdown_chunks.id,
+                        markdown_chunks.file_path,
+                        markdown_chunks.chunk_index,
+                        markdown_chunks.chunk_text,
+                        markdown_chunks.metadata,
+                        1 - top_chunks.distance AS similarity,
+                        markdown_chunks.vault_id
+                    FROM top_chunks
+                    JOIN markdown_chunks
+                      ON markdown_chunks.vault_id = top_chunks.vault_id
+                     AND markdown_chunks.id = top_chunks.chunk_id
+                    WHERE 1 - top_chunks.distance > match_threshold
+                    ORDER BY top_chunks.distance;"""
+
+    return drop_outdated_search_function_sql('narrow_match_markdown_chunks') + f"""
+        CREATE OR REPLACE FUNCTION narrow_match_markdown_chunks(
+            query_embedding vector({dimensions}),
+            match_threshold FLOAT DEFAULT 0.7,
+            match_count INT DEFAULT 10,
+            filter_vault_id UUID DEFAULT NULL
+        )
+        RETURNS TABLE (
+            id UUID,
+            file_path TEXT,
+            chunk_index INTEGER,
+            chunk_text TEXT,
+            metadata JSONB,
+            similarity FLOAT,
+            vault_id UUID
+        )
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            PERFORM set_config('hnsw.ef_search', greatest(40, least(match_count * 4, 1000))::text, true);
+
+            IF filter_vault_id IS NULL THEN{top_k('')}
+            ELSE{top_k('WHERE chunk_embeddings.vault_id = filter_vault_id')}
+            END IF;
+        END;
+        $$;
+    """
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Result Re-ranking Module
+Post-search stages that reorder or trim candidate chunks
+"""
+
+import time
+import threading
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+def parse_vectors(values: Sequence[str]) -> np.ndarray:
+    """
+    Parse pgvector text values ('[0.1,0.2,...]') into an (n, dim) float32 matrix
+
+    All rows are parsed in one pass, which is much faster than parsing
+    row by row for a few hundred candidates.
+    """
+    if not values:
+        return np.empty((0, 0), dtype=np.float32)
+    flat = np.array(','.join(value.strip('[]') for value in values).split(','), dtype=np.float32)
+    return flat.reshape(len(values), -1)
+
+def mmr_select(
+    relevance: np.ndarray,
+    embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Maximal marginal relevance: pick k diverse, relevant candidates
+
+    Each step picks argmax(lambda * relevance - (1 - lambda) * max similarity
+    to anything already picked). Each step is one matrix-vector product
+    against the new pick plus O(n) vector updates, so a few hundred
+    candidates take well under a millisecond.
+
+    Args:
+        relevance: (n,) query similarity of each candidate
+        embeddings: (n, dim) candidate embeddings
+        k: Number of candidates to select
+        lambda_mult: 1.0 = pure relevance, 0.0 = pure diversity
+
+    Returns:
+        Indexes into the candidate list, in selection order
+    """
+    n = relevance.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    unit = (embeddings / norms).astype(np.float32, copy=False)
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    max_redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = []
+
+    for _ in range(k):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_redundancy
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(max_redundancy, unit @ unit[pick], out=max_redundancy)
+
+    return selected
+
+class CrossEncoderReranker:
+    """
+    Re-score (query, chunk) pairs with a small local cross-encoder
+
+    Scoring runs under a hard per-query time budget. The cost per pair is
+    measured on every batch (the first call scores a single pair to get
+    it), and before each batch, including the first, the remaining pairs
+    are checked against the time left. If they do not fit, the whole
+    candidate list falls back to its original (vector) order, so a slow
+    query never reorders a partially scored list.
+
+    Model calls are serialized (--serve threads share one model); time
+    spent waiting for another query counts against the budget.
+    """
+
+    def __init__(self, model_name: str = 'cross-encoder/ms-marco-MiniLM-L-6-v2', max_length: int = 512):
+        # Imported lazily: only needed when re-ranking is enabled
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name, max_length=max_length)
+        self.lock = threading.Lock()
+        # Moving average of milliseconds per scored pair; None until measured
+        self.ms_per_pair = None
+
+    def observe_cost(self, ms_per_pair: float):
+        if self.ms_per_pair is None:
+            self.ms_per_pair = ms_per_pair
+        else:
+            self.ms_per_pair = 0.8 * self.ms_per_pair + 0.2 * ms_per_pair
+
+    def rerank(
+        self,
+        query: str,
+        chunks: List[dict],
+        top_k: int,
+        batch_size: int = 16,
+        budget_ms: float = 150.0
+    ) -> Tuple[List[dict], dict]:
+        """
+        Returns (chunks, info): the best top_k chunks by cross-encoder score,
+        or the first top_k in original order when the budget is exceeded
+        """
+        start = time.perf_counter()
+        scores = []
+
+        def elapsed_ms() -> float:
+            return (time.perf_counter() - start) * 1000
+
+        with self.lock:
+            while len(scores) < len(chunks):
+                remaining_ms = budget_ms - elapsed_ms()
+                pending = len(chunks) - len(scores)
+                if self.ms_per_pair is None:
+                    size = 1
+                    fits = remaining_ms > 0
+                else:
+                    size = min(batch_size, pending)
+                    fits = pending * self.ms_per_pair <= remaining_ms
+                if not fits:
+                    if not scores and self.ms_per_pair is not None:
+                        # Skipped on the estimate alone: let it decay so an
+                        # early slow measurement (cold model) cannot disable
+                        # re-ranking for good; the next scored batch corrects it
+                        self.ms_per_pair *= 0.9
+                    return chunks[:top_k], {
+                        'model': self.model_name,
+                        'applied': False,
+                        'reason': 'budget_exceeded',
+                        'scored': len(scores),
+                        'candidates': len(chunks),
+                        'ms_per_pair': round(self.ms_per_pair, 3) if self.ms_per_pair is not None else None,
+                        'elapsed_ms': round(elapsed_ms(), 2)
+                    }
+
+                batch_started = time.perf_counter()
+                batch = chunks[len(scores):len(scores) + size]
+                scores.extend(float(score) for score in self.model.predict(
+                    [(query, chunk['chunk_text']) for chunk in batch],
+                    batch_size=size,
+                    show_progress_bar=False
+                ))
+                self.observe_cost((time.perf_counter() - batch_started) * 1000 / len(batch))
+
+        order = np.argsort(-np.asarray(scores), kind='stable')[:top_k]
+        reranked = []
+        for i in order:
+            chunk = dict(chunks[i])
+            chunk['rerank_score'] = scores[i]
+            reranked.append(chunk)
+
+        return reranked, {
+            'model': self.model_name,
+            'applied': True,
+            'scored': len(scores),
+            'candidates': len(chunks),
+            'ms_per_pair': round(self.ms_per_pair, 3) if self.ms_per_pair is not None else None,
+            'elapsed_ms': round(elapsed_ms(), 2)
+        }
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Search Metrics Module
+Per-stage timings for each search and process-wide Prometheus metrics
+"""
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Latency buckets in seconds (sub-millisecond up to 10s)
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+METRIC_HELP = {
+    'rag_search_stage_seconds': ('histogram', 'Time spent in each search stage'),
+    'rag_search_request_seconds': ('histogram', 'End-to-end search latency'),
+    'rag_search_requests_total': ('counter', 'Search requests by mode, backend and status'),
+    'rag_search_cache_requests_total': ('counter', 'Cache lookups by cache and result (hit/miss)'),
+    'rag_search_rows_returned_total': ('counter', 'Chunks returned by the search query'),
+    'rag_search_rows_scanned_total': ('counter', 'Rows examined where known (local backends, EXPLAIN + auto_explain captures)'),
+    'rag_search_pg_buffers_total': ('counter', 'Postgres shared buffers from EXPLAIN captures (hit/read)'),
+    'rag_search_slow_queries_total': ('counter', 'Queries over RAG_EXPLAIN_SLOW_MS'),
+}
+
+class StageTimer:
+    """Collects wall-clock milliseconds per named stage for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name: str, ms: float):
+        self.timings[name] = self.timings.get(name, 0.0) + ms
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self) -> Dict[str, float]:
+        timings = {name: round(ms, 3) for name, ms in self.timings.items()}
+        timings['total'] = round(self.total_ms(), 3)
+        return timings
+
+class Histogram:
+    """Cumulative-bucket histogram in Prometheus semantics"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in items) + '}'
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms rendered as Prometheus text"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], Histogram] = {}
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self.lock:
+            names = sorted({name for name, _ in self.counters} | {name for name, _ in self.histograms})
+            for name in names:
+                kind, help_text = METRIC_HELP.get(name, ('untyped', name))
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value:g}')
+
+                for (metric, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{_format_labels(labels, ("le", f"{bound:g}"))} {count}')
+                    lines.append(f'{name}_bucket{_format_labels(labels, ("le", "+Inf"))} {histogram.count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+# Process-wide registry (one per search service process)
+METRICS = MetricsRegistry()
+
+def record_search(
+    timer: StageTimer,
+    mode: str,
+    backend: str,
+    success: bool,
+    rows_returned: int = 0,
+    rows_scanned: Optional[int] = None
+):
+    """Fold one request's stage timings and counts into METRICS"""
+    for stage, ms in timer.timings.items():
+        METRICS.observe('rag_search_stage_seconds', ms / 1000, stage=stage)
+    METRICS.observe('rag_search_request_seconds', timer.total_ms() / 1000, mode=mode, backend=backend)
+    METRICS.inc(
+        'rag_search_requests_total',
+        mode=mode,
+        backend=backend,
+        status='success' if success else 'error'
+    )
+    METRICS.inc('rag_search_rows_returned_total', rows_returned, mode=mode)
+    if rows_scanned is not None:
+        METRICS.inc('rag_search_rows_scanned_total', rows_scanned, mode=mode)
+
+def parse_auto_explain_notices(notices: List[str]) -> List[dict]:
+    """
+    JSON plans from auto_explain NOTICEs (auto_explain.log_format = json),
+    minus the plan of the EXPLAIN statement that produced them
+    """
+    plans = []
+    for notice in notices:
+        _, marker, body = notice.partition('plan:')
+        if not marker:
+            continue
+        try:
+            plan = json.loads(body)
+        except ValueError:
+            continue
+        if not plan.get('Query Text', '').lstrip().upper().startswith('EXPLAIN'):
+            plans.append(plan)
+    return plans
+
+def summarize_explain(plan_json, nested_plans: Optional[List[dict]] = None) -> Dict[str, float]:
+    """
+    Pull execution time, buffers and rows out of EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+
+    A Function Scan only reports the rows the function returned, so when
+    the plan contains one, rows_examined comes from the nested statement
+    plans (auto_explain) or is None when those were not captured. Buffer
+    counts of the outer plan already include the nested statements.
+    """
+    if isinstance(plan_json, list):
+        plan_json = plan_json[0]
+    plan = plan_json.get('Plan', {})
+
+    def rows_examined(node) -> Optional[float]:
+        if node.get('Node Type') == 'Function Scan' and node.get('Function Name') != 'unnest':
+            return None
+        rows = node.get('Actual Rows', 0) * node.get('Actual Loops', 1)
+        rows += node.get('Rows Removed by Filter', 0) * node.get('Actual Loops', 1)
+        for child in node.get('Plans', []):
+            child_rows = rows_examined(child)
+            if child_rows is None:
+                return None
+            rows += child_rows
+        return rows
+
+    examined = rows_examined(plan)
+    if examined is None and nested_plans:
+        examined = sum(rows_examined(nested.get('Plan', {})) or 0 for nested in nested_plans)
+
+    return {
+        'execution_ms': plan_json.get('Execution Time'),
+        'planning_ms': plan_json.get('Planning Time'),
+        'shared_hit_blocks': plan.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': plan.get('Shared Read Blocks', 0),
+        'rows_examined': examined
+    }
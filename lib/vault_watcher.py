@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Vault Watcher Module
+Reports changed paths under a vault: inotify (Linux, via ctypes) with a
+stat-polling fallback, plus a debouncer that coalesces bursts of events
+"""
+
+import os
+import time
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+def is_hidden(name: str) -> bool:
+    return name.startswith('.')
+
+class InotifyWatcher:
+    """
+    Recursive inotify watch over a directory tree
+
+    poll() blocks in select() until events arrive or the timeout expires,
+    so an idle vault costs no CPU.
+    """
+
+    def __init__(self, root: str):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError(errno.ENOSYS, "libc not found")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+
+        self.root = root
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, str] = {}
+        self.add_tree(root)
+
+    def add_watch(self, directory: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, "inotify watch limit reached (raise fs.inotify.max_user_watches)")
+            # The directory vanished between the event and the watch
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+        self.watches[wd] = directory
+
+    def remove_tree(self, directory: str):
+        """Stop watching a moved-away directory; a matching IN_MOVED_TO re-adds it under its new path"""
+        for wd, path in list(self.watches.items()):
+            if path == directory or path.startswith(directory + os.sep):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+    def add_tree(self, directory: str):
+        """Watch a directory and every non-hidden directory below it"""
+        for root, dirs, _ in os.walk(directory):
+            dirs[:] = [d for d in dirs if not is_hidden(d)]
+            self.add_watch(root)
+
+    def poll(self, timeout: Optional[float]) -> Tuple[Set[str], bool]:
+        """
+        Wait up to `timeout` seconds (None = forever) for events
+
+        Returns (changed paths relative to the root, rescan_needed). A queue
+        overflow loses events, so the caller must rescan everything.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set(), False
+
+        changed = set()
+        rescan = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+
+                directory = self.watches.get(wd)
+                if directory is None or (name and is_hidden(name)):
+                    continue
+                path = os.path.join(directory, name) if name else directory
+
+                # New or moved-in directories need their own watches
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(path)
+                elif mask & IN_ISDIR and mask & IN_MOVED_FROM:
+                    self.remove_tree(path)
+
+                changed.add(os.path.relpath(path, self.root))
+
+        changed.discard('.')
+        return changed, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Fallback for platforms without inotify: compares (mtime, size) snapshots"""
+
+    def __init__(self, root: str, interval: float = 2.0, suffix: str = '.md'):
+        self.root = root
+        self.interval = interval
+        self.suffix = suffix
+        self.snapshot = self.scan()
+
+    def scan(self) -> Dict[str, Tuple[float, int]]:
+        entries = {}
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not is_hidden(d)]
+            for name in files:
+                if is_hidden(name) or not name.endswith(self.suffix):
+                    continue
+                full_path = os.path.join(root, name)
+                try:
+                    stats = os.stat(full_path)
+                except FileNotFoundError:
+                    continue
+                entries[os.path.relpath(full_path, self.root)] = (stats.st_mtime, stats.st_size)
+        return entries
+
+    def poll(self, timeout: Optional[float]) -> Tuple[Set[str], bool]:
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        current = self.scan()
+        changed = {
+            path for path in current.keys() | self.snapshot.keys()
+            if current.get(path) != self.snapshot.get(path)
+        }
+        self.snapshot = current
+        return changed, False
+
+    def close(self):
+        pass
+
+def create_watcher(root: str, poll_interval: float = 2.0):
+    """inotify where available, otherwise polling"""
+    try:
+        return InotifyWatcher(root)
+    except OSError as e:
+        print(f"⚠️  inotify unavailable ({e}); polling every {poll_interval:g}s")
+        return PollingWatcher(root, poll_interval)
+
+class ChangeBatcher:
+    """
+    Debounces changed paths
+
+    A path is released once it has been quiet for `debounce` seconds, or
+    `max_delay` seconds after its first event if it never goes quiet (a
+    file being appended to continuously), so editors that save several
+    times in a row cost one re-index.
+    """
+
+    def __init__(self, debounce: float = 1.0, max_delay: float = 10.0):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.pending: Dict[str, Tuple[float, float]] = {}
+
+    def add(self, paths: Iterable[str], now: float = None):
+        now = time.monotonic() if now is None else now
+        for path in paths:
+            first, _ = self.pending.get(path, (now, now))
+            self.pending[path] = (first, now)
+
+    def deadline(self, path: str) -> float:
+        first, last = self.pending[path]
+        return min(last + self.debounce, first + self.max_delay)
+
+    def next_timeout(self, now: float = None) -> Optional[float]:
+        """Seconds until the next path is due (None when nothing is pending)"""
+        if not self.pending:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(self.deadline(path) for path in self.pending) - now)
+
+    def due(self, now: float = None) -> List[str]:
+        """Remove and return the paths that are ready"""
+        now = time.monotonic() if now is None else now
+        ready = sorted(path for path in self.pending if self.deadline(path) <= now)
+        for path in ready:
+            del self.pending[path]
+        return ready
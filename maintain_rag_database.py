@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Maintain RAG Database
+Health report and threshold-driven upkeep for the chunk tables and their
+vector indexes
+
+Re-indexing deletes a file's chunks and inserts new ones, so every edit
+leaves dead tuples in the heap and deleted elements in the HNSW graph.
+Autovacuum cleans the heap eventually, but nothing says when the graph
+has degraded. For every vault partition (and markdown_files,
+chunk_embeddings, index_jobs) this reports:
+
+    dead tuple ratio and heap bloat (pgstattuple when installed, else estimated)
+    index size per live row, against the size recorded after the last build
+    sampled recall@k of the HNSW index against exact search, and its drift
+
+`run` applies VACUUM (ANALYZE), REINDEX INDEX CONCURRENTLY and ANALYZE
+where the thresholds are crossed, once or on a schedule. Every action and
+baseline is recorded in rag_maintenance_log.
+
+    python maintain_rag_database.py report
+    python maintain_rag_database.py run --dry-run
+    python maintain_rag_database.py run --every 6h
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import psycopg2
+
+# Load environment variables
+load_dotenv('.env.local')
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+if not DATABASE_URL:
+    print("❌ DATABASE_URL not found in .env.local")
+    exit(1)
+
+# Root tables whose leaf relations are checked (missing ones are skipped)
+TARGET_TABLES = ['markdown_chunks', 'chunk_embeddings', 'markdown_files', 'index_jobs']
+
+# Only one maintenance pass at a time across hosts
+ADVISORY_LOCK_KEY = 'maintain_rag_database'
+
+# Heap tuple header (aligned) plus its line pointer
+TUPLE_OVERHEAD_BYTES = 28
+
+MAINTENANCE_LOG_SQL = """
+    CREATE TABLE IF NOT EXISTS rag_maintenance_log (
+        id BIGSERIAL PRIMARY KEY,
+        ran_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        relation TEXT NOT NULL,
+        action TEXT NOT NULL,
+        reason TEXT,
+        seconds DOUBLE PRECISION,
+        details JSONB DEFAULT '{}'
+    );
+
+    CREATE INDEX IF NOT EXISTS rag_maintenance_log_relation_idx
+    ON rag_maintenance_log (relation, ran_at DESC);
+"""
+
+TARGETS_SQL = """
+    SELECT tree.relid, target.name
+    FROM unnest(%s::text[]) AS target(name),
+         pg_partition_tree(to_regclass(target.name)) AS tree
+    WHERE tree.isleaf
+"""
+
+TABLE_HEALTH_SQL = f"""
+    WITH targets AS ({TARGETS_SQL})
+    SELECT
+        c.oid::regclass::text,
+        targets.name,
+        vault_configs.vault_path,
+        s.n_live_tup,
+        s.n_dead_tup,
+        s.n_mod_since_analyze,
+        pg_relation_size(c.oid),
+        pg_table_size(c.oid),
+        pg_indexes_size(c.oid),
+        greatest(s.last_vacuum, s.last_autovacuum),
+        greatest(s.last_analyze, s.last_autoanalyze),
+        (
+            SELECT sum(st.avg_width)
+            FROM pg_stats st
+            WHERE st.schemaname = n.nspname AND st.tablename = c.relname AND NOT st.inherited
+        )
+    FROM targets
+    JOIN pg_class c ON c.oid = targets.relid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_stat_user_tables s ON s.relid = c.oid
+    LEFT JOIN vault_configs
+      ON c.relname LIKE targets.name || '\\_%%'
+     AND replace(vault_configs.id::text, '-', '') = right(c.relname, 32)
+    ORDER BY targets.name, c.relname;
+"""
+
+INDEX_HEALTH_SQL = f"""
+    WITH targets AS ({TARGETS_SQL})
+    SELECT
+        ic.oid::regclass::text,
+        i.indrelid::regclass::text,
+        targets.name,
+        am.amname,
+        pg_relation_size(ic.oid),
+        i.indisvalid,
+        -- The full-table HNSW graph that vector search walks
+        targets.name = 'markdown_chunks' AND am.amname = 'hnsw' AND i.indpred IS NULL
+            AND pg_get_indexdef(ic.oid) LIKE %s
+    FROM targets
+    JOIN pg_index i ON i.indrelid = targets.relid
+    JOIN pg_class ic ON ic.oid = i.indexrelid
+    JOIN pg_am am ON am.oid = ic.relam
+    ORDER BY 2, 1;
+"""
+
+def parse_interval(value: str) -> float:
+    """Seconds in '90', '30m', '6h' or '1d'"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*', value or '')
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid interval {value!r} (e.g. 30m, 6h, 1d)")
+    return float(match.group(1)) * {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+
+def format_bytes(size) -> str:
+    size = float(size or 0)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+def format_age(timestamp) -> str:
+    if timestamp is None:
+        return 'never'
+    seconds = (datetime.now(timezone.utc) - timestamp).total_seconds()
+    for unit, span in (('d', 86400), ('h', 3600), ('m', 60)):
+        if seconds >= span:
+            return f"{seconds / span:.0f}{unit} ago"
+    return f"{seconds:.0f}s ago"
+
+def has_extension(cur, name: str) -> bool:
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = %s;", (name,))
+    return cur.fetchone() is not None
+
+def heap_bloat(cur, table: dict, use_pgstattuple: bool):
+    """
+    Fraction of the heap that is dead tuples or free space
+
+    pgstattuple_approx() measures it; without the extension it is estimated
+    from live rows × average row width (pg_stats) against the heap size, so
+    it needs a recent ANALYZE and reads slightly high.
+    """
+    if table['heap_bytes'] < 10 * 8192:
+        return None
+    if use_pgstattuple:
+        cur.execute(
+            "SELECT dead_tuple_percent + approx_free_percent FROM pgstattuple_approx(%s::regclass);",
+            (table['relation'],)
+        )
+        return round(cur.fetchone()[0] / 100, 4)
+    if not table['row_width']:
+        return None
+    expected = table['live'] * (table['row_width'] + TUPLE_OVERHEAD_BYTES)
+    return round(max(0.0, 1 - expected / table['heap_bytes']), 4)
+
+def table_health(cur) -> list:
+    cur.execute(TABLE_HEALTH_SQL, (TARGET_TABLES,))
+    rows = cur.fetchall()
+    use_pgstattuple = has_extension(cur, 'pgstattuple')
+    tables = []
+    for (relation, root, vault_path, live, dead, modified, heap_bytes, table_bytes, index_bytes,
+         vacuumed_at, analyzed_at, row_width) in rows:
+        table = {
+            'relation': relation,
+            'root': root,
+            'vault_path': vault_path,
+            'live': live,
+            'dead': dead,
+            'dead_ratio': round(dead / (live + dead), 4) if live + dead else 0.0,
+            'modified_since_analyze': modified,
+            'heap_bytes': heap_bytes,
+            'table_bytes': table_bytes,
+            'index_bytes': index_bytes,
+            'vacuumed_at': vacuumed_at,
+            'analyzed_at': analyzed_at,
+            'row_width': float(row_width) if row_width is not None else None,
+        }
+        table['bloat'] = heap_bloat(cur, table, use_pgstattuple)
+        table['bloat_source'] = 'pgstattuple' if use_pgstattuple else 'estimate'
+        tables.append(table)
+    return tables
+
+def index_health(cur, tables: list, baselines: dict) -> list:
+    live_by_table = {table['relation']: table['live'] for table in tables}
+    cur.execute(INDEX_HEALTH_SQL, (TARGET_TABLES, '%USING hnsw (embedding vector_cosine_ops)%'))
+    indexes = []
+    for name, table, root, method, size, valid, searched in cur.fetchall():
+        live = live_by_table.get(table, 0)
+        bytes_per_row = round(size / live, 1) if live else None
+        baseline = baselines.get(name, {})
+        growth = None
+        if bytes_per_row and baseline.get('bytes_per_row'):
+            growth = round(bytes_per_row / baseline['bytes_per_row'], 3)
+        indexes.append({
+            'index': name,
+            'table': table,
+            'root': root,
+            'method': method,
+            'bytes': size,
+            'valid': valid,
+            'live': live,
+            'bytes_per_row': bytes_per_row,
+            'baseline_bytes_per_row': baseline.get('bytes_per_row'),
+            'growth': growth,
+            'searched': searched,
+            'recall': None,
+            'baseline_recall': baseline.get('recall'),
+        })
+    return indexes
+
+def sampled_recall(cur, table: str, live: int, k: int, sample: int):
+    """
+    recall@k of the partition's HNSW index against an exact scan, using
+    stored embeddings as queries (no embedding model needed)
+
+    Each query's own row would top both result lists and pad recall by
+    about 1/k, so both searches fetch k + 1 and drop it.
+    """
+    percent = min(100.0, max(0.01, 100.0 * sample * 4 / max(live, 1)))
+    cur.execute(f"""
+        SELECT id, embedding::text
+        FROM {table} TABLESAMPLE BERNOULLI (%s)
+        WHERE embedding IS NOT NULL
+        LIMIT %s;
+    """, (percent, sample))
+    queries = cur.fetchall()
+    if not queries:
+        return None
+
+    search_sql = f"SELECT id FROM {table} ORDER BY embedding <=> %s::vector LIMIT %s;"
+
+    def neighbours(source_id, query) -> set:
+        cur.execute(search_sql, (query, k + 1))
+        return set([row[0] for row in cur.fetchall() if row[0] != source_id][:k])
+
+    approximate = [neighbours(source_id, query) for source_id, query in queries]
+
+    cur.execute("SET enable_indexscan = off;")
+    try:
+        hits = expected_total = 0
+        for (source_id, query), found in zip(queries, approximate):
+            expected = neighbours(source_id, query)
+            hits += len(found & expected)
+            expected_total += len(expected)
+    finally:
+        cur.execute("RESET enable_indexscan;")
+    return round(hits / expected_total, 4) if expected_total else None
+
+def load_baselines(cur) -> dict:
+    """Latest baseline or post-reindex details per index"""
+    cur.execute("""
+        SELECT DISTINCT ON (relation) relation, details
+        FROM rag_maintenance_log
+        WHERE action IN ('baseline', 'reindex')
+        ORDER BY relation, ran_at DESC;
+    """)
+    return dict(cur.fetchall())
+
+def log_action(cur, relation: str, action: str, reason: str = None, seconds: float = None, details: dict = None):
+    cur.execute("""
+        INSERT INTO rag_maintenance_log (relation, action, reason, seconds, details)
+        VALUES (%s, %s, %s, %s, %s);
+    """, (relation, action, reason, seconds, json.dumps(details or {}, default=str)))
+
+def collect(cur, thresholds) -> dict:
+    """Table and index health, with sampled recall for the searched HNSW indexes"""
+    baselines = load_baselines(cur)
+    tables = table_health(cur)
+    indexes = index_health(cur, tables, baselines)
+    if thresholds.recall_sample > 0:
+        for index in indexes:
+            if index['searched'] and index['valid'] and index['live'] >= thresholds.min_rows:
+                index['recall'] = sampled_recall(cur, index['table'], index['live'], thresholds.k, thresholds.recall_sample)
+    return {'tables': tables, 'indexes': indexes}
+
+def plan_actions(health: dict, thresholds) -> list:
+    """
+    Maintenance the thresholds call for: VACUUM first (it also cleans
+    deleted HNSW elements), then REINDEX, then ANALYZE of tables VACUUM
+    did not already analyze
+    """
+    vacuums, reindexes, analyzes = [], [], []
+    for table in health['tables']:
+        modified_ratio = table['modified_since_analyze'] / max(table['live'], 1)
+        if table['dead'] >= thresholds.vacuum_min_dead and table['dead_ratio'] >= thresholds.vacuum_dead_ratio:
+            vacuums.append({
+                'action': 'vacuum',
+                'relation': table['relation'],
+                'sql': f"VACUUM (ANALYZE) {table['relation']};",
+                'reason': f"{table['dead_ratio']:.1%} dead tuples ({table['dead']:,})",
+            })
+        elif (table['modified_since_analyze'] >= thresholds.analyze_min_modified
+              and modified_ratio >= thresholds.analyze_modified_ratio):
+            analyzes.append({
+                'action': 'analyze',
+                'relation': table['relation'],
+                'sql': f"ANALYZE {table['relation']};",
+                'reason': f"{modified_ratio:.1%} of rows modified since the last ANALYZE",
+            })
+
+    for index in health['indexes']:
+        reasons = []
+        if not index['valid']:
+            reasons.append('invalid (failed concurrent build)')
+        elif index['live'] >= thresholds.min_rows:
+            if index['growth'] and index['growth'] >= thresholds.reindex_growth:
+                reasons.append(f"{index['growth']:.2f}x bytes per live row vs. baseline")
+            if index['recall'] is not None:
+                if index['recall'] < thresholds.reindex_min_recall:
+                    reasons.append(f"recall@{thresholds.k} {index['recall']:.3f} < {thresholds.reindex_min_recall}")
+                elif (index['baseline_recall'] is not None
+                      and index['baseline_recall'] - index['recall'] >= thresholds.reindex_recall_drop):
+                    reasons.append(f"recall@{thresholds.k} dropped {index['baseline_recall'] - index['recall']:.3f} since baseline")
+        if reasons:
+            reindexes.append({
+                'action': 'reindex',
+                'relation': index['index'],
+                'sql': f"REINDEX INDEX CONCURRENTLY {index['index']};",
+                'reason': '; '.join(reasons),
+            })
+
+    return vacuums + reindexes + analyzes
+
+def print_report(health: dict, actions: list, thresholds):
+    print("\n📊 Tables")
+    for table in health['tables']:
+        label = table['relation'] + (f" ({table['vault_path']})" if table['vault_path'] else '')
+        bloat = ''
+        if table['bloat'] is not None:
+            marker = '' if table['bloat_source'] == 'pgstattuple' else '~'
+            bloat = f" ({marker}{table['bloat']:.0%} bloat)"
+        print(f"   {label}")
+        print(
+            f"      live {table['live']:,}  dead {table['dead']:,} ({table['dead_ratio']:.1%})  "
+            f"heap {format_bytes(table['table_bytes'])}{bloat}  indexes {format_bytes(table['index_bytes'])}  "
+            f"vacuumed {format_age(table['vacuumed_at'])}  analyzed {format_age(table['analyzed_at'])}"
+        )
+        if table['bloat'] is not None and table['bloat'] >= thresholds.bloat_warning and table['dead_ratio'] < thresholds.vacuum_dead_ratio:
+            print("      ⚠️  Free space is reused by new rows; VACUUM FULL (locks) or pg_repack returns it to the OS")
+
+    print("\n🧭 Indexes")
+    for index in health['indexes']:
+        line = f"   {index['index']:<56} {index['method']:<6} {format_bytes(index['bytes']):>9}"
+        if not index['valid']:
+            line += "  ❌ INVALID"
+        if index['bytes_per_row']:
+            line += f"  {index['bytes_per_row']:,.0f} B/row"
+            line += f" ({index['growth']:.2f}x baseline)" if index['growth'] else " (no baseline)"
+        if index['recall'] is not None:
+            line += f"  recall@{thresholds.k} {index['recall']:.3f}"
+            if index['baseline_recall'] is not None:
+                line += f" ({index['recall'] - index['baseline_recall']:+.3f})"
+        print(line)
+
+    print("\n🛠️  Planned actions" if actions else "\n✅ Nothing to do")
+    for action in actions:
+        print(f"   {action['sql']:<72} {action['reason']}")
+
+def record_baselines(cur, health: dict, thresholds) -> int:
+    """First sighting of an index: its size per row (and recall) becomes the baseline"""
+    recorded = 0
+    for index in health['indexes']:
+        if index['valid'] and index['baseline_bytes_per_row'] is None and index['live'] >= thresholds.min_rows:
+            log_action(cur, index['index'], 'baseline', details={
+                'bytes_per_row': index['bytes_per_row'], 'recall': index['recall'], 'live': index['live']
+            })
+            recorded += 1
+    return recorded
+
+def apply_actions(cur, actions: list, health: dict, thresholds):
+    """Run the planned statements (autocommit: VACUUM and REINDEX CONCURRENTLY need it)"""
+    tables = {table['relation']: table for table in health['tables']}
+    indexes = {index['index']: index for index in health['indexes']}
+    cur.execute("SET maintenance_work_mem = %s;", (os.getenv('RAG_MAINTENANCE_WORK_MEM', '1GB'),))
+
+    for action in actions:
+        print(f"   ⏳ {action['sql']}", flush=True)
+        started = time.perf_counter()
+        try:
+            cur.execute(action['sql'])
+        except psycopg2.Error as e:
+            print(f"   ❌ {action['relation']}: {e}".rstrip())
+            log_action(cur, action['relation'], f"{action['action']}_failed", action['reason'],
+                       time.perf_counter() - started, {'error': str(e)})
+            continue
+        seconds = time.perf_counter() - started
+        details = {}
+
+        if action['action'] == 'reindex':
+            # The rebuilt index is the new baseline
+            index = indexes[action['relation']]
+            cur.execute("SELECT pg_relation_size(%s::regclass);", (index['index'],))
+            size = cur.fetchone()[0]
+            details = {
+                'bytes_before': index['bytes'],
+                'bytes': size,
+                'bytes_per_row': round(size / index['live'], 1) if index['live'] else None,
+                'live': index['live'],
+                'recall_before': index['recall'],
+                'recall': None,
+            }
+            if index['searched'] and thresholds.recall_sample > 0:
+                details['recall'] = sampled_recall(cur, index['table'], index['live'], thresholds.k, thresholds.recall_sample)
+        elif action['action'] == 'vacuum':
+            cur.execute("SELECT n_dead_tup FROM pg_stat_user_tables WHERE relid = %s::regclass;", (action['relation'],))
+            details = {'dead_before': tables[action['relation']]['dead'], 'dead': cur.fetchone()[0]}
+
+        log_action(cur, action['relation'], action['action'], action['reason'], seconds, details)
+        summary = ''
+        if action['action'] == 'reindex':
+            summary = f" ({format_bytes(details['bytes_before'])} → {format_bytes(details['bytes'])}"
+            summary += f", recall {details['recall']:.3f})" if details['recall'] is not None else ")"
+        print(f"   ✅ {action['relation']} in {seconds:.1f}s{summary}", flush=True)
+
+def maintenance_pass(conn, thresholds, dry_run: bool):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s));", (ADVISORY_LOCK_KEY,))
+        if not cur.fetchone()[0]:
+            print("⏭️  Another maintenance pass holds the lock; skipping")
+            return
+        try:
+            health = collect(cur, thresholds)
+            actions = plan_actions(health, thresholds)
+            print_report(health, actions, thresholds)
+            if dry_run:
+                print("\n🔍 Dry run: nothing executed")
+                return
+            recorded = record_baselines(cur, health, thresholds)
+            if recorded:
+                print(f"\n📌 Recorded baselines for {recorded} indexes")
+            if actions:
+                print(f"\n🛠️  Running {len(actions)} actions...")
+                apply_actions(cur, actions, health, thresholds)
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(hashtext(%s));", (ADVISORY_LOCK_KEY,))
+
+def connect():
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(MAINTENANCE_LOG_SQL)
+    return conn
+
+def report(thresholds, as_json: bool):
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            health = collect(cur, thresholds)
+        actions = plan_actions(health, thresholds)
+    finally:
+        conn.close()
+    if as_json:
+        print(json.dumps({'health': health, 'actions': actions}, indent=2, default=str))
+    else:
+        print_report(health, actions, thresholds)
+
+def run(thresholds, dry_run: bool, every: float):
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+
+    while not stopping.is_set():
+        print(f"\n🕐 Maintenance pass at {datetime.now():%Y-%m-%d %H:%M:%S}", flush=True)
+        try:
+            conn = connect()
+            try:
+                maintenance_pass(conn, thresholds, dry_run)
+            finally:
+                conn.close()
+        except psycopg2.OperationalError as e:
+            print(f"⚠️  Database connection failed: {e}", flush=True)
+        except KeyboardInterrupt:
+            break
+        if not every:
+            break
+        print(f"\n💤 Next pass in {every / 3600:.1f}h", flush=True)
+        try:
+            stopping.wait(every)
+        except KeyboardInterrupt:
+            break
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='RAG database health report and maintenance')
+    parser.add_argument('command', choices=['report', 'run'], help='report: read-only; run: apply maintenance')
+    parser.add_argument('--json', action='store_true', help='report: print JSON instead of text')
+    parser.add_argument('--dry-run', action='store_true', help='run: plan and print actions without executing them')
+    parser.add_argument('--every', type=parse_interval, help='run: repeat at this interval (e.g. 30m, 6h, 1d)')
+    parser.add_argument('--k', type=int, default=10, help='Results per query for sampled recall')
+    parser.add_argument('--recall-sample', type=int, default=20, help='Query vectors sampled per partition (0 skips recall)')
+    parser.add_argument('--min-rows', type=int, default=1000, help='Skip index checks on partitions with fewer live rows')
+    parser.add_argument('--vacuum-dead-ratio', type=float, default=0.1, help='VACUUM when dead / (live + dead) reaches this')
+    parser.add_argument('--vacuum-min-dead', type=int, default=1000, help='...and at least this many dead tuples')
+    parser.add_argument('--analyze-modified-ratio', type=float, default=0.1, help='ANALYZE when this fraction of rows changed')
+    parser.add_argument('--analyze-min-modified', type=int, default=500, help='...and at least this many rows changed')
+    parser.add_argument('--reindex-growth', type=float, default=1.5, help='REINDEX when bytes per live row grow this much vs. baseline')
+    parser.add_argument('--reindex-min-recall', type=float, default=0.9, help='REINDEX when sampled recall falls below this')
+    parser.add_argument('--reindex-recall-drop', type=float, default=0.05, help='REINDEX when recall drops this much vs. baseline')
+    parser.add_argument('--bloat-warning', type=float, default=0.5, help='Warn about heap bloat that VACUUM cannot return')
+
+    args = parser.parse_args()
+
+    print("🩺 RAG database maintenance")
+    print("=" * 60)
+
+    if args.command == 'report':
+        report(args, args.json)
+    else:
+        run(args, args.dry_run, args.every)
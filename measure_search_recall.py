@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Measure Search Recall
+Compares approximate search modes against exact (flat) search on sampled chunk embeddings
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from dotenv import load_dotenv
+import psycopg2
+
+# Load environment variables
+load_dotenv('.env.local')
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+if not DATABASE_URL:
+    print("❌ DATABASE_URL not found in .env.local")
+    exit(1)
+
+# Each mode returns chunk ids for (query_vector, k)
+MODE_QUERIES = {
+    'hnsw': """
+        SELECT id FROM match_markdown_chunks(%(q)s::vector, -1.0, %(k)s);
+    """,
+    'two_stage': """
+        SELECT id FROM two_stage_match_markdown_chunks(%(q)s::vector, -1.0, %(k)s, %(file_count)s);
+    """,
+    'binary': """
+        SELECT id FROM binary_match_markdown_chunks(%(q)s::vector, -1.0, %(k)s, %(candidate_multiplier)s);
+    """,
+}
+
+EXACT_QUERY = """
+    SELECT id
+    FROM markdown_chunks
+    WHERE embedding IS NOT NULL
+    ORDER BY embedding <=> %(q)s::vector
+    LIMIT %(k)s;
+"""
+
+def sample_query_vectors(cur, sample_size: int) -> list:
+    """
+    Use stored chunk embeddings as query vectors (no embedding model needed)
+    Returns: [(source_id, embedding)]
+    """
+    cur.execute("""
+        SELECT id, embedding::text
+        FROM markdown_chunks
+        WHERE embedding IS NOT NULL
+        ORDER BY random()
+        LIMIT %s;
+    """, (sample_size,))
+    return [(row[0], row[1]) for row in cur.fetchall()]
+
+def without_source(ids: list, source_id, k: int) -> list:
+    """Top k of k+1 results once the sampled chunk itself (a trivial match) is dropped"""
+    return [chunk_id for chunk_id in ids if chunk_id != source_id][:k]
+
+def exact_ids(conn, query_vector: str, k: int) -> list:
+    """Exact top-k by sequential scan (index scans disabled for this transaction)"""
+    with conn.cursor() as cur:
+        cur.execute("SET LOCAL enable_indexscan = off;")
+        cur.execute(EXACT_QUERY, {'q': query_vector, 'k': k})
+        ids = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    return ids
+
+def chunks_ranked_two_stage(cur, query_vector: str, file_count: int) -> int:
+    """Number of chunks the fine stage ranks for this query"""
+    cur.execute("""
+        SELECT coalesce(sum(chunk_count), 0)
+        FROM (
+            SELECT chunk_count
+            FROM markdown_files
+            WHERE centroid_embedding IS NOT NULL
+            ORDER BY centroid_embedding <=> %s::vector
+            LIMIT %s
+        ) top_files;
+    """, (query_vector, file_count))
+    return int(cur.fetchone()[0])
+
+def measure(modes: list, k: int, sample_size: int, file_count: int, candidate_multiplier: int = 10) -> dict:
+    conn = psycopg2.connect(DATABASE_URL)
+    cur = conn.cursor()
+
+    cur.execute("SELECT COUNT(*) FROM markdown_chunks WHERE embedding IS NOT NULL;")
+    total_chunks = cur.fetchone()[0]
+
+    queries = sample_query_vectors(cur, sample_size)
+    conn.commit()
+
+    results = {
+        'k': k,
+        'queries': len(queries),
+        'total_chunks': total_chunks,
+        'modes': {}
+    }
+
+    # Every search fetches k+1 and drops the source chunk, which would
+    # otherwise be the top hit of both and inflate recall
+    truth = [set(without_source(exact_ids(conn, q, k + 1), source_id, k)) for source_id, q in queries]
+
+    for mode in modes:
+        recalls = []
+        latencies = []
+        ranked = []
+        for (source_id, query_vector), expected in zip(queries, truth):
+            start = time.perf_counter()
+            cur.execute(MODE_QUERIES[mode], {
+                'q': query_vector,
+                'k': k + 1,
+                'file_count': file_count,
+                'candidate_multiplier': candidate_multiplier
+            })
+            found = set(without_source([row[0] for row in cur.fetchall()], source_id, k))
+            latencies.append((time.perf_counter() - start) * 1000)
+            conn.commit()
+
+            if expected:
+                recalls.append(len(found & expected) / len(expected))
+            if mode == 'two_stage':
+                ranked.append(chunks_ranked_two_stage(cur, query_vector, file_count))
+
+        latencies.sort()
+        summary = {
+            f'recall@{k}': round(sum(recalls) / len(recalls), 4) if recalls else None,
+            'latency_ms_p50': round(latencies[len(latencies) // 2], 2) if latencies else None,
+            'latency_ms_mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        }
+        if ranked:
+            avg_ranked = sum(ranked) / len(ranked)
+            summary['chunks_ranked_mean'] = round(avg_ranked, 1)
+            summary['chunks_ranked_fraction'] = round(avg_ranked / total_chunks, 5) if total_chunks else None
+        results['modes'][mode] = summary
+
+    cur.close()
+    conn.close()
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure recall of search modes against exact search')
+    parser.add_argument('--modes', default='hnsw,two_stage', help=f"Comma-separated modes ({', '.join(MODE_QUERIES)})")
+    parser.add_argument('--k', type=int, default=10, help='Results per query (recall@k)')
+    parser.add_argument('--sample', type=int, default=100, help='Number of sampled query vectors')
+    parser.add_argument('--file-count', type=int, default=20, help='Files kept by the two-stage coarse step')
+    parser.add_argument('--candidate-multiplier', type=int, default=10, help='Binary-mode candidates per result')
+
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODE_QUERIES]
+    if unknown:
+        print(f"❌ Unknown modes: {', '.join(unknown)}")
+        sys.exit(1)
+
+    print(json.dumps(measure(modes, args.k, args.sample, args.file_count, args.candidate_multiplier), indent=2), flush=True)
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Online Embedding Model Migration
+Switches markdown_chunks to a new embedding model without downtime or a table rewrite
+
+Unlike migrate_to_local_embeddings.py / migrate_to_openai_embeddings.py
+(ALTER COLUMN TYPE + full reindex, search broken meanwhile), this keeps the
+live column serving searches while a shadow column is filled:
+
+    prepare   add embedding_<tag> / centroid_<tag> (nullable: catalog-only, no rewrite)
+    backfill  embed chunks into the shadow column in small throttled batches
+    index     build the shadow column's indexes CONCURRENTLY (per vault
+              partition, then attached to the partitioned parent index)
+    switch    one short transaction: rename columns and indexes, replace the
+              search functions with the new dimensions
+    rollback  swap the previous column back in
+    cleanup   drop the previous column
+    status    progress of every migration
+
+    python migrate_embeddings_online.py all --model minilm --rows-per-sec 200
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.errors import LockNotAvailable
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from embedders import EMBEDDING_MODELS, get_embedder
+from rag_schema import (
+    match_function_sql,
+    two_stage_match_function_sql,
+    hybrid_match_function_sql,
+    binary_match_function_sql,
+    binary_index_sql,
+    hot_folder_index_sql,
+    hot_folder_index_name,
+    shadow_index_name,
+    parse_hot_folders,
+    parse_vector_index_kinds,
+    refresh_all_file_centroids_sql,
+    EMBEDDING_PENDING_TRIGGER_SQL,
+    DROP_CHUNK_EMBEDDINGS_SQL,
+)
+
+# Load environment variables
+load_dotenv('.env.local')
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+# Same index settings as setup_rag_database.py
+HOT_FOLDERS = parse_hot_folders(os.getenv('RAG_HOT_FOLDERS', ''))
+VECTOR_INDEX_KINDS = parse_vector_index_kinds(os.getenv('RAG_VECTOR_INDEX', 'hnsw'))
+
+# Tag used for the column (and indexes) being replaced
+PREVIOUS_TAG = 'previous'
+
+if not DATABASE_URL:
+    print("❌ DATABASE_URL not found in .env.local")
+    exit(1)
+
+def chunk_column(tag: str) -> str:
+    return f"embedding_{tag}"
+
+def centroid_column(tag: str) -> str:
+    return f"centroid_{tag}"
+
+def pending_index_name(tag: str) -> str:
+    # Shadow counterpart of markdown_chunks_embedding_pending_idx, so the
+    # switch renames it into place for embed_pending_chunks.py
+    return shadow_index_name('markdown_chunks_embedding_pending_idx', tag)
+
+def canonical_indexes() -> list:
+    """(table, index name) of every index on the live embedding columns"""
+    names = [('markdown_chunks', 'markdown_chunks_embedding_idx')]
+    if 'binary' in VECTOR_INDEX_KINDS:
+        names.append(('markdown_chunks', 'markdown_chunks_embedding_bq_idx'))
+    names += [('markdown_chunks', hot_folder_index_name(folder)) for folder in HOT_FOLDERS]
+    names.append(('markdown_files', 'markdown_files_centroid_idx'))
+    names.append(('markdown_chunks', 'markdown_chunks_embedding_pending_idx'))
+    return names
+
+def chunk_partitions(cur) -> list:
+    """Leaf partitions of markdown_chunks (one per vault)"""
+    cur.execute("""
+        SELECT relid::regclass::text
+        FROM pg_partition_tree('markdown_chunks')
+        WHERE isleaf
+        ORDER BY 1;
+    """)
+    return [row[0] for row in cur.fetchall()]
+
+def partition_index_name(name: str, partition: str) -> str:
+    """Name of one partition's piece of a partitioned markdown_chunks index"""
+    return shadow_index_name(name, partition.rsplit('_', 1)[-1][:12])
+
+def index_is_invalid(cur, name: str) -> bool:
+    """True for a non-partitioned index left INVALID by a failed concurrent build"""
+    cur.execute("""
+        SELECT NOT pg_index.indisvalid AND pg_class.relkind = 'i'
+        FROM pg_index
+        JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+        WHERE pg_index.indexrelid = to_regclass(%s);
+    """, (name,))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+def create_chunk_index_concurrently(cur, name: str, build):
+    """
+    CREATE INDEX CONCURRENTLY on the partitioned markdown_chunks (autocommit)
+
+    Postgres cannot build a partitioned index concurrently, so the parent
+    index is created ON ONLY (catalog-only, invalid until complete), each
+    vault partition's index is built concurrently, and each is attached;
+    the parent turns valid once every partition is attached. Partitions
+    created later get their piece automatically. build(table, name,
+    concurrently) returns the CREATE INDEX statement. Re-running resumes.
+    """
+    cur.execute(build('ONLY markdown_chunks', name, False))
+    for partition in chunk_partitions(cur):
+        child = partition_index_name(name, partition)
+        # A failed concurrent build leaves an INVALID index behind; rebuild it
+        if index_is_invalid(cur, child):
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {child};")
+        cur.execute(build(partition, child, True))
+        # No-op when already attached
+        cur.execute(f"ALTER INDEX {name} ATTACH PARTITION {child};")
+
+def column_dimensions(cur, table: str, column: str):
+    """Declared vector dimension of a column (None if it does not exist)"""
+    cur.execute("""
+        SELECT atttypmod
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attname = %s AND NOT attisdropped;
+    """, (table, column))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def index_exists(cur, name: str) -> bool:
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (name,))
+    return cur.fetchone()[0]
+
+def ensure_migrations_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_migrations (
+            model_tag TEXT PRIMARY KEY,
+            model_name TEXT NOT NULL,
+            dimensions INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            rows_backfilled BIGINT NOT NULL DEFAULT 0,
+            started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            switched_at TIMESTAMP WITH TIME ZONE
+        );
+    """)
+
+def set_status(cur, tag: str, status: str, rows: int = 0):
+    cur.execute("""
+        UPDATE embedding_migrations
+        SET status = %s,
+            rows_backfilled = rows_backfilled + %s,
+            updated_at = NOW(),
+            switched_at = CASE WHEN %s = 'switched' THEN NOW() ELSE switched_at END
+        WHERE model_tag = %s;
+    """, (status, rows, status, tag))
+
+def prepare(conn, tag: str):
+    _, model_name, dimensions = EMBEDDING_MODELS[tag]
+    print(f"\n1️⃣ Preparing shadow columns for {tag} ({model_name}, {dimensions}-dim)...")
+
+    with conn.cursor() as cur:
+        ensure_migrations_table(cur)
+        cur.execute("SET LOCAL lock_timeout = '5s';")
+        # Nullable columns without defaults are catalog-only changes
+        cur.execute(f"ALTER TABLE markdown_chunks ADD COLUMN IF NOT EXISTS {chunk_column(tag)} vector({dimensions});")
+        cur.execute(f"ALTER TABLE markdown_files ADD COLUMN IF NOT EXISTS {centroid_column(tag)} vector({dimensions});")
+        cur.execute(f"COMMENT ON COLUMN markdown_chunks.{chunk_column(tag)} IS %s;", (f"model={model_name}",))
+        cur.execute("""
+            INSERT INTO embedding_migrations (model_tag, model_name, dimensions, status)
+            VALUES (%s, %s, %s, 'prepared')
+            ON CONFLICT (model_tag) DO NOTHING;
+        """, (tag, model_name, dimensions))
+    conn.commit()
+
+    # Keeps "next pending batch" an index scan however far the backfill is
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        create_chunk_index_concurrently(cur, pending_index_name(tag), lambda table, name, concurrently: f"""
+            CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name}
+            ON {table} (id)
+            WHERE {chunk_column(tag)} IS NULL;
+        """)
+    conn.autocommit = False
+    print(f"✅ {chunk_column(tag)} and {centroid_column(tag)} ready")
+
+def wait_for_quiet(cur, max_active: int):
+    """Back off while the database is busy (active backends above max_active)"""
+    if not max_active:
+        return
+    while True:
+        cur.execute("SELECT count(*) FROM pg_stat_activity WHERE state = 'active' AND pid <> pg_backend_pid();")
+        if cur.fetchone()[0] <= max_active:
+            return
+        time.sleep(1.0)
+
+def embed_rows(cur, embedder, tag: str, rows: list):
+    """Write shadow embeddings for (id, chunk_text) rows"""
+    vectors = embedder.embed_batch([row[1] for row in rows])
+    execute_values(cur, f"""
+        UPDATE markdown_chunks
+        SET {chunk_column(tag)} = batch.embedding::vector
+        FROM (VALUES %s) AS batch(id, embedding)
+        WHERE markdown_chunks.id = batch.id::uuid;
+    """, [(str(row[0]), vector) for row, vector in zip(rows, vectors)])
+
+def backfill(conn, tag: str, batch_size: int, rows_per_sec: float, pause_ms: float, max_active: int):
+    """
+    Fill the shadow column pass by pass until a pass finds nothing
+
+    Each batch is its own short transaction (no long locks, no bloat
+    from one giant UPDATE). Rows written by the indexers during the
+    backfill get new ids, so passes repeat until none are pending.
+    """
+    print(f"\n2️⃣ Backfilling {chunk_column(tag)}...")
+    embedder = get_embedder(tag)
+    column = chunk_column(tag)
+    total = 0
+    started = time.perf_counter()
+
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT count(*) FROM markdown_chunks WHERE {column} IS NULL;")
+        pending = cur.fetchone()[0]
+        conn.commit()
+        print(f"   Pending: {pending:,} chunks")
+
+        passes = 0
+        while True:
+            passes += 1
+            last_id = '00000000-0000-0000-0000-000000000000'
+            pass_rows = 0
+            while True:
+                wait_for_quiet(cur, max_active)
+                batch_started = time.perf_counter()
+
+                cur.execute(f"""
+                    SELECT id, chunk_text
+                    FROM markdown_chunks
+                    WHERE {column} IS NULL AND id > %s
+                    ORDER BY id
+                    LIMIT %s;
+                """, (last_id, batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    conn.commit()
+                    break
+
+                embed_rows(cur, embedder, tag, rows)
+                set_status(cur, tag, 'backfilling', len(rows))
+                conn.commit()
+
+                last_id = str(rows[-1][0])
+                pass_rows += len(rows)
+                total += len(rows)
+
+                # Throttle: hold the target rate, plus an optional fixed pause
+                min_seconds = len(rows) / rows_per_sec if rows_per_sec else 0.0
+                sleep = max(0.0, min_seconds - (time.perf_counter() - batch_started)) + pause_ms / 1000
+                if sleep:
+                    time.sleep(sleep)
+
+                if total % (batch_size * 20) < len(rows):
+                    rate = total / (time.perf_counter() - started)
+                    print(f"   {total:,}/{pending:,} ({rate:,.0f} rows/s)", flush=True)
+
+            if pass_rows == 0:
+                break
+            print(f"   Pass {passes}: {pass_rows:,} rows")
+
+        set_status(cur, tag, 'backfilled')
+        conn.commit()
+
+    print(f"✅ Backfilled {total:,} chunks in {time.perf_counter() - started:.1f}s")
+
+def build_indexes(conn, tag: str):
+    """
+    Build shadow indexes CONCURRENTLY (writes keep flowing) and shadow centroids
+
+    Chunk indexes are built one vault partition at a time (see
+    create_chunk_index_concurrently()).
+    """
+    _, _, dimensions = EMBEDDING_MODELS[tag]
+    column = chunk_column(tag)
+    print(f"\n3️⃣ Building indexes on {column} (CONCURRENTLY)...")
+
+    with conn.cursor() as cur:
+        cur.execute(refresh_all_file_centroids_sql(column, centroid_column(tag)))
+    conn.commit()
+    print(f"✅ File centroids computed into {centroid_column(tag)}")
+
+    # name -> build(table, name, concurrently) for markdown_chunks indexes
+    chunk_indexes = {
+        shadow_index_name('markdown_chunks_embedding_idx', tag): lambda table, name, concurrently: f"""
+            CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name}
+            ON {table}
+            USING hnsw ({column} vector_cosine_ops)
+            WITH (m = 16, ef_construction = 64);
+        """,
+    }
+    if 'binary' in VECTOR_INDEX_KINDS:
+        chunk_indexes[shadow_index_name('markdown_chunks_embedding_bq_idx', tag)] = (
+            lambda table, name, concurrently: binary_index_sql(dimensions, column, name, concurrently, table)
+        )
+    for folder in HOT_FOLDERS:
+        chunk_indexes[shadow_index_name(hot_folder_index_name(folder), tag)] = (
+            lambda table, name, concurrently, folder=folder: hot_folder_index_sql(folder, column, name, concurrently, table)
+        )
+    centroid_index = shadow_index_name('markdown_files_centroid_idx', tag)
+
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SET maintenance_work_mem = %s;", (os.getenv('RAG_MAINTENANCE_WORK_MEM', '1GB'),))
+        for name, build in chunk_indexes.items():
+            started = time.perf_counter()
+            create_chunk_index_concurrently(cur, name, build)
+            print(f"✅ {name} ({time.perf_counter() - started:.1f}s)")
+
+        if index_is_invalid(cur, centroid_index):
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {centroid_index};")
+        started = time.perf_counter()
+        cur.execute(f"""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS {centroid_index}
+            ON markdown_files
+            USING hnsw ({centroid_column(tag)} vector_cosine_ops)
+            WITH (m = 16, ef_construction = 64);
+        """)
+        print(f"✅ {centroid_index} ({time.perf_counter() - started:.1f}s)")
+        cur.execute("""
+            UPDATE embedding_migrations SET status = 'indexed', updated_at = NOW() WHERE model_tag = %s;
+        """, (tag,))
+    conn.autocommit = False
+
+def swap_columns(cur, incoming: str, outgoing: str, incoming_dimensions: int):
+    """
+    Rename live <-> shadow columns and indexes, then replace the search
+    functions for the incoming dimension. Runs inside the caller's transaction.
+    """
+    cur.execute(f"ALTER TABLE markdown_chunks RENAME COLUMN embedding TO {chunk_column(outgoing)};")
+    cur.execute(f"ALTER TABLE markdown_chunks RENAME COLUMN {chunk_column(incoming)} TO embedding;")
+    cur.execute(f"ALTER TABLE markdown_files RENAME COLUMN centroid_embedding TO {centroid_column(outgoing)};")
+    cur.execute(f"ALTER TABLE markdown_files RENAME COLUMN {centroid_column(incoming)} TO centroid_embedding;")
+
+    for _, name in canonical_indexes():
+        if index_exists(cur, name):
+            cur.execute(f"ALTER INDEX {name} RENAME TO {shadow_index_name(name, outgoing)};")
+        if index_exists(cur, shadow_index_name(name, incoming)):
+            cur.execute(f"ALTER INDEX {shadow_index_name(name, incoming)} RENAME TO {name};")
+
+    # Argument typmods are not part of a function's signature, so these
+    # replace the existing functions instead of adding overloads
+    cur.execute(match_function_sql(incoming_dimensions))
+    cur.execute(two_stage_match_function_sql(incoming_dimensions))
+    cur.execute(hybrid_match_function_sql(incoming_dimensions))
+    cur.execute(binary_match_function_sql(incoming_dimensions))
+    # The trigger was bound to the outgoing column by the rename
+    cur.execute(EMBEDDING_PENDING_TRIGGER_SQL)
+    # The narrow layout's copy has the outgoing dimension. Until
+    # setup_rag_database.py with RAG_EMBEDDING_LAYOUT=narrow rebuilds it,
+    # rag_search.py falls back to match_markdown_chunks() (the wide path)
+    cur.execute(DROP_CHUNK_EMBEDDINGS_SQL)
+
+def switch(conn, tag: str, max_inline: int, attempts: int = 10):
+    """
+    Atomically make the shadow column live
+
+    Takes a short ACCESS EXCLUSIVE lock (lock_timeout bounded, retried), embeds
+    any stragglers written since the backfill, then swaps names. Readers see
+    either the old model or the new one, never a mix or a missing function.
+    """
+    _, model_name, dimensions = EMBEDDING_MODELS[tag]
+    print(f"\n4️⃣ Switching search to {chunk_column(tag)}...")
+    embedder = get_embedder(tag)
+
+    with conn.cursor() as cur:
+        if column_dimensions(cur, 'markdown_chunks', chunk_column(PREVIOUS_TAG)):
+            conn.rollback()
+            print(f"❌ {chunk_column(PREVIOUS_TAG)} still exists; run cleanup (or rollback) first")
+            return False
+        conn.rollback()
+
+        for attempt in range(1, attempts + 1):
+            try:
+                cur.execute("SET LOCAL lock_timeout = '2s';")
+                cur.execute("LOCK TABLE markdown_chunks, markdown_files IN ACCESS EXCLUSIVE MODE;")
+
+                cur.execute(f"""
+                    SELECT id, chunk_text FROM markdown_chunks WHERE {chunk_column(tag)} IS NULL LIMIT %s;
+                """, (max_inline + 1,))
+                stragglers = cur.fetchall()
+                if len(stragglers) > max_inline:
+                    conn.rollback()
+                    print(f"⚠️  More than {max_inline} chunks still pending; run backfill again")
+                    return False
+                if stragglers:
+                    embed_rows(cur, embedder, tag, stragglers)
+                    print(f"   Embedded {len(stragglers)} straggler(s) under lock")
+                cur.execute(f"""
+                    UPDATE markdown_files
+                    SET {centroid_column(tag)} = (
+                        SELECT avg(markdown_chunks.{chunk_column(tag)})
+                        FROM markdown_chunks
+                        WHERE markdown_chunks.vault_id = markdown_files.vault_id
+                          AND markdown_chunks.file_path = markdown_files.file_path
+                    )
+                    WHERE {centroid_column(tag)} IS NULL;
+                """)
+
+                cur.execute("SELECT to_regclass('chunk_embeddings') IS NOT NULL;")
+                had_narrow_layout = cur.fetchone()[0]
+                swap_columns(cur, tag, PREVIOUS_TAG, dimensions)
+                set_status(cur, tag, 'switched', len(stragglers))
+                conn.commit()
+                print(f"✅ Search now uses {model_name} ({dimensions}-dim); previous column kept as {chunk_column(PREVIOUS_TAG)}")
+                print(f"⚠️  Point the indexers at {model_name} now (they write the live embedding column)")
+                if had_narrow_layout:
+                    print("⚠️  chunk_embeddings was dropped; unfiltered searches use match_markdown_chunks() until")
+                    print("   setup_rag_database.py is re-run with RAG_EMBEDDING_LAYOUT=narrow")
+                return True
+
+            except LockNotAvailable:
+                conn.rollback()
+                print(f"   Lock busy, retrying ({attempt}/{attempts})...")
+                time.sleep(min(10, attempt))
+
+    print("❌ Could not get the switch lock")
+    return False
+
+def rollback(conn, tag: str):
+    """Swap the previous column back in (the migrated one returns to embedding_<tag>)"""
+    print(f"\n↩️  Rolling back {tag}...")
+    with conn.cursor() as cur:
+        dimensions = column_dimensions(cur, 'markdown_chunks', chunk_column(PREVIOUS_TAG))
+        if not dimensions:
+            print(f"❌ No {chunk_column(PREVIOUS_TAG)} column to roll back to")
+            return
+        cur.execute("SET LOCAL lock_timeout = '5s';")
+        cur.execute("LOCK TABLE markdown_chunks, markdown_files IN ACCESS EXCLUSIVE MODE;")
+        swap_columns(cur, PREVIOUS_TAG, tag, dimensions)
+        cur.execute("SELECT count(*) FROM markdown_chunks WHERE embedding IS NULL;")
+        missing = cur.fetchone()[0]
+        set_status(cur, tag, 'rolled_back')
+    conn.commit()
+    print(f"✅ Previous {dimensions}-dim column restored")
+    if missing:
+        print(f"⚠️  {missing:,} chunks written after the switch have no previous-model embedding; reindex them")
+
+def cleanup(conn):
+    """Drop the previous column (its indexes go with it)"""
+    print(f"\n🧹 Dropping {chunk_column(PREVIOUS_TAG)} / {centroid_column(PREVIOUS_TAG)}...")
+    with conn.cursor() as cur:
+        cur.execute("SET LOCAL lock_timeout = '5s';")
+        cur.execute(f"ALTER TABLE markdown_chunks DROP COLUMN IF EXISTS {chunk_column(PREVIOUS_TAG)};")
+        cur.execute(f"ALTER TABLE markdown_files DROP COLUMN IF EXISTS {centroid_column(PREVIOUS_TAG)};")
+        cur.execute("UPDATE embedding_migrations SET status = 'cleaned', updated_at = NOW() WHERE status = 'switched';")
+    conn.commit()
+    print("✅ Dropped (space is reused as rows are updated; VACUUM reclaims it over time)")
+
+def status(conn):
+    print("\n📊 Embedding migrations")
+    with conn.cursor() as cur:
+        ensure_migrations_table(cur)
+        cur.execute("""
+            SELECT model_tag, model_name, dimensions, status, rows_backfilled, updated_at
+            FROM embedding_migrations
+            ORDER BY started_at;
+        """)
+        migrations = cur.fetchall()
+        live = column_dimensions(cur, 'markdown_chunks', 'embedding')
+        print(f"   Live column: embedding vector({live})")
+        for tag, model_name, dimensions, state, rows, updated_at in migrations:
+            line = f"   {tag:<10} {model_name:<26} {dimensions:>5}-dim  {state:<12} {rows:>10,} rows  {updated_at:%Y-%m-%d %H:%M}"
+            if column_dimensions(cur, 'markdown_chunks', chunk_column(tag)):
+                cur.execute(f"SELECT count(*) FILTER (WHERE {chunk_column(tag)} IS NULL), count(*) FROM markdown_chunks;")
+                pending, total = cur.fetchone()
+                line += f"  ({total - pending:,}/{total:,} embedded)"
+            print(line)
+    conn.commit()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Zero-downtime embedding model migration')
+    parser.add_argument('step', choices=['prepare', 'backfill', 'index', 'switch', 'all', 'rollback', 'cleanup', 'status'])
+    parser.add_argument('--model', choices=list(EMBEDDING_MODELS), help='Target model tag')
+    parser.add_argument('--batch-size', type=int, default=64, help='Chunks per backfill batch/transaction')
+    parser.add_argument('--rows-per-sec', type=float, default=0, help='Backfill rate limit (0 = unlimited)')
+    parser.add_argument('--pause-ms', type=float, default=0, help='Extra pause between backfill batches')
+    parser.add_argument('--max-active', type=int, default=0, help='Pause backfill while more backends than this are active')
+    parser.add_argument('--max-inline', type=int, default=50, help='Stragglers embedded under the switch lock')
+
+    args = parser.parse_args()
+
+    if args.step not in ('status', 'cleanup') and not args.model:
+        print("❌ --model is required for this step")
+        sys.exit(1)
+
+    print("🔀 Online embedding migration")
+    print("=" * 60)
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        if args.step in ('prepare', 'all'):
+            prepare(conn, args.model)
+        if args.step in ('backfill', 'all'):
+            backfill(conn, args.model, args.batch_size, args.rows_per_sec, args.pause_ms, args.max_active)
+        if args.step in ('index', 'all'):
+            build_indexes(conn, args.model)
+        if args.step in ('switch', 'all'):
+            if not switch(conn, args.model, args.max_inline):
+                sys.exit(1)
+        if args.step == 'rollback':
+            rollback(conn, args.model)
+        if args.step == 'cleanup':
+            cleanup(conn)
+        if args.step == 'status':
+            status(conn)
+    except Exception as e:
+        print(f"\n❌ Migration step failed: {e}")
+        import traceback
+        traceback.print_exc()
+        conn.rollback()
+        sys.exit(1)
+    finally:
+        conn.close()
@@ -2,17 +2,34 @@
 """
 Migrate database to support OpenAI embeddings (1536-dim)
 Updates schema from sentence-transformers 384-dim to OpenAI ada-002 1536-dim
+Rewrites the table and breaks search until reindexed; see migrate_embeddings_online.py for a zero-downtime switch
 """
 
 import psycopg2
 import os
+import sys
 from dotenv import load_dotenv
 
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from rag_schema import (
+    match_function_sql,
+    two_stage_match_function_sql,
+    binary_match_function_sql,
+    binary_index_sql,
+    parse_vector_index_kinds,
+    REFRESH_ALL_FILE_CENTROIDS_SQL,
+    DROP_CHUNK_EMBEDDINGS_SQL,
+)
+
 # Load environment variables
 load_dotenv('.env.local')
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Chunk vector indexes to rebuild: hnsw (default), binary or both
+VECTOR_INDEX_KINDS = parse_vector_index_kinds(os.getenv('RAG_VECTOR_INDEX', 'hnsw'))
+
 if not DATABASE_URL:
     print("❌ DATABASE_URL not found in .env.local")
     exit(1)
@@ -27,13 +44,17 @@ try:
 
     print("\n1️⃣ Dropping existing vector index...")
     cur.execute("DROP INDEX IF EXISTS markdown_chunks_embedding_idx;")
+    cur.execute("DROP INDEX IF EXISTS markdown_files_centroid_idx;")
+    cur.execute("DROP INDEX IF EXISTS markdown_chunks_embedding_bq_idx;")
     conn.commit()
     print("✅ Index dropped")
 
     print("\n2️⃣ Dropping existing match function...")
     cur.execute("DROP FUNCTION IF EXISTS match_markdown_chunks;")
+    # The narrow layout's copy keeps the old dimension
+    cur.execute(DROP_CHUNK_EMBEDDINGS_SQL)
     conn.commit()
-    print("✅ Function dropped")
+    print("✅ Function dropped (re-run setup_rag_database.py for RAG_EMBEDDING_LAYOUT=narrow)")
 
     print("\n3️⃣ Clearing existing embeddings...")
     cur.execute("UPDATE markdown_chunks SET embedding = NULL;")
@@ -46,53 +67,45 @@ try:
         ALTER COLUMN embedding TYPE vector(1536);
     """)
     conn.commit()
+    cur.execute("UPDATE markdown_files SET centroid_embedding = NULL;")
+    cur.execute("""
+        ALTER TABLE markdown_files
+        ALTER COLUMN centroid_embedding TYPE vector(1536);
+    """)
+    conn.commit()
     print("✅ Column altered to vector(1536)")
 
     print("\n5️⃣ Recreating vector similarity search function...")
-    cur.execute("""
-        CREATE OR REPLACE FUNCTION match_markdown_chunks(
-            query_embedding vector(1536),
-            match_threshold FLOAT DEFAULT 0.7,
-            match_count INT DEFAULT 10
-        )
-        RETURNS TABLE (
-            id UUID,
-            file_path TEXT,
-            chunk_index INTEGER,
-            chunk_text TEXT,
-            metadata JSONB,
-            similarity FLOAT
-        )
-        LANGUAGE plpgsql
-        AS $$
-        BEGIN
-            RETURN QUERY
-            SELECT
-                markdown_chunks.id,
-                markdown_chunks.file_path,
-                markdown_chunks.chunk_index,
-                markdown_chunks.chunk_text,
-                markdown_chunks.metadata,
-                1 - (markdown_chunks.embedding <=> query_embedding) AS similarity
-            FROM markdown_chunks
-            WHERE 1 - (markdown_chunks.embedding <=> query_embedding) > match_threshold
-            ORDER BY markdown_chunks.embedding <=> query_embedding
-            LIMIT match_count;
-        END;
-        $$;
-    """)
+    cur.execute(match_function_sql(1536))
+    cur.execute(two_stage_match_function_sql(1536))
+    cur.execute(binary_match_function_sql(1536))
     conn.commit()
     print("✅ match_markdown_chunks function created (1536-dim)")
 
     print("\n6️⃣ Recreating HNSW vector index...")
+    if 'hnsw' in VECTOR_INDEX_KINDS:
+        cur.execute("""
+            CREATE INDEX markdown_chunks_embedding_idx
+            ON markdown_chunks
+            USING hnsw (embedding vector_cosine_ops)
+            WITH (m = 16, ef_construction = 64);
+        """)
+        conn.commit()
+        print("✅ Vector similarity index created (HNSW)")
+    if 'binary' in VECTOR_INDEX_KINDS:
+        cur.execute(binary_index_sql(1536))
+        conn.commit()
+        print("✅ Binary-quantized vector index created (HNSW on bit(1536))")
+
+    cur.execute(REFRESH_ALL_FILE_CENTROIDS_SQL)
     cur.execute("""
-        CREATE INDEX markdown_chunks_embedding_idx
-        ON markdown_chunks
-        USING hnsw (embedding vector_cosine_ops)
+        CREATE INDEX markdown_files_centroid_idx
+        ON markdown_files
+        USING hnsw (centroid_embedding vector_cosine_ops)
         WITH (m = 16, ef_construction = 64);
     """)
     conn.commit()
-    print("✅ Vector similarity index created (HNSW)")
+    print("✅ File centroid index recreated (HNSW)")
 
     # Verify
     print("\n7️⃣ Verifying migration...")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Migrate to Vault-Partitioned Storage
+Converts a database set up before multi-vault support: adds vault_id to
+markdown_files and rebuilds markdown_chunks as a table list-partitioned by
+vault, assigning every existing row to --vault
+
+Runs in one transaction (the old table stays until the copy commits).
+Afterwards run setup_rag_database.py to create the indexes on every
+partition, the NOTIFY trigger and the vault-scoped search functions.
+
+    python migrate_to_vault_partitions.py --vault ./demo-vault
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+import psycopg2
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from rag_schema import CHUNKS_TABLE_SQL, VAULT_PARTITION_FUNCTION_SQL
+
+# Load environment variables
+load_dotenv('.env.local')
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+if not DATABASE_URL:
+    print("❌ DATABASE_URL not found in .env.local")
+    exit(1)
+
+LEGACY_TABLE = 'markdown_chunks_legacy'
+
+def relkind(cur, table: str):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);", (table,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def table_columns(cur, table: str) -> dict:
+    """{column: type} of stored (non-generated) columns, in table order"""
+    cur.execute("""
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum;
+    """, (table,))
+    return dict(cur.fetchall())
+
+def migrate_files(cur, vault_id: str):
+    """vault_id on markdown_files; file_path becomes unique per vault"""
+    cur.execute("""
+        ALTER TABLE markdown_files
+        ADD COLUMN IF NOT EXISTS vault_id UUID REFERENCES vault_configs(id) ON DELETE CASCADE;
+    """)
+    cur.execute("UPDATE markdown_files SET vault_id = %s WHERE vault_id IS NULL;", (vault_id,))
+    cur.execute("ALTER TABLE markdown_files ALTER COLUMN vault_id SET NOT NULL;")
+
+    # The old global UNIQUE (file_path)
+    cur.execute("""
+        SELECT conname
+        FROM pg_constraint
+        WHERE conrelid = 'markdown_files'::regclass AND contype = 'u'
+          AND conkey = ARRAY[(
+              SELECT attnum FROM pg_attribute
+              WHERE attrelid = 'markdown_files'::regclass AND attname = 'file_path'
+          )];
+    """)
+    for (name,) in cur.fetchall():
+        cur.execute(f'ALTER TABLE markdown_files DROP CONSTRAINT "{name}";')
+    cur.execute("""
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'markdown_files'::regclass AND conname = 'markdown_files_vault_id_file_path_key';
+    """)
+    if not cur.fetchone():
+        cur.execute("""
+            ALTER TABLE markdown_files
+            ADD CONSTRAINT markdown_files_vault_id_file_path_key UNIQUE (vault_id, file_path);
+        """)
+
+def migrate_chunks(cur, vault_id: str) -> int:
+    """Copy markdown_chunks into a partitioned table of the same name; returns rows copied"""
+    cur.execute(f"ALTER TABLE markdown_chunks RENAME TO {LEGACY_TABLE};")
+
+    # Index and constraint names live in the schema namespace: free them
+    # for the new table (the legacy table is dropped below anyway)
+    cur.execute("""
+        SELECT indexrelid::regclass::text
+        FROM pg_index
+        WHERE indrelid = %s::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = pg_index.indexrelid);
+    """, (LEGACY_TABLE,))
+    for (index_name,) in cur.fetchall():
+        cur.execute(f"DROP INDEX {index_name};")
+    cur.execute("""
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'x');
+    """, (LEGACY_TABLE,))
+    for (name,) in cur.fetchall():
+        cur.execute(f'ALTER TABLE {LEGACY_TABLE} RENAME CONSTRAINT "{name}" TO "{("legacy_" + name)[:63]}";')
+
+    cur.execute(CHUNKS_TABLE_SQL)
+    cur.execute(VAULT_PARTITION_FUNCTION_SQL)
+    cur.execute("SELECT ensure_vault_partition(id) FROM vault_configs;")
+
+    # Match the legacy vector dimension and carry over any extra columns
+    # (e.g. shadow columns of an embedding migration in progress)
+    legacy = table_columns(cur, LEGACY_TABLE)
+    current = table_columns(cur, 'markdown_chunks')
+    for column, column_type in legacy.items():
+        if column not in current:
+            cur.execute(f'ALTER TABLE markdown_chunks ADD COLUMN "{column}" {column_type};')
+        elif current[column] != column_type and column_type.startswith('vector'):
+            cur.execute(f'ALTER TABLE markdown_chunks ALTER COLUMN "{column}" TYPE {column_type};')
+
+    columns = [column for column in legacy if column != 'vault_id']
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    cur.execute(f"""
+        INSERT INTO markdown_chunks (vault_id, {column_list})
+        SELECT %s, {column_list}
+        FROM {LEGACY_TABLE};
+    """, (vault_id,))
+    copied = cur.rowcount
+    cur.execute(f"DROP TABLE {LEGACY_TABLE};")
+    return copied
+
+def main(vault_path: str):
+    print("🗂️  Migrating to vault-partitioned storage...")
+    print("=" * 60)
+    print(f"Existing rows belong to: {vault_path}")
+
+    conn = psycopg2.connect(DATABASE_URL)
+    cur = conn.cursor()
+    try:
+        kind = relkind(cur, 'markdown_chunks')
+        if kind == 'p':
+            print("✅ markdown_chunks is already partitioned by vault; nothing to do")
+            return
+        if kind is None:
+            print("❌ markdown_chunks does not exist; run setup_rag_database.py instead")
+            exit(1)
+
+        print("\n1️⃣ Registering vault...")
+        cur.execute("""
+            INSERT INTO vault_configs (vault_path, settings)
+            VALUES (%s, '{}')
+            ON CONFLICT (vault_path) DO UPDATE SET updated_at = NOW()
+            RETURNING id;
+        """, (vault_path,))
+        vault_id = str(cur.fetchone()[0])
+        print(f"✅ Vault ID: {vault_id}")
+
+        print("\n2️⃣ Locking tables...")
+        cur.execute("SET LOCAL lock_timeout = '10s';")
+        cur.execute("LOCK TABLE markdown_chunks, markdown_files IN ACCESS EXCLUSIVE MODE;")
+        print("✅ Locked (writers wait until the migration commits)")
+
+        print("\n3️⃣ Adding vault_id to markdown_files...")
+        migrate_files(cur, vault_id)
+        print("✅ markdown_files: vault_id NOT NULL, UNIQUE (vault_id, file_path)")
+
+        print("\n4️⃣ Copying chunks into the partitioned table...")
+        started = time.time()
+        copied = migrate_chunks(cur, vault_id)
+        print(f"✅ {copied:,} chunks copied in {time.time() - started:.1f}s")
+
+        conn.commit()
+
+        cur.execute("ANALYZE markdown_chunks;")
+        cur.execute("ANALYZE markdown_files;")
+        conn.commit()
+
+        print("\n" + "=" * 60)
+        print("🎉 MIGRATION COMPLETE!")
+        print("=" * 60)
+        print("\n👉 Next: python3 setup_rag_database.py")
+        print("   (creates the vector and filter indexes on every partition, the")
+        print("    pending-embedding trigger and the vault-scoped search functions)")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Migration failed (nothing was changed): {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
+    finally:
+        cur.close()
+        conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Partition markdown_chunks by vault')
+    parser.add_argument('--vault', default='./demo-vault', help='Vault the existing rows were indexed from')
+
+    args = parser.parse_args()
+
+    main(os.path.abspath(args.vault))
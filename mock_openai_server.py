@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Mock OpenAI Embeddings Server
+OpenAI-compatible POST /v1/embeddings returning deterministic hash-derived
+vectors, with configurable latency, 429s, 5xx errors and rate-limit headers
+
+    python mock_openai_server.py --port 8089 --latency-ms 80 --rpm 3000 --error-rate-5xx 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=mock python index_full_vault_openai.py
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from mock_embeddings import hash_embedding
+
+# Default output size per model (the `dimensions` request field overrides it)
+MODEL_DIMENSIONS = {
+    'text-embedding-ada-002': 1536,
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+}
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token, good enough for usage and TPM accounting"""
+    return max(1, len(text) // 4)
+
+class RateLimiter:
+    """Sliding 60-second window over requests and tokens"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.lock = threading.Lock()
+        self.events = deque()
+        self.tokens_in_window = 0
+
+    def _expire(self, now: float):
+        while self.events and now - self.events[0][0] >= 60:
+            _, tokens = self.events.popleft()
+            self.tokens_in_window -= tokens
+
+    def acquire(self, tokens: int) -> tuple:
+        """Returns (allowed, headers)"""
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            over_requests = self.rpm and len(self.events) + 1 > self.rpm
+            over_tokens = self.tpm and self.tokens_in_window + tokens > self.tpm
+            allowed = not (over_requests or over_tokens)
+            if allowed:
+                self.events.append((now, tokens))
+                self.tokens_in_window += tokens
+
+            reset = 60 - (now - self.events[0][0]) if self.events else 0.0
+            headers = {}
+            if self.rpm:
+                headers['x-ratelimit-limit-requests'] = str(self.rpm)
+                headers['x-ratelimit-remaining-requests'] = str(max(0, self.rpm - len(self.events)))
+                headers['x-ratelimit-reset-requests'] = f"{reset:.3f}s"
+            if self.tpm:
+                headers['x-ratelimit-limit-tokens'] = str(self.tpm)
+                headers['x-ratelimit-remaining-tokens'] = str(max(0, self.tpm - self.tokens_in_window))
+                headers['x-ratelimit-reset-tokens'] = f"{reset:.3f}s"
+            if not allowed:
+                headers['retry-after'] = str(max(1, int(reset + 0.999)))
+            return allowed, headers
+
+class MockState:
+    """Server configuration, fault injection RNG and counters"""
+
+    def __init__(self, args):
+        self.args = args
+        self.limiter = RateLimiter(args.rpm, args.tpm)
+        self.rng = random.Random(args.seed)
+        self.rng_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'inputs': 0, 'tokens': 0, 'ok': 0, '429_rate_limit': 0, '429_injected': 0, '5xx_injected': 0, '4xx': 0}
+
+    def random(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+    def count(self, key: str, amount: int = 1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+def make_handler(state: MockState):
+    args = state.args
+
+    class EmbeddingsHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _error(self, status: int, message: str, error_type: str, headers: dict = None):
+            self._send(status, {'error': {'message': message, 'type': error_type, 'param': None, 'code': None}}, headers)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                with state.stats_lock:
+                    self._send(200, dict(state.stats))
+            elif self.path == '/healthz':
+                self._send(200, {'ok': True})
+            else:
+                self._error(404, 'Not found', 'invalid_request_error')
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', '0'))
+            raw = self.rfile.read(length)
+            state.count('requests')
+
+            if self.path not in ('/v1/embeddings', '/embeddings'):
+                state.count('4xx')
+                self._error(404, 'Not found', 'invalid_request_error')
+                return
+
+            if args.require_key and not self.headers.get('Authorization', '').startswith('Bearer '):
+                state.count('4xx')
+                self._error(401, 'Missing API key', 'invalid_request_error')
+                return
+
+            try:
+                body = json.loads(raw or b'{}')
+                inputs = body['input']
+            except (ValueError, KeyError):
+                state.count('4xx')
+                self._error(400, "'input' is required", 'invalid_request_error')
+                return
+
+            if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            # Token-id inputs are hashed by their text form
+            texts = [item if isinstance(item, str) else json.dumps(item) for item in inputs]
+            model = body.get('model', 'text-embedding-ada-002')
+            dimensions = int(body.get('dimensions') or MODEL_DIMENSIONS.get(model, args.dimensions))
+            tokens = sum(estimate_tokens(text) for text in texts)
+
+            allowed, headers = state.limiter.acquire(tokens)
+            if not allowed:
+                state.count('429_rate_limit')
+                self._error(429, 'Rate limit reached for requests', 'requests', headers)
+                return
+
+            roll = state.random()
+            if roll < args.error_rate_429:
+                state.count('429_injected')
+                self._error(429, 'Rate limit reached (injected)', 'requests', dict(headers, **{'retry-after': '1'}))
+                return
+            if roll < args.error_rate_429 + args.error_rate_5xx:
+                state.count('5xx_injected')
+                status = 500 if state.random() < 0.5 else 503
+                self._error(status, 'The server had an error while processing your request (injected)', 'server_error', headers)
+                return
+
+            delay_ms = args.latency_ms + args.ms_per_1k_tokens * tokens / 1000
+            if args.latency_jitter_ms:
+                delay_ms += state.random() * args.latency_jitter_ms
+            if delay_ms > 0:
+                time.sleep(delay_ms / 1000)
+
+            data = []
+            for index, text in enumerate(texts):
+                vector = hash_embedding(text, dimensions)
+                if body.get('encoding_format') == 'base64':
+                    embedding = base64.b64encode(vector.astype('<f4').tobytes()).decode('ascii')
+                else:
+                    embedding = vector.tolist()
+                data.append({'object': 'embedding', 'index': index, 'embedding': embedding})
+
+            state.count('ok')
+            state.count('inputs', len(texts))
+            state.count('tokens', tokens)
+            self._send(200, {
+                'object': 'list',
+                'data': data,
+                'model': model,
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}
+            }, headers)
+
+        def log_message(self, format, *args):
+            if state.args.verbose:
+                sys.stderr.write("%s - %s\n" % (self.address_string(), format % args))
+
+    return EmbeddingsHandler
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock OpenAI embeddings server for offline load tests')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address')
+    parser.add_argument('--port', type=int, default=8089, help='Port')
+    parser.add_argument('--dimensions', type=int, default=1536, help='Dimensions for unknown models')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Fixed latency per request')
+    parser.add_argument('--latency-jitter-ms', type=float, default=0.0, help='Uniform extra latency up to this value')
+    parser.add_argument('--ms-per-1k-tokens', type=float, default=0.0, help='Latency proportional to input size')
+    parser.add_argument('--rpm', type=int, default=0, help='Requests per minute before 429 (0 = unlimited)')
+    parser.add_argument('--tpm', type=int, default=0, help='Tokens per minute before 429 (0 = unlimited)')
+    parser.add_argument('--error-rate-429', type=float, default=0.0, help='Fraction of requests failed with an injected 429')
+    parser.add_argument('--error-rate-5xx', type=float, default=0.0, help='Fraction of requests failed with 500/503')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for fault injection')
+    parser.add_argument('--require-key', action='store_true', help='Reject requests without a Bearer token')
+    parser.add_argument('--verbose', action='store_true', help='Log every request to stderr')
+
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(MockState(args)))
+    print(f"🧪 Mock OpenAI embeddings on http://{args.host}:{args.port}/v1 (GET /stats for counters)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
@@ -3,86 +3,591 @@
 RAG Search Script
 Performs semantic search on indexed markdown chunks
 Called by Next.js API to get relevant context
+
+Every response carries per-stage timings (timings_ms). Run with --serve
+to keep the model warm behind a small HTTP service that also exposes
+Prometheus metrics at /metrics.
 """
 
 import sys
 import json
 import os
+import time
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 import psycopg2
+import psycopg2.pool
+from psycopg2.errors import UndefinedFunction
 from sentence_transformers import SentenceTransformer
 
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from search_metrics import METRICS, StageTimer, record_search, summarize_explain, parse_auto_explain_notices
+
 # Load environment
 load_dotenv('.env.local')
 DATABASE_URL = os.getenv('DATABASE_URL')
 
-if not DATABASE_URL:
+# "postgres" (pgvector) or "local" (memory-mapped index from export_local_index.py)
+RAG_BACKEND = os.getenv('RAG_BACKEND', 'postgres')
+RAG_LOCAL_INDEX = os.getenv('RAG_LOCAL_INDEX', './local-index')
+# "flat" (exact) or "ivfpq" (compressed index from build_pq_index.py)
+RAG_LOCAL_ANN = os.getenv('RAG_LOCAL_ANN', 'flat')
+
+# Re-run queries slower than this with EXPLAIN (ANALYZE, BUFFERS); 0 disables
+RAG_EXPLAIN_SLOW_MS = float(os.getenv('RAG_EXPLAIN_SLOW_MS', '0'))
+# Query embeddings kept in memory (useful in --serve mode)
+RAG_EMBEDDING_CACHE_SIZE = int(os.getenv('RAG_EMBEDDING_CACHE_SIZE', '256'))
+# Append each search's result files here (JSON lines) so the indexers can
+# prioritize frequently retrieved notes (lib/index_priority.py); unset disables
+RAG_SEARCH_LOG = os.getenv('RAG_SEARCH_LOG')
+# "narrow": unfiltered vector searches rank chunk_embeddings and fetch text
+# for the top-k only (set up by setup_rag_database.py with the same variable)
+RAG_EMBEDDING_LAYOUT = os.getenv('RAG_EMBEDDING_LAYOUT', 'wide')
+# While narrow_match_markdown_chunks() is missing (dropped by an embedding
+# migration until setup is re-run) searches use match_markdown_chunks()
+# and look for it again after this many seconds
+NARROW_LAYOUT_RETRY_SECONDS = 60
+narrow_layout_retry_at = 0.0
+
+if RAG_BACKEND != 'local' and not DATABASE_URL:
     print(json.dumps({"error": "DATABASE_URL not found"}), flush=True)
     sys.exit(1)
 
 # Initialize model (cached after first load)
 model = SentenceTransformer('all-MiniLM-L6-v2')
+model_lock = threading.Lock()
+
+# Query embedding LRU cache
+embedding_cache = OrderedDict()
+embedding_cache_lock = threading.Lock()
+
+# Connection pool (one connection for the CLI, shared by --serve threads)
+connection_pool = None
+connection_pool_lock = threading.Lock()
+
+search_log_lock = threading.Lock()
+
+def get_connection():
+    """Borrow a database connection from the process pool"""
+    global connection_pool
+    with connection_pool_lock:
+        if connection_pool is None:
+            connection_pool = psycopg2.pool.ThreadedConnectionPool(
+                1, int(os.getenv('RAG_POOL_SIZE', '4')), DATABASE_URL
+            )
+    return connection_pool.getconn()
+
+def release_connection(conn):
+    """End the connection's transaction (resets SET LOCAL tuning) and return it"""
+    try:
+        conn.rollback()
+    finally:
+        connection_pool.putconn(conn)
+
+# Cross-encoder re-ranker (loaded on first use when RAG_RERANK=1)
+loaded_reranker = None
+reranker_lock = threading.Lock()
+
+def get_reranker():
+    """Load the cross-encoder once per process (it serializes its own model calls)"""
+    global loaded_reranker
+    with reranker_lock:
+        if loaded_reranker is None:
+            from reranking import CrossEncoderReranker
+            loaded_reranker = CrossEncoderReranker(
+                os.getenv('RAG_RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+            )
+    return loaded_reranker
+
+# Local index (opened on first use, memory-mapped)
+loaded_local_index = None
+local_index_lock = threading.Lock()
+
+def get_local_index():
+    """Open the local memory-mapped index once per process"""
+    global loaded_local_index
+    with local_index_lock:
+        if loaded_local_index is None:
+            if RAG_LOCAL_ANN == 'ivfpq':
+                from pq_index import IVFPQIndex
+                loaded_local_index = IVFPQIndex(RAG_LOCAL_INDEX)
+            else:
+                from local_index import LocalIndex
+                loaded_local_index = LocalIndex(RAG_LOCAL_INDEX)
+    return loaded_local_index
+
+def encode_query(query: str, timer: StageTimer):
+    """Embed the query, using the in-process LRU cache when possible"""
+    with timer.stage('encode'):
+        with embedding_cache_lock:
+            cached = embedding_cache.get(query)
+            if cached is not None:
+                embedding_cache.move_to_end(query)
+        if cached is not None:
+            METRICS.inc('rag_search_cache_requests_total', cache='query_embedding', result='hit')
+            return cached
+
+        METRICS.inc('rag_search_cache_requests_total', cache='query_embedding', result='miss')
+        with model_lock:
+            embedding = model.encode(query, convert_to_tensor=False)
+
+        if RAG_EMBEDDING_CACHE_SIZE > 0:
+            with embedding_cache_lock:
+                embedding_cache[query] = embedding
+                while len(embedding_cache) > RAG_EMBEDDING_CACHE_SIZE:
+                    embedding_cache.popitem(last=False)
+        return embedding
+
+# Session settings that make auto_explain return the plans of the statements
+# run inside the search functions as NOTICEs (EXPLAIN of the call itself
+# stops at a Function Scan)
+AUTO_EXPLAIN_SETTINGS = (
+    ('auto_explain.log_min_duration', '0'),
+    ('auto_explain.log_analyze', 'on'),
+    ('auto_explain.log_buffers', 'on'),
+    ('auto_explain.log_nested_statements', 'on'),
+    ('auto_explain.log_format', 'json'),
+    ('auto_explain.log_level', 'notice'),
+)
+# None until the first capture tries LOAD 'auto_explain'
+auto_explain_available = None
+
+def enable_nested_explain(cur) -> bool:
+    """
+    Turn on auto_explain for the rest of this transaction
+
+    LOAD needs superuser (or auto_explain in session_preload_libraries);
+    when refused, captures go on without nested plans and rows_scanned is
+    left out.
+    """
+    global auto_explain_available
+    if auto_explain_available is False:
+        return False
+    cur.execute("SAVEPOINT auto_explain;")
+    try:
+        cur.execute("LOAD 'auto_explain';")
+        for name, value in AUTO_EXPLAIN_SETTINGS:
+            cur.execute("SELECT set_config(%s, %s, true);", (name, value))
+    except psycopg2.Error:
+        cur.execute("ROLLBACK TO SAVEPOINT auto_explain;")
+        auto_explain_available = False
+        return False
+    cur.execute("RELEASE SAVEPOINT auto_explain;")
+    auto_explain_available = True
+    return True
+
+def execute_search(sql: str, params: tuple, timer: StageTimer):
+    """
+    Run one search query with connect/query/fetch timings
 
-def search_chunks(query: str, match_count: int = 10, threshold: float = 0.3):
+    Queries slower than RAG_EXPLAIN_SLOW_MS are re-run once with
+    EXPLAIN (ANALYZE, BUFFERS) on the same connection, with auto_explain
+    capturing the plans inside the search function when the server allows
+    it; the summary is returned alongside the rows and folded into the
+    metrics.
+    """
+    with timer.stage('connect'):
+        conn = get_connection()
+    try:
+        cur = conn.cursor()
+        with timer.stage('query'):
+            cur.execute(sql, params)
+        with timer.stage('fetch'):
+            rows = cur.fetchall()
+
+        explain = None
+        if RAG_EXPLAIN_SLOW_MS > 0 and timer.timings.get('query', 0) > RAG_EXPLAIN_SLOW_MS:
+            METRICS.inc('rag_search_slow_queries_total')
+            with timer.stage('explain'):
+                nested = enable_nested_explain(cur)
+                del conn.notices[:]
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql.strip().rstrip(';'), params)
+                plan = cur.fetchone()[0]
+                nested_plans = parse_auto_explain_notices(conn.notices) if nested else []
+            explain = summarize_explain(plan, nested_plans)
+            explain['plan'] = plan
+            if nested_plans:
+                explain['nested_plans'] = nested_plans
+            METRICS.inc('rag_search_pg_buffers_total', explain['shared_hit_blocks'], kind='hit')
+            METRICS.inc('rag_search_pg_buffers_total', explain['shared_read_blocks'], kind='read')
+            print(json.dumps({
+                "slow_query_ms": round(timer.timings['query'], 3),
+                "explain": {key: value for key, value in explain.items() if key not in ('plan', 'nested_plans')}
+            }), file=sys.stderr, flush=True)
+
+        cur.close()
+        return rows, explain
+    finally:
+        release_connection(conn)
+
+def format_chunk_rows(rows) -> list:
+    """Convert (id, file_path, chunk_index, chunk_text, metadata, similarity, vault_id[, rrf_score]) rows to dicts"""
+    chunks = []
+    for row in rows:
+        chunk = {
+            "id": str(row[0]),
+            "vault_id": str(row[6]),
+            "file_path": row[1],
+            "chunk_index": row[2],
+            "chunk_text": row[3],
+            "metadata": row[4],
+            "similarity": float(row[5]) if row[5] is not None else None
+        }
+        if len(row) > 7:
+            chunk["rrf_score"] = float(row[7])
+        chunks.append(chunk)
+    return chunks
+
+def search_result(query: str, mode: str, rows, explain, timer: StageTimer) -> dict:
+    """Shape a successful search response"""
+    with timer.stage('format'):
+        chunks = format_chunk_rows(rows)
+
+    result = {
+        "success": True,
+        "query": query,
+        "mode": mode,
+        "chunks": chunks,
+        "count": len(chunks)
+    }
+    if explain is not None:
+        result["explain"] = explain
+        if explain["rows_examined"] is not None:
+            result["rows_scanned"] = int(explain["rows_examined"])
+    return result
+
+def search_chunks(
+    query: str,
+    match_count: int = 10,
+    threshold: float = 0.3,
+    folder: str = None,
+    tags: list = None,
+    section_type: str = None,
+    modified_after: str = None,
+    vault_id: str = None,
+    timer: StageTimer = None
+):
     """
     Search for relevant markdown chunks using semantic similarity
 
+    Filters are pushed down into match_markdown_chunks(), so scoped
+    searches still return up to match_count rows. Unfiltered searches use
+    narrow_match_markdown_chunks() with RAG_EMBEDDING_LAYOUT=narrow, and
+    fall back to match_markdown_chunks() while that function is missing.
+
     Args:
         query: User's search query
         match_count: Maximum number of chunks to return
         threshold: Minimum similarity threshold (0.0 to 1.0)
+        folder: Only search files under this vault folder (e.g. "product-logs")
+        tags: Only search files whose frontmatter has all of these tags
+        section_type: Only search chunks of this type ("complete_section"/"partial_section")
+        modified_after: Only search files modified after this ISO timestamp
+        vault_id: Only search this vault (vault_configs.id); scans just its partition
+        timer: Optional StageTimer collecting per-stage timings
 
     Returns:
         List of matching chunks with metadata
     """
+    global narrow_layout_retry_at
+    timer = timer or StageTimer()
     try:
         # Generate query embedding
-        query_embedding = model.encode(query, convert_to_tensor=False).tolist()
+        query_embedding = encode_query(query, timer).tolist()
 
-        # Connect to database
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
+        if (RAG_EMBEDDING_LAYOUT == 'narrow' and not (folder or tags or section_type or modified_after)
+                and time.monotonic() >= narrow_layout_retry_at):
+            try:
+                rows, explain = execute_search("""
+                    SELECT
+                        id,
+                        file_path,
+                        chunk_index,
+                        chunk_text,
+                        metadata,
+                        similarity,
+                        vault_id
+                    FROM narrow_match_markdown_chunks(
+                        %s::vector,
+                        %s,
+                        %s,
+                        %s::uuid
+                    );
+                """, (query_embedding, threshold, match_count, vault_id or None), timer)
+                return search_result(query, "vector", rows, explain, timer)
+            except UndefinedFunction:
+                narrow_layout_retry_at = time.monotonic() + NARROW_LAYOUT_RETRY_SECONDS
+                print(json.dumps({
+                    "warning": "narrow_match_markdown_chunks() missing; using match_markdown_chunks() "
+                               "(re-run setup_rag_database.py with RAG_EMBEDDING_LAYOUT=narrow)"
+                }), file=sys.stderr, flush=True)
 
         # Call vector similarity function
-        cur.execute("""
+        rows, explain = execute_search("""
             SELECT
                 id,
                 file_path,
                 chunk_index,
                 chunk_text,
                 metadata,
-                similarity
+                similarity,
+                vault_id
             FROM match_markdown_chunks(
                 %s::vector,
                 %s,
-                %s
+                %s,
+                %s,
+                %s::text[],
+                %s,
+                %s::timestamptz,
+                %s::uuid
             )
             ORDER BY similarity DESC;
-        """, (query_embedding, threshold, match_count))
-
-        results = cur.fetchall()
-
-        # Format results
-        chunks = []
-        for row in results:
-            chunks.append({
-                "id": str(row[0]),
-                "file_path": row[1],
-                "chunk_index": row[2],
-                "chunk_text": row[3],
-                "metadata": row[4],
-                "similarity": float(row[5])
-            })
+        """, (
+            query_embedding,
+            threshold,
+            match_count,
+            folder or None,
+            tags or None,
+            section_type or None,
+            modified_after or None,
+            vault_id or None
+        ), timer)
 
-        cur.close()
-        conn.close()
+        return search_result(query, "vector", rows, explain, timer)
 
+    except Exception as e:
         return {
+            "success": False,
+            "error": str(e),
+            "query": query
+        }
+
+def hybrid_search_chunks(
+    query: str,
+    match_count: int = 10,
+    full_text_weight: float = 1.0,
+    semantic_weight: float = 1.0,
+    rrf_k: int = 60,
+    vault_id: str = None,
+    timer: StageTimer = None
+):
+    """
+    Search using full-text and vector similarity fused with reciprocal rank fusion
+
+    Exact terms (ticket IDs, error codes, product names) are matched by the
+    search_tsv GIN index, while paraphrases are matched by the vector index.
+    Both candidate lists are fused inside hybrid_match_markdown_chunks().
+
+    Args:
+        query: User's search query
+        match_count: Maximum number of chunks to return
+        full_text_weight: RRF weight of the full-text ranking
+        semantic_weight: RRF weight of the vector ranking
+        rrf_k: RRF smoothing constant (higher flattens rank differences)
+        vault_id: Only search this vault (vault_configs.id)
+        timer: Optional StageTimer collecting per-stage timings
+
+    Returns:
+        List of matching chunks with metadata and rrf_score
+    """
+    timer = timer or StageTimer()
+    try:
+        query_embedding = encode_query(query, timer).tolist()
+
+        rows, explain = execute_search("""
+            SELECT
+                id,
+                file_path,
+                chunk_index,
+                chunk_text,
+                metadata,
+                similarity,
+                vault_id,
+                rrf_score
+            FROM hybrid_match_markdown_chunks(
+                %s,
+                %s::vector,
+                %s,
+                %s,
+                %s,
+                %s,
+                %s::uuid
+            );
+        """, (query, query_embedding, match_count, full_text_weight, semantic_weight, rrf_k, vault_id or None), timer)
+
+        return search_result(query, "hybrid", rows, explain, timer)
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "query": query
+        }
+
+def two_stage_search_chunks(
+    query: str,
+    match_count: int = 10,
+    threshold: float = 0.3,
+    file_count: int = 20,
+    vault_id: str = None,
+    timer: StageTimer = None
+):
+    """
+    Coarse-to-fine search: pick the top files by centroid embedding, then
+    rank only the chunks of those files
+
+    Args:
+        query: User's search query
+        match_count: Maximum number of chunks to return
+        threshold: Minimum similarity threshold (0.0 to 1.0)
+        file_count: Number of files kept by the coarse stage
+        vault_id: Only search this vault (vault_configs.id)
+        timer: Optional StageTimer collecting per-stage timings
+
+    Returns:
+        List of matching chunks with metadata
+    """
+    timer = timer or StageTimer()
+    try:
+        query_embedding = encode_query(query, timer).tolist()
+
+        rows, explain = execute_search("""
+            SELECT
+                id,
+                file_path,
+                chunk_index,
+                chunk_text,
+                metadata,
+                similarity,
+                vault_id
+            FROM two_stage_match_markdown_chunks(
+                %s::vector,
+                %s,
+                %s,
+                %s,
+                %s::uuid
+            );
+        """, (query_embedding, threshold, match_count, file_count, vault_id or None), timer)
+
+        return search_result(query, "two_stage", rows, explain, timer)
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "query": query
+        }
+
+def binary_search_chunks(
+    query: str,
+    match_count: int = 10,
+    threshold: float = 0.3,
+    candidate_multiplier: int = 10,
+    vault_id: str = None,
+    timer: StageTimer = None
+):
+    """
+    Binary-quantized first pass (Hamming distance on the bit index), then
+    exact cosine re-ranking of the candidates
+
+    Args:
+        query: User's search query
+        match_count: Maximum number of chunks to return
+        threshold: Minimum similarity threshold (0.0 to 1.0)
+        candidate_multiplier: Candidates re-ranked per returned chunk
+        vault_id: Only search this vault (vault_configs.id)
+        timer: Optional StageTimer collecting per-stage timings
+
+    Returns:
+        List of matching chunks with metadata
+    """
+    timer = timer or StageTimer()
+    try:
+        query_embedding = encode_query(query, timer).tolist()
+
+        rows, explain = execute_search("""
+            SELECT
+                id,
+                file_path,
+                chunk_index,
+                chunk_text,
+                metadata,
+                similarity,
+                vault_id
+            FROM binary_match_markdown_chunks(
+                %s::vector,
+                %s,
+                %s,
+                %s,
+                %s::uuid
+            );
+        """, (query_embedding, threshold, match_count, candidate_multiplier, vault_id or None), timer)
+
+        return search_result(query, "binary", rows, explain, timer)
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "query": query
+        }
+
+def local_search_chunks(
+    query: str,
+    match_count: int = 10,
+    threshold: float = 0.3,
+    timer: StageTimer = None
+):
+    """
+    Search the local memory-mapped index (no database required)
+
+    Exact cosine top-k, so results match match_markdown_chunks() on the
+    same data (up to float16 rounding if exported with --dtype float16).
+    With RAG_LOCAL_ANN=ivfpq, candidates come from the compressed IVF-PQ
+    index and are re-ranked against the exact vectors.
+
+    Args:
+        query: User's search query
+        match_count: Maximum number of chunks to return
+        threshold: Minimum similarity threshold (0.0 to 1.0)
+        timer: Optional StageTimer collecting per-stage timings
+
+    Returns:
+        List of matching chunks with metadata
+    """
+    timer = timer or StageTimer()
+    try:
+        query_embedding = encode_query(query, timer)
+
+        with timer.stage('load_index'):
+            index = get_local_index()
+
+        with timer.stage('query'):
+            if RAG_LOCAL_ANN == 'ivfpq':
+                chunks = index.search(
+                    query_embedding,
+                    match_count,
+                    threshold,
+                    nprobe=int(os.getenv('RAG_NPROBE', '16')),
+                    rerank=int(os.getenv('RAG_RERANK_CANDIDATES', '100'))
+                )
+            else:
+                chunks = index.search(query_embedding, match_count, threshold)
+
+        result = {
             "success": True,
             "query": query,
+            "backend": "local",
+            "ann": RAG_LOCAL_ANN,
             "chunks": chunks,
             "count": len(chunks)
         }
+        if RAG_LOCAL_ANN != 'ivfpq':
+            result["rows_scanned"] = len(index)
+        return result
 
     except Exception as e:
         return {
@@ -91,7 +596,333 @@ def search_chunks(query: str, match_count: int = 10, threshold: float = 0.3):
             "query": query
         }
 
+def diversify_chunks(result: dict, match_count: int, lambda_mult: float = 0.5, timer: StageTimer = None) -> dict:
+    """
+    Maximal-marginal-relevance diversification of over-fetched results
+
+    Fetches the candidates' embeddings in one query and keeps match_count
+    chunks that are relevant but not near-duplicates of each other (e.g. the
+    same paragraph copied between monthly notes).
+    """
+    from reranking import parse_vectors, mmr_select
+    import numpy as np
+
+    timer = timer or StageTimer()
+    chunks = result.get("chunks") or []
+    if len(chunks) <= match_count:
+        return result
+
+    with timer.stage('mmr_fetch'):
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id::text, embedding::text
+                FROM markdown_chunks
+                WHERE id = ANY(%s::uuid[]);
+            """, ([chunk["id"] for chunk in chunks],))
+            vectors_by_id = dict(cur.fetchall())
+            cur.close()
+        finally:
+            release_connection(conn)
+
+    with timer.stage('mmr'):
+        candidates = [chunk for chunk in chunks if vectors_by_id.get(chunk["id"])]
+        embeddings = parse_vectors([vectors_by_id[chunk["id"]] for chunk in candidates])
+        relevance = np.array([chunk["similarity"] or 0.0 for chunk in candidates], dtype=np.float32)
+
+        selected = mmr_select(relevance, embeddings, match_count, lambda_mult)
+
+    result["chunks"] = [candidates[i] for i in selected]
+    result["count"] = len(result["chunks"])
+    result["mmr"] = {"candidates": len(candidates), "lambda": lambda_mult}
+    return result
+
+def options_from_env() -> dict:
+    """Default search options from RAG_* environment variables"""
+    return {
+        "match_count": int(os.getenv('RAG_MATCH_COUNT', '10')),
+        "threshold": float(os.getenv('RAG_THRESHOLD', '0.3')),
+        "mode": os.getenv('RAG_MODE', 'vector'),
+        "folder": os.getenv('RAG_FOLDER'),
+        "vault_id": os.getenv('RAG_VAULT_ID'),
+        "tags": [tag.strip().lower() for tag in os.getenv('RAG_TAGS', '').split(',') if tag.strip()],
+        "section_type": os.getenv('RAG_SECTION_TYPE'),
+        "modified_after": os.getenv('RAG_MODIFIED_AFTER'),
+        "full_text_weight": float(os.getenv('RAG_FULL_TEXT_WEIGHT', '1.0')),
+        "semantic_weight": float(os.getenv('RAG_SEMANTIC_WEIGHT', '1.0')),
+        "rrf_k": int(os.getenv('RAG_RRF_K', '60')),
+        "file_count": int(os.getenv('RAG_FILE_COUNT', '20')),
+        "candidate_multiplier": int(os.getenv('RAG_CANDIDATE_MULTIPLIER', '10')),
+        "mmr": os.getenv('RAG_MMR', '0') == '1',
+        "mmr_fetch_multiplier": int(os.getenv('RAG_MMR_FETCH_MULTIPLIER', '4')),
+        "mmr_lambda": float(os.getenv('RAG_MMR_LAMBDA', '0.5')),
+        "rerank": os.getenv('RAG_RERANK', '0') == '1',
+        "rerank_top_n": int(os.getenv('RAG_RERANK_TOP_N', '30')),
+        "rerank_batch_size": int(os.getenv('RAG_RERANK_BATCH_SIZE', '16')),
+        "rerank_budget_ms": float(os.getenv('RAG_RERANK_BUDGET_MS', '150')),
+        "context_tokens": int(os.getenv('RAG_CONTEXT_TOKENS', '0')),
+        "context_max_gap": int(os.getenv('RAG_CONTEXT_MAX_GAP', '1')),
+    }
+
+def coerce_option(name: str, value, default):
+    """Coerce a request option to the type of its default; raises ValueError"""
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ValueError(f"{name} must be true or false")
+        return value
+    if isinstance(default, (int, float)):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"{name} must be a number")
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a number")
+        if isinstance(default, float):
+            return number
+        if not number.is_integer():
+            raise ValueError(f"{name} must be an integer")
+        return int(number)
+    if isinstance(default, list):
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{name} must be a list of strings")
+        return [item.strip().lower() for item in value if item.strip()]
+    # Strings; filters that default to None may be null
+    if not isinstance(value, str) and not (default is None and value is None):
+        raise ValueError(f"{name} must be a string")
+    return value
+
+def options_from_request(defaults: dict, body: dict) -> dict:
+    """Defaults overridden by a request body's recognized options; raises ValueError"""
+    options = dict(defaults)
+    for key, value in body.items():
+        if key in defaults:
+            options[key] = coerce_option(key, value, defaults[key])
+    return options
+
+def run_search(query: str, options: dict) -> dict:
+    """
+    Full search pipeline: retrieve, optionally re-rank, diversify and
+    assemble context, with timings and metrics for every stage
+    """
+    timer = StageTimer()
+    mode = options["mode"] if RAG_BACKEND != 'local' else 'local'
+    match_count = options["match_count"]
+    threshold = options["threshold"]
+
+    # MMR diversification: over-fetch, then keep a diverse match_count
+    use_mmr = options["mmr"] and RAG_BACKEND != 'local'
+    # Cross-encoder re-ranking of the top-N candidates
+    use_rerank = options["rerank"]
+    final_count = match_count
+    if use_mmr:
+        match_count = match_count * options["mmr_fetch_multiplier"]
+    if use_rerank:
+        match_count = max(match_count, options["rerank_top_n"])
+
+    # Perform search
+    if RAG_BACKEND == 'local':
+        result = local_search_chunks(query, match_count, threshold, timer=timer)
+    elif mode == 'hybrid':
+        result = hybrid_search_chunks(
+            query,
+            match_count,
+            full_text_weight=options["full_text_weight"],
+            semantic_weight=options["semantic_weight"],
+            rrf_k=options["rrf_k"],
+            vault_id=options["vault_id"],
+            timer=timer
+        )
+    elif mode == 'two_stage':
+        result = two_stage_search_chunks(
+            query,
+            match_count,
+            threshold,
+            file_count=options["file_count"],
+            vault_id=options["vault_id"],
+            timer=timer
+        )
+    elif mode == 'binary':
+        result = binary_search_chunks(
+            query,
+            match_count,
+            threshold,
+            candidate_multiplier=options["candidate_multiplier"],
+            vault_id=options["vault_id"],
+            timer=timer
+        )
+    else:
+        result = search_chunks(
+            query,
+            match_count,
+            threshold,
+            folder=options["folder"],
+            tags=options["tags"],
+            section_type=options["section_type"],
+            modified_after=options["modified_after"],
+            vault_id=options["vault_id"],
+            timer=timer
+        )
+
+    rows_returned = result.get("count", 0)
+
+    if use_rerank and result.get("success"):
+        # Keep enough candidates for MMR to choose from after re-ranking
+        rerank_keep = match_count if use_mmr else final_count
+        with timer.stage('rerank'):
+            result["chunks"], result["rerank"] = get_reranker().rerank(
+                query,
+                result["chunks"],
+                rerank_keep,
+                batch_size=options["rerank_batch_size"],
+                budget_ms=options["rerank_budget_ms"]
+            )
+        result["count"] = len(result["chunks"])
+
+    if use_mmr and result.get("success"):
+        result = diversify_chunks(result, final_count, options["mmr_lambda"], timer=timer)
+
+    # Optional context assembly: stitch neighboring chunks, drop overlap,
+    # pack under a token budget
+    if options["context_tokens"] > 0 and result.get("success"):
+        from context_assembly import assemble_context
+
+        with timer.stage('context'):
+            conn = get_connection() if RAG_BACKEND != 'local' else None
+            try:
+                assembled = assemble_context(
+                    result["chunks"],
+                    token_budget=options["context_tokens"],
+                    conn=conn,
+                    max_gap=options["context_max_gap"]
+                )
+            finally:
+                if conn is not None:
+                    release_connection(conn)
+
+        result["context"] = assembled["context"]
+        result["context_tokens"] = assembled["tokens"]
+        result["context_input_tokens"] = assembled["input_tokens"]
+        result["context_spans"] = [
+            {key: span[key] for key in ("file_path", "chunk_indexes", "similarity", "tokens")}
+            for span in assembled["spans"]
+        ]
+
+    if RAG_SEARCH_LOG and result.get("success"):
+        log_search(result)
+
+    result["_timer"] = timer
+    record_search(
+        timer,
+        mode=mode,
+        backend=RAG_BACKEND,
+        success=bool(result.get("success")),
+        rows_returned=rows_returned,
+        rows_scanned=result.get("rows_scanned")
+    )
+    return result
+
+def log_search(result: dict):
+    """Append the files this search returned to RAG_SEARCH_LOG"""
+    files = sorted({chunk["file_path"] for chunk in result.get("chunks", []) if chunk.get("file_path")})
+    if not files:
+        return
+    line = json.dumps({"ts": time.time(), "files": files}) + "\n"
+    try:
+        with search_log_lock, open(RAG_SEARCH_LOG, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        print(f"Search log write failed: {e}", file=sys.stderr)
+
+def serialize_result(result: dict, indent: int = None) -> str:
+    """
+    Serialize a run_search() result with its timings
+
+    Serialization is itself a stage: the body is dumped first, timed, and
+    timings_ms (including "serialize") is appended as the last key.
+    """
+    timer = result.pop("_timer", None) or StageTimer()
+    with timer.stage('serialize'):
+        body = json.dumps(result, indent=indent, default=str)
+    METRICS.observe('rag_search_stage_seconds', timer.timings['serialize'] / 1000, stage='serialize')
+
+    timings = json.dumps(timer.as_dict())
+    body = body.rstrip()
+    if body == '{}':
+        return '{"timings_ms": ' + timings + '}'
+    separator = ',\n  ' if indent else ', '
+    closing = '\n}' if indent else '}'
+    return body[:-1].rstrip() + separator + '"timings_ms": ' + timings + closing
+
+def serve(host: str, port: int):
+    """
+    Long-running search service (model, pool and indexes stay warm)
+
+        POST /search   {"query": "...", ...option overrides}
+        GET  /metrics  Prometheus text exposition
+        GET  /healthz  liveness
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    defaults = options_from_env()
+
+    class SearchHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: str, content_type: str = 'application/json'):
+            payload = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == '/metrics':
+                self._send(200, METRICS.render(), 'text/plain; version=0.0.4; charset=utf-8')
+            elif self.path == '/healthz':
+                self._send(200, json.dumps({"ok": True}))
+            else:
+                self._send(404, json.dumps({"error": "Not found"}))
+
+        def do_POST(self):
+            if self.path != '/search':
+                self._send(404, json.dumps({"error": "Not found"}))
+                return
+            try:
+                length = int(self.headers.get('Content-Length', '0'))
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._send(400, json.dumps({"error": "Invalid JSON body"}))
+                return
+            if not isinstance(body, dict):
+                self._send(400, json.dumps({"error": "Body must be a JSON object"}))
+                return
+
+            query = body.get("query")
+            query = query.strip() if isinstance(query, str) else ''
+            if not query:
+                self._send(400, json.dumps({"error": "No query provided"}))
+                return
+
+            try:
+                options = options_from_request(defaults, body)
+            except ValueError as e:
+                self._send(400, json.dumps({"error": f"Invalid option: {e}"}))
+                return
+            self._send(200, serialize_result(run_search(query, options)))
+
+        def log_message(self, format, *args):
+            # Keep stdout clean; access logs go to stderr
+            sys.stderr.write("%s - %s\n" % (self.address_string(), format % args))
+
+    server = ThreadingHTTPServer((host, port), SearchHandler)
+    print(f"👻 RAG search service listening on http://{host}:{port} (POST /search, GET /metrics)", file=sys.stderr, flush=True)
+    server.serve_forever()
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve(os.getenv('RAG_SEARCH_HOST', '127.0.0.1'), int(os.getenv('RAG_SEARCH_PORT', '8765')))
+        sys.exit(0)
+
     # Read query from stdin or command line
     if len(sys.argv) > 1:
         query = ' '.join(sys.argv[1:])
@@ -103,12 +934,8 @@ if __name__ == '__main__':
         print(json.dumps({"error": "No query provided"}), flush=True)
         sys.exit(1)
 
-    # Get optional parameters from environment
-    match_count = int(os.getenv('RAG_MATCH_COUNT', '10'))
-    threshold = float(os.getenv('RAG_THRESHOLD', '0.3'))
-
-    # Perform search
-    result = search_chunks(query, match_count, threshold)
+    # Perform search (optional parameters come from RAG_* environment variables)
+    result = run_search(query, options_from_env())
 
     # Output JSON result
-    print(json.dumps(result, indent=2), flush=True)
+    print(serialize_result(result, indent=2), flush=True)
@@ -6,13 +6,49 @@ Creates tables and functions for vector similarity search
 
 import psycopg2
 import os
+import sys
 from dotenv import load_dotenv
 
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from rag_schema import (
+    DROP_LEGACY_MATCH_FUNCTION_SQL,
+    match_function_sql,
+    two_stage_match_function_sql,
+    binary_match_function_sql,
+    binary_index_sql,
+    parse_vector_index_kinds,
+    hot_folder_index_sql,
+    parse_hot_folders,
+    hybrid_match_function_sql,
+    CHUNKS_TABLE_SQL,
+    VAULT_PARTITION_FUNCTION_SQL,
+    EMBEDDING_PENDING_INDEX_SQL,
+    EMBEDDING_PENDING_TRIGGER_SQL,
+    parse_embedding_layout,
+    chunk_embeddings_table_sql,
+    narrow_match_function_sql,
+    CHUNK_EMBEDDINGS_SYNC_TRIGGER_SQL,
+    CHUNK_EMBEDDINGS_BACKFILL_SQL,
+    CHUNK_EMBEDDINGS_INDEX_SQL,
+    DROP_CHUNK_EMBEDDINGS_SQL,
+)
+
 # Load environment variables
 load_dotenv('.env.local')
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Folders that get their own partial HNSW index (comma-separated)
+HOT_FOLDERS = parse_hot_folders(os.getenv('RAG_HOT_FOLDERS', ''))
+
+# Chunk vector indexes to keep: hnsw (default), binary or both
+VECTOR_INDEX_KINDS = parse_vector_index_kinds(os.getenv('RAG_VECTOR_INDEX', 'hnsw'))
+
+# wide (default): vectors only in markdown_chunks; narrow: also a trigger-
+# maintained chunk_embeddings table for unfiltered vector search
+EMBEDDING_LAYOUT = parse_embedding_layout(os.getenv('RAG_EMBEDDING_LAYOUT', 'wide'))
+
 if not DATABASE_URL:
     print("❌ DATABASE_URL not found in .env.local")
     exit(1)
@@ -30,34 +66,66 @@ try:
     conn.commit()
     print("✅ pgvector extension enabled")
 
-    print("\n2️⃣ Creating markdown_chunks table...")
+    print("\n2️⃣ Creating vault configuration table...")
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS markdown_chunks (
+        CREATE TABLE IF NOT EXISTS vault_configs (
             id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            file_path TEXT NOT NULL,
-            chunk_index INTEGER NOT NULL,
-            chunk_text TEXT NOT NULL,
-            chunk_tokens INTEGER,
-            embedding vector(1536),
-            metadata JSONB DEFAULT '{}',
+            vault_path TEXT UNIQUE NOT NULL,
+            last_scan TIMESTAMP WITH TIME ZONE,
+            file_count INTEGER DEFAULT 0,
+            total_chunks INTEGER DEFAULT 0,
+            settings JSONB DEFAULT '{}',
             created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-            UNIQUE(file_path, chunk_index)
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
         );
     """)
     conn.commit()
-    print("✅ markdown_chunks table created")
-
-    print("\n3️⃣ Creating indexes for performance...")
+    print("✅ vault_configs table created")
 
-    # Index for vector similarity search using HNSW
+    print("\n3️⃣ Creating markdown_chunks table (partitioned by vault)...")
     cur.execute("""
-        CREATE INDEX IF NOT EXISTS markdown_chunks_embedding_idx
-        ON markdown_chunks
-        USING hnsw (embedding vector_cosine_ops)
-        WITH (m = 16, ef_construction = 64);
+        SELECT c.relkind FROM pg_class c
+        WHERE c.oid = to_regclass('markdown_chunks');
     """)
-    print("✅ Vector similarity index created (HNSW)")
+    row = cur.fetchone()
+    if row and row[0] != 'p':
+        print("❌ markdown_chunks exists but is not partitioned by vault")
+        print("   Run: python3 migrate_to_vault_partitions.py --vault <path of the indexed vault>")
+        exit(1)
+    cur.execute(CHUNKS_TABLE_SQL)
+    cur.execute(VAULT_PARTITION_FUNCTION_SQL)
+    # One partition per registered vault (indexers create new ones on registration)
+    cur.execute("SELECT ensure_vault_partition(id) FROM vault_configs ORDER BY created_at;")
+    partitions = cur.fetchall()
+    # The embedding model sets the width (384 after migrate_to_local_embeddings.py),
+    # so functions and indexes follow the existing column, not the create default
+    cur.execute("""
+        SELECT atttypmod FROM pg_attribute
+        WHERE attrelid = 'markdown_chunks'::regclass AND attname = 'embedding';
+    """)
+    dimensions = cur.fetchone()[0]
+    conn.commit()
+    print(f"✅ markdown_chunks table created ({len(partitions)} vault partitions, vector({dimensions}))")
+
+    print("\n4️⃣ Creating indexes for performance (cascade to every vault partition)...")
+
+    # Index for vector similarity search using HNSW
+    if 'hnsw' in VECTOR_INDEX_KINDS:
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS markdown_chunks_embedding_idx
+            ON markdown_chunks
+            USING hnsw (embedding vector_cosine_ops)
+            WITH (m = 16, ef_construction = 64);
+        """)
+        print("✅ Vector similarity index created (HNSW)")
+    else:
+        cur.execute("DROP INDEX IF EXISTS markdown_chunks_embedding_idx;")
+        print("⏭️  Full-precision HNSW index skipped (RAG_VECTOR_INDEX=binary)")
+
+    # Binary-quantized index: Hamming-distance candidates, exact re-rank
+    if 'binary' in VECTOR_INDEX_KINDS:
+        cur.execute(binary_index_sql(dimensions))
+        print(f"✅ Binary-quantized vector index created (HNSW on bit({dimensions}))")
 
     # Index for file path lookups
     cur.execute("""
@@ -66,6 +134,13 @@ try:
     """)
     print("✅ File path index created")
 
+    # Lookups by chunk id alone (the primary key leads with vault_id)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS markdown_chunks_id_idx
+        ON markdown_chunks (id);
+    """)
+    print("✅ Chunk id index created")
+
     # Index for metadata queries
     cur.execute("""
         CREATE INDEX IF NOT EXISTS markdown_chunks_metadata_idx
@@ -73,59 +148,84 @@ try:
     """)
     print("✅ Metadata index created (GIN)")
 
-    conn.commit()
+    # Generated full-text column for lexical matching (ticket IDs, error codes, names)
+    cur.execute("""
+        ALTER TABLE markdown_chunks
+        ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(chunk_text, ''))) STORED;
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS markdown_chunks_search_tsv_idx
+        ON markdown_chunks USING GIN (search_tsv);
+    """)
+    print("✅ Full-text index created (GIN on search_tsv)")
 
-    print("\n4️⃣ Creating vector similarity search function...")
-    cur.execute("""
-        CREATE OR REPLACE FUNCTION match_markdown_chunks(
-            query_embedding vector(1536),
-            match_threshold FLOAT DEFAULT 0.7,
-            match_count INT DEFAULT 10
-        )
-        RETURNS TABLE (
-            id UUID,
-            file_path TEXT,
-            chunk_index INTEGER,
-            chunk_text TEXT,
-            metadata JSONB,
-            similarity FLOAT
-        )
-        LANGUAGE plpgsql
-        AS $$
-        BEGIN
-            RETURN QUERY
-            SELECT
-                markdown_chunks.id,
-                markdown_chunks.file_path,
-                markdown_chunks.chunk_index,
-                markdown_chunks.chunk_text,
-                markdown_chunks.metadata,
-                1 - (markdown_chunks.embedding <=> query_embedding) AS similarity
-            FROM markdown_chunks
-            WHERE 1 - (markdown_chunks.embedding <=> query_embedding) > match_threshold
-            ORDER BY markdown_chunks.embedding <=> query_embedding
-            LIMIT match_count;
-        END;
-        $$;
+    # Indexes backing the match_markdown_chunks() filters
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS markdown_chunks_file_path_prefix_idx
+        ON markdown_chunks (file_path text_pattern_ops);
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS markdown_chunks_tags_idx
+        ON markdown_chunks USING GIN (tags);
     """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS markdown_chunks_section_type_idx
+        ON markdown_chunks ((metadata->>'section_type'));
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS markdown_chunks_file_modified_at_idx
+        ON markdown_chunks (file_modified_at);
+    """)
+    print("✅ Filter indexes created (folder prefix, tags, section type, modified date)")
+
+    for folder in HOT_FOLDERS:
+        cur.execute(hot_folder_index_sql(folder))
+        print(f"✅ Hot-folder vector index created: {folder}/")
+
+    # Chunks written without an embedding wake embed_pending_chunks.py
+    cur.execute(EMBEDDING_PENDING_INDEX_SQL)
+    cur.execute(EMBEDDING_PENDING_TRIGGER_SQL)
+    print("✅ Pending-embedding index and NOTIFY trigger created")
+
     conn.commit()
-    print("✅ match_markdown_chunks function created")
 
-    print("\n5️⃣ Creating file management table...")
-    cur.execute("""
+    print("\n5️⃣ Creating vector similarity search function...")
+    cur.execute(DROP_LEGACY_MATCH_FUNCTION_SQL)
+    cur.execute(match_function_sql(dimensions))
+    conn.commit()
+    print("✅ match_markdown_chunks function created (with vault/folder/tag/section/date filters)")
+
+    cur.execute(binary_match_function_sql(dimensions))
+    conn.commit()
+    print("✅ binary_match_markdown_chunks function created (Hamming candidates, exact re-rank)")
+
+    cur.execute(hybrid_match_function_sql(dimensions))
+    conn.commit()
+    print("✅ hybrid_match_markdown_chunks function created (full-text + vector, RRF)")
+
+    print("\n6️⃣ Creating file management table...")
+    cur.execute(f"""
         CREATE TABLE IF NOT EXISTS markdown_files (
             id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            file_path TEXT UNIQUE NOT NULL,
+            vault_id UUID NOT NULL REFERENCES vault_configs(id) ON DELETE CASCADE,
+            file_path TEXT NOT NULL,
             filename TEXT NOT NULL,
             folder TEXT,
             size_bytes INTEGER,
             chunk_count INTEGER DEFAULT 0,
             last_modified TIMESTAMP WITH TIME ZONE,
             last_indexed TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-            metadata JSONB DEFAULT '{}',
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            metadata JSONB DEFAULT '{{}}',
+            centroid_embedding vector({dimensions}),
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            UNIQUE (vault_id, file_path)
         );
     """)
+    cur.execute(f"""
+        ALTER TABLE markdown_files
+        ADD COLUMN IF NOT EXISTS centroid_embedding vector({dimensions});
+    """)
     conn.commit()
     print("✅ markdown_files table created")
 
@@ -137,21 +237,16 @@ try:
     conn.commit()
     print("✅ File path index created")
 
-    print("\n6️⃣ Creating vault configuration table...")
+    # Index for the coarse (file-level) stage of two-stage search
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS vault_configs (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            vault_path TEXT UNIQUE NOT NULL,
-            last_scan TIMESTAMP WITH TIME ZONE,
-            file_count INTEGER DEFAULT 0,
-            total_chunks INTEGER DEFAULT 0,
-            settings JSONB DEFAULT '{}',
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        );
+        CREATE INDEX IF NOT EXISTS markdown_files_centroid_idx
+        ON markdown_files
+        USING hnsw (centroid_embedding vector_cosine_ops)
+        WITH (m = 16, ef_construction = 64);
     """)
+    cur.execute(two_stage_match_function_sql(dimensions))
     conn.commit()
-    print("✅ vault_configs table created")
+    print("✅ File centroid index and two_stage_match_markdown_chunks function created")
 
     print("\n7️⃣ Creating chat history table...")
     cur.execute("""
@@ -168,8 +263,30 @@ try:
     conn.commit()
     print("✅ chat_history table created")
 
+    if EMBEDDING_LAYOUT == 'narrow':
+        print("\n8️⃣ Creating narrow chunk_embeddings table...")
+        cur.execute("""
+            SELECT atttypmod FROM pg_attribute
+            WHERE attrelid = to_regclass('chunk_embeddings') AND attname = 'embedding';
+        """)
+        row = cur.fetchone()
+        narrow_dimensions = row[0] if row else None
+        if narrow_dimensions is not None and narrow_dimensions != dimensions:
+            # Left over from before an embedding model change
+            cur.execute(DROP_CHUNK_EMBEDDINGS_SQL)
+            print(f"   Dropped vector({narrow_dimensions}) copy (chunks are vector({dimensions}))")
+        cur.execute(chunk_embeddings_table_sql(dimensions))
+        cur.execute("SELECT ensure_vault_partition(id) FROM vault_configs;")
+        cur.execute(CHUNK_EMBEDDINGS_SYNC_TRIGGER_SQL)
+        cur.execute(CHUNK_EMBEDDINGS_BACKFILL_SQL)
+        print(f"✅ chunk_embeddings filled ({cur.rowcount} embeddings) and kept in sync by trigger")
+        cur.execute(CHUNK_EMBEDDINGS_INDEX_SQL)
+        cur.execute(narrow_match_function_sql(dimensions))
+        conn.commit()
+        print("✅ HNSW index and narrow_match_markdown_chunks function created")
+
     # Verify setup
-    print("\n8️⃣ Verifying setup...")
+    print("\n9️⃣ Verifying setup...")
     cur.execute("""
         SELECT tablename FROM pg_tables
         WHERE schemaname = 'public'
@@ -186,6 +303,27 @@ try:
     if cur.fetchone():
         print("✅ pgvector extension is active")
 
+    # Vector index sizes, summed over the vault partitions
+    cur.execute("""
+        SELECT
+            indexname,
+            pg_size_pretty((
+                SELECT sum(pg_relation_size(tree.relid))
+                FROM pg_partition_tree(format('%I', indexname)::regclass) AS tree
+            )),
+            (
+                SELECT count(*)
+                FROM pg_partition_tree(format('%I', indexname)::regclass) AS tree
+                WHERE tree.isleaf
+            )
+        FROM pg_indexes
+        WHERE (tablename = 'markdown_chunks' AND indexname LIKE 'markdown_chunks_embedding%')
+        OR indexname = 'chunk_embeddings_embedding_idx'
+        ORDER BY indexname;
+    """)
+    for index_name, size, partitions in cur.fetchall():
+        print(f"   - {index_name}: {size} across {partitions} partitions")
+
     cur.close()
     conn.close()
 
@@ -193,16 +331,29 @@ try:
     print("🎉 RAG DATABASE SETUP COMPLETE!")
     print("=" * 60)
     print("\n📊 Database Schema:")
-    print("   - markdown_chunks: Stores text chunks with embeddings")
-    print("   - markdown_files: Tracks indexed files")
+    print("   - markdown_chunks: Stores text chunks with embeddings (one partition per vault)")
+    print("   - markdown_files: Tracks indexed files (unique per vault)")
     print("   - vault_configs: Stores vault configurations")
     print("   - chat_history: Persists chat conversations")
     print("\n🔍 Search Function:")
-    print("   - match_markdown_chunks(): Vector similarity search")
+    print("   - match_markdown_chunks(): Vector similarity search (optional vault/folder/tag/section/date filters)")
+    print("   - Every search function takes filter_vault_id to search one vault's partition")
+    if EMBEDDING_LAYOUT == 'narrow':
+        print("   - narrow_match_markdown_chunks(): Top-k from chunk_embeddings, text fetched for those rows only")
+    print("   - hybrid_match_markdown_chunks(): Full-text + vector search fused with RRF")
+    print("   - two_stage_match_markdown_chunks(): Top files by centroid, then their chunks")
+    print("   - binary_match_markdown_chunks(): Binary-quantized candidates, exact re-rank")
     print("\n⚡ Indexes:")
-    print("   - HNSW vector index for fast similarity search")
+    print(f"   - Chunk vector indexes: {', '.join(VECTOR_INDEX_KINDS)} (RAG_VECTOR_INDEX)")
+    print("   - HNSW index on per-file centroid embeddings")
     print("   - B-tree indexes for file paths")
     print("   - GIN index for metadata queries")
+    print("   - GIN index for full-text search (search_tsv)")
+    print("   - Filter indexes: file_path prefix, tags (GIN), section_type, file_modified_at")
+    print("   - Partial index + NOTIFY trigger for chunks awaiting embeddings")
+    if HOT_FOLDERS:
+        print(f"   - Partial HNSW indexes for hot folders: {', '.join(HOT_FOLDERS)}")
+    print("\n🩺 Maintenance: python maintain_rag_database.py report | run --every 6h")
     print("\n🚀 Ready for RAG implementation!")
 
 except Exception as e:
@@ -6,19 +6,26 @@ Simple vault indexing with OpenAI - treats each file as one chunk for speed
 import psycopg2
 from psycopg2.extras import Json
 import os
+import sys
 import requests
 import time
 from dotenv import load_dotenv
 
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from file_indexing import register_vault
+
 load_dotenv('.env.local')
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Point at a compatible server (e.g. mock_openai_server.py) for offline load tests
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
 
 def generate_embedding(text: str) -> list[float]:
     """Generate embedding using OpenAI API"""
     response = requests.post(
-        'https://api.openai.com/v1/embeddings',
+        f'{OPENAI_BASE_URL}/embeddings',
         headers={
             'Authorization': f'Bearer {OPENAI_API_KEY}',
             'Content-Type': 'application/json',
@@ -49,9 +56,10 @@ def main():
     conn = psycopg2.connect(DATABASE_URL)
     cur = conn.cursor()
 
-    # Clear existing chunks
+    # Clear this vault's existing chunks
     print("\n1️⃣ Clearing existing chunks...")
-    cur.execute("DELETE FROM markdown_chunks;")
+    vault_id = register_vault(cur, os.path.abspath(vault_path))
+    cur.execute("DELETE FROM markdown_chunks WHERE vault_id = %s;", (vault_id,))
     conn.commit()
     print("✅ Cleared")
 
@@ -83,9 +91,9 @@ def main():
 
             # Insert
             cur.execute("""
-                INSERT INTO markdown_chunks (file_path, chunk_index, chunk_text, embedding, metadata)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (rel_path, 0, content[:2000], embedding, Json({})))
+                INSERT INTO markdown_chunks (vault_id, file_path, chunk_index, chunk_text, embedding, metadata)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (vault_id, rel_path, 0, content[:2000], embedding, Json({})))
 
             conn.commit()
             total += 1
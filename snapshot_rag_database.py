@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Snapshot RAG Database
+Exports vault_configs, markdown_files and markdown_chunks to a columnar
+snapshot and restores it with COPY, building every index once after the load
+
+    python snapshot_rag_database.py export --out ./rag-snapshot
+    python snapshot_rag_database.py import --from ./rag-snapshot --replace
+
+Snapshot layout (the chunk part is a local index, see lib/local_index.py):
+    embeddings.npy  - (n, dim) float32 chunk embeddings, stored exactly (not normalized)
+    chunks.jsonl    - one record per row with every chunk column
+    offsets.npy     - byte offsets into chunks.jsonl
+    files.jsonl     - one record per markdown_files row
+    vaults.jsonl    - one record per vault_configs row
+    manifest.json   - counts, dimensions, checksums
+
+Importing is a maintenance operation, not an online one: the restore is
+a single transaction (a failure leaves the database as it was), but its
+TRUNCATE holds ACCESS EXCLUSIVE locks on markdown_files and
+markdown_chunks until COMMIT, so searches and indexers block for the
+whole COPY and index rebuild. Stop the search service and indexers, or
+restore into a separate database and point DATABASE_URL at it.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from dotenv import load_dotenv
+import psycopg2
+import numpy as np
+
+# Add lib to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'lib'))
+from local_index import write_index, EMBEDDINGS_FILE, CHUNKS_FILE, OFFSETS_FILE, MANIFEST_FILE
+from rag_schema import REFRESH_ALL_FILE_CENTROIDS_SQL
+
+# Load environment variables
+load_dotenv('.env.local')
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+if not DATABASE_URL:
+    print("❌ DATABASE_URL not found in .env.local")
+    exit(1)
+
+FILES_FILE = 'files.jsonl'
+VAULTS_FILE = 'vaults.jsonl'
+# 2: rows carry vault_id (markdown_chunks partitioned by vault)
+SNAPSHOT_FORMAT = 2
+
+VAULT_COLUMNS = ['id', 'vault_path', 'settings', 'created_at']
+FILE_COLUMNS = [
+    'id', 'vault_id', 'file_path', 'filename', 'folder', 'size_bytes', 'chunk_count',
+    'last_modified', 'last_indexed', 'metadata', 'created_at'
+]
+CHUNK_COLUMNS = [
+    'id', 'vault_id', 'file_path', 'chunk_index', 'chunk_text', 'chunk_tokens',
+    'metadata', 'tags', 'file_modified_at', 'created_at', 'updated_at'
+]
+
+def embedding_dimensions(cur) -> int:
+    """Declared dimension of markdown_chunks.embedding (vector typmod)"""
+    cur.execute("""
+        SELECT atttypmod
+        FROM pg_attribute
+        WHERE attrelid = 'markdown_chunks'::regclass
+          AND attname = 'embedding';
+    """)
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def stream_vaults(conn):
+    """vault_configs rows as dicts"""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {', '.join(VAULT_COLUMNS)} FROM vault_configs ORDER BY vault_path;")
+        for row in cur.fetchall():
+            yield dict(zip(VAULT_COLUMNS, row))
+
+def stream_files(conn, fetch_size: int = 2000):
+    """markdown_files rows as dicts (centroids are recomputed on import)"""
+    with conn.cursor(name='snapshot_files') as cur:
+        cur.itersize = fetch_size
+        cur.execute(f"SELECT {', '.join(FILE_COLUMNS)} FROM markdown_files ORDER BY vault_id, file_path;")
+        for row in cur:
+            yield dict(zip(FILE_COLUMNS, row))
+
+def stream_chunks(conn, dimensions: int, fetch_size: int = 2000):
+    """(record, embedding) pairs; chunks still waiting for an embedding get a zero row"""
+    empty = np.zeros(dimensions, dtype=np.float32)
+    with conn.cursor(name='snapshot_chunks') as cur:
+        cur.itersize = fetch_size
+        cur.execute(f"""
+            SELECT {', '.join(CHUNK_COLUMNS)}, embedding::text
+            FROM markdown_chunks
+            ORDER BY vault_id, file_path, chunk_index;
+        """)
+        for row in cur:
+            record = dict(zip(CHUNK_COLUMNS, row[:-1]))
+            record['embedded'] = row[-1] is not None
+            yield record, row[-1] if row[-1] is not None else empty
+
+def export_snapshot(out_dir: str):
+    print("📦 Exporting RAG database snapshot...")
+    print("=" * 60)
+
+    os.makedirs(out_dir, exist_ok=True)
+    conn = psycopg2.connect(DATABASE_URL)
+    # Files, chunks and counts all come from one snapshot
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+
+    try:
+        start_time = time.time()
+        with conn.cursor() as cur:
+            dimensions = embedding_dimensions(cur)
+            cur.execute("SELECT COUNT(*), COUNT(embedding) FROM markdown_chunks;")
+            chunk_count, embedded_count = cur.fetchone()
+
+        print(f"\n1️⃣ Writing {VAULTS_FILE} and {FILES_FILE}...")
+        vault_count = 0
+        with open(os.path.join(out_dir, VAULTS_FILE), 'w') as f:
+            for record in stream_vaults(conn):
+                f.write(json.dumps(record, default=str) + '\n')
+                vault_count += 1
+        file_count = 0
+        with open(os.path.join(out_dir, FILES_FILE), 'w') as f:
+            for record in stream_files(conn):
+                f.write(json.dumps(record, default=str) + '\n')
+                file_count += 1
+        print(f"✅ {vault_count} vaults, {file_count} files")
+
+        print(f"\n2️⃣ Writing {chunk_count} chunks × {dimensions} dims...")
+        write_index(
+            out_dir,
+            stream_chunks(conn, dimensions),
+            chunk_count,
+            dimensions,
+            source={'exported_at': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            normalize=False
+        )
+        print(f"✅ {chunk_count} chunks ({embedded_count} embedded)")
+
+        print("\n3️⃣ Checksumming...")
+        manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest.update({
+            'snapshot_format': SNAPSHOT_FORMAT,
+            'vaults': vault_count,
+            'files': file_count,
+            'embedded': embedded_count,
+            'checksums': {
+                name: file_sha256(os.path.join(out_dir, name))
+                for name in (EMBEDDINGS_FILE, CHUNKS_FILE, OFFSETS_FILE, FILES_FILE, VAULTS_FILE)
+            }
+        })
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        size_mb = sum(
+            os.path.getsize(os.path.join(out_dir, name))
+            for name in (EMBEDDINGS_FILE, CHUNKS_FILE, OFFSETS_FILE, FILES_FILE, VAULTS_FILE)
+        ) / (1024 * 1024)
+
+        print(f"\n✅ Snapshot written to {out_dir}")
+        print(f"   - Size: {size_mb:.1f} MB")
+        print(f"   - Export time: {time.time() - start_time:.1f}s")
+        print(f"\n♻️  Restore with:")
+        print(f"   python3 snapshot_rag_database.py import --from {out_dir} --replace")
+    finally:
+        conn.close()
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+class CopyStream(io.RawIOBase):
+    """Readable file over an iterator of CSV lines, so COPY streams without buffering the table"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.buffer = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line.encode('utf-8')
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+def csv_field(value) -> str:
+    """Unquoted empty for NULL; everything else quoted, so '' stays an empty string"""
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+def csv_lines(rows):
+    """Format rows as COPY ... (FORMAT csv) lines"""
+    for row in rows:
+        yield ','.join(csv_field(value) for value in row) + '\n'
+
+def text_array(values) -> str:
+    """Postgres array literal for TEXT[]"""
+    items = ('"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"' for value in values or [])
+    return '{' + ','.join(items) + '}'
+
+def json_value(value):
+    return None if value is None else json.dumps(value)
+
+def read_jsonl(path: str):
+    with open(path) as f:
+        for line in f:
+            yield json.loads(line)
+
+def restore_vaults(cur, snapshot_dir: str) -> dict:
+    """
+    Register the snapshot's vaults and their partitions
+
+    A vault path already registered under another id keeps that id.
+    Raises ValueError if a snapshot vault id is taken by a different path.
+    Returns {snapshot vault id: target vault id}.
+    """
+    vault_ids = {}
+    for record in read_jsonl(os.path.join(snapshot_dir, VAULTS_FILE)):
+        cur.execute("SELECT vault_path FROM vault_configs WHERE id = %s;", (record['id'],))
+        existing = cur.fetchone()
+        if existing and existing[0] != record['vault_path']:
+            raise ValueError(
+                f"Snapshot vault {record['id']} ({record['vault_path']}) has the id of "
+                f"{existing[0]} in the target database"
+            )
+        cur.execute("""
+            INSERT INTO vault_configs (id, vault_path, settings, created_at)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (vault_path)
+            DO UPDATE SET updated_at = NOW()
+            RETURNING id;
+        """, (record['id'], record['vault_path'], json_value(record['settings']), record['created_at']))
+        vault_ids[record['id']] = str(cur.fetchone()[0])
+        cur.execute("SELECT ensure_vault_partition(%s);", (vault_ids[record['id']],))
+    return vault_ids
+
+def file_rows(snapshot_dir: str, vault_ids: dict):
+    for record in read_jsonl(os.path.join(snapshot_dir, FILES_FILE)):
+        yield [
+            record['id'], vault_ids[record['vault_id']], record['file_path'], record['filename'], record['folder'],
+            record['size_bytes'], record['chunk_count'], record['last_modified'],
+            record['last_indexed'], json_value(record['metadata']), record['created_at']
+        ]
+
+def chunk_rows(snapshot_dir: str, embeddings: np.ndarray, vault_ids: dict):
+    """Chunk rows with the embedding rendered from the .npy matrix"""
+    # %.9g round-trips float32 exactly; one format call per row keeps it in C
+    vector_format = '[' + ','.join(['%.9g'] * embeddings.shape[1]) + ']'
+    for row, record in enumerate(read_jsonl(os.path.join(snapshot_dir, CHUNKS_FILE))):
+        embedding = vector_format % tuple(embeddings[row].tolist()) if record.get('embedded', True) else None
+        yield [
+            record['id'], vault_ids[record['vault_id']], record['file_path'], record['chunk_index'], record['chunk_text'],
+            record['chunk_tokens'], embedding, json_value(record['metadata']),
+            text_array(record['tags']), record['file_modified_at'],
+            record['created_at'], record['updated_at']
+        ]
+
+def secondary_indexes(cur) -> list:
+    """
+    (name, definition) of every index on the two tables (and on
+    chunk_embeddings, when the narrow layout is set up) except the ones
+    backing primary key / unique constraints, which COPY needs anyway
+
+    On the partitioned tables these are the parent indexes: dropping one
+    drops every vault partition's copy. pg_get_indexdef() renders them as
+    "ON ONLY", which would create an invalid parent with no partition
+    indexes, so the definitions are rewritten to plain "ON" to cascade.
+    """
+    cur.execute("""
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid IN ('markdown_files'::regclass, 'markdown_chunks'::regclass, to_regclass('chunk_embeddings'))
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+        ORDER BY 1;
+    """)
+    return [(name, definition.replace(' ON ONLY ', ' ON ', 1)) for name, definition in cur.fetchall()]
+
+def invalid_indexes(cur, names: list) -> list:
+    """Any of the named indexes, or their per-partition children, not marked valid"""
+    cur.execute("""
+        SELECT tree.relid::regclass::text
+        FROM unnest(%s::text[]) AS built(name),
+             pg_partition_tree(built.name::regclass) AS tree
+        JOIN pg_index i ON i.indexrelid = tree.relid
+        WHERE NOT i.indisvalid
+        ORDER BY 1;
+    """, (names,))
+    return [row[0] for row in cur.fetchall()]
+
+def verify_snapshot(snapshot_dir: str, manifest: dict):
+    for name, expected in manifest.get('checksums', {}).items():
+        if file_sha256(os.path.join(snapshot_dir, name)) != expected:
+            raise ValueError(f"Checksum mismatch for {name}; the snapshot is corrupt or incomplete")
+
+def import_snapshot(snapshot_dir: str, replace: bool, verify: bool, maintenance_work_mem: str):
+    print("♻️  Importing RAG database snapshot...")
+    print("=" * 60)
+
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('snapshot_format') != SNAPSHOT_FORMAT:
+        if manifest.get('snapshot_format') == 1:
+            print(f"❌ {snapshot_dir} predates vault partitioning; re-export it with this version")
+        else:
+            print(f"❌ {snapshot_dir} is not a database snapshot (export_local_index.py output cannot be restored)")
+        exit(1)
+
+    if verify:
+        print("\n1️⃣ Verifying checksums...")
+        try:
+            verify_snapshot(snapshot_dir, manifest)
+        except ValueError as e:
+            print(f"❌ {e}")
+            exit(1)
+        print("✅ Checksums match")
+
+    embeddings = np.load(os.path.join(snapshot_dir, EMBEDDINGS_FILE), mmap_mode='r')
+
+    conn = psycopg2.connect(DATABASE_URL)
+    cur = conn.cursor()
+
+    try:
+        dimensions = embedding_dimensions(cur)
+        if dimensions is None:
+            print("❌ markdown_chunks does not exist. Run setup_rag_database.py first.")
+            exit(1)
+        if dimensions != manifest['dimensions']:
+            print(f"❌ Snapshot has {manifest['dimensions']} dims but markdown_chunks.embedding is vector({dimensions})")
+            exit(1)
+
+        cur.execute("SELECT EXISTS (SELECT 1 FROM markdown_chunks), EXISTS (SELECT 1 FROM markdown_files);")
+        if any(cur.fetchone()) and not replace:
+            print("❌ Target tables are not empty. Re-run with --replace to overwrite them.")
+            exit(1)
+
+        start_time = time.time()
+        # Everything below is one transaction, so any failure leaves the
+        # database untouched. TRUNCATE takes ACCESS EXCLUSIVE locks held to
+        # COMMIT: searches and indexers block until the restore finishes.
+        cur.execute("SET LOCAL maintenance_work_mem = %s;", (maintenance_work_mem,))
+
+        print("\n⚠️  Searches and indexers block on markdown_files/markdown_chunks until the restore commits")
+        print("\n2️⃣ Dropping secondary indexes...")
+        indexes = secondary_indexes(cur)
+        # CASCADE empties the narrow chunk_embeddings copy too; its sync
+        # trigger refills it from the COPY below
+        cur.execute("TRUNCATE markdown_chunks, markdown_files CASCADE;")
+        for name, _ in indexes:
+            cur.execute(f"DROP INDEX {name};")
+        print(f"✅ Dropped {len(indexes)} indexes (rebuilt after the load)")
+
+        print("\n3️⃣ Loading rows with COPY...")
+        load_start = time.time()
+        try:
+            vault_ids = restore_vaults(cur, snapshot_dir)
+        except ValueError as e:
+            conn.rollback()
+            print(f"❌ {e}")
+            exit(1)
+        cur.copy_expert(
+            f"COPY markdown_files ({', '.join(FILE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            CopyStream(csv_lines(file_rows(snapshot_dir, vault_ids)))
+        )
+        chunk_columns = CHUNK_COLUMNS[:6] + ['embedding'] + CHUNK_COLUMNS[6:]
+        cur.copy_expert(
+            f"COPY markdown_chunks ({', '.join(chunk_columns)}) FROM STDIN WITH (FORMAT csv)",
+            CopyStream(csv_lines(chunk_rows(snapshot_dir, embeddings, vault_ids)))
+        )
+        print(f"✅ {len(vault_ids)} vaults, {manifest['files']} files, {manifest['count']} chunks in {time.time() - load_start:.1f}s")
+
+        print("\n4️⃣ Refreshing file centroids...")
+        cur.execute(REFRESH_ALL_FILE_CENTROIDS_SQL)
+        print(f"✅ {cur.rowcount} centroids")
+
+        print("\n5️⃣ Building indexes...")
+        for name, definition in indexes:
+            index_start = time.time()
+            cur.execute(definition)
+            print(f"✅ {name} ({time.time() - index_start:.1f}s)")
+        invalid = invalid_indexes(cur, [name for name, _ in indexes])
+        if invalid:
+            raise RuntimeError(f"Rebuilt indexes are not valid: {', '.join(invalid)}")
+
+        cur.execute("ANALYZE markdown_files;")
+        cur.execute("ANALYZE markdown_chunks;")
+        conn.commit()
+
+        print(f"\n✅ Snapshot restored in {time.time() - start_time:.1f}s")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export or restore a RAG database snapshot')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Write a snapshot directory')
+    export_parser.add_argument('--out', default='./rag-snapshot', help='Output directory')
+
+    import_parser = subparsers.add_parser('import', help='Restore a snapshot directory')
+    import_parser.add_argument('--from', dest='snapshot', default='./rag-snapshot', help='Snapshot directory')
+    import_parser.add_argument('--replace', action='store_true', help='Overwrite non-empty tables')
+    import_parser.add_argument('--no-verify', action='store_true', help='Skip checksum verification')
+    import_parser.add_argument('--maintenance-work-mem', default='1GB', help='Memory for index builds')
+
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_snapshot(os.path.abspath(args.out))
+    else:
+        import_snapshot(os.path.abspath(args.snapshot), args.replace, not args.no_verify, args.maintenance_work_mem)